@@ -0,0 +1,76 @@
+"""生成 tests/fixtures 下的 .xls 回归样例
+
+两个文件内容相同，由不同的写出器生成：
+- xlwt.xls: 第三方库 xlwt 写出，与本仓库的解析器相互独立，重新生成需要安装 xlwt
+- xls_writer.xls: 仓库根目录的 xls_writer.py 写出，连续数值合并为 MULRK 记录
+
+共享字符串超过一条记录的长度，拆入多条 CONTINUE 记录，且有字符串跨记录边界；
+中文 (UTF-16) 和纯 ASCII (压缩存储) 的字符串交替出现，两种宽度都会跨边界。
+样例文件已提交，只有修改 fixture_rows 时才需要重新运行:
+
+    python tests/make_xls_fixtures.py
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(BASE_DIR, "tests", "fixtures")
+
+HEADERS = ["序号", "客户名称", "地址", "数量", "单价", "日期", "金额", "备注"]
+ROW_COUNT = 300
+
+
+def fixture_rows() -> List[List[Any]]:
+    """样例数据行
+
+    数量为整数 RK，单价为放大 100 倍的 RK，日期为带日期格式的 RK，
+    金额无法用 RK 表示，写为 NUMBER；备注每三行留空一格。
+    """
+    rows = []
+    for i in range(1, ROW_COUNT + 1):
+        rows.append([
+            i,
+            f"客户{i:04d}医药有限公司",
+            f"No.{i} Renmin Road " + "x" * (i % 33),
+            i * 3,
+            i * 0.25,
+            date(2024, 1, 1) + timedelta(days=i),
+            i * 1.1,
+            "" if i % 3 == 0 else f"批号{i % 7}",
+        ])
+    return rows
+
+
+def write_with_xlwt(file_path: str) -> None:
+    import xlwt
+
+    book = xlwt.Workbook(encoding="utf-8")
+    sheet = book.add_sheet("Sheet1")
+    date_style = xlwt.easyxf(num_format_str="yyyy-mm-dd")
+    for col, value in enumerate(HEADERS):
+        sheet.write(0, col, value)
+    for row_no, row in enumerate(fixture_rows(), 1):
+        for col, value in enumerate(row):
+            if value == "":
+                continue
+            if isinstance(value, date):
+                sheet.write(row_no, col, datetime(value.year, value.month, value.day), date_style)
+            else:
+                sheet.write(row_no, col, value)
+    book.save(file_path)
+
+
+def main():
+    sys.path.insert(0, BASE_DIR)
+    from xls_writer import write_xls
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    write_with_xlwt(os.path.join(FIXTURE_DIR, "xlwt.xls"))
+    write_xls(os.path.join(FIXTURE_DIR, "xls_writer.xls"), HEADERS, fixture_rows())
+    print(f"已生成样例: {FIXTURE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
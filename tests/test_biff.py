@@ -0,0 +1,110 @@
+"""旧版 .xls 解析 (zhengli.biff / XlsSheetReader) 的回归检查
+
+样例文件由 tests/make_xls_fixtures.py 生成并已提交，逐格与已知值比较。
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from make_xls_fixtures import FIXTURE_DIR, HEADERS, ROW_COUNT, fixture_rows
+from zhengli.biff import CONTINUE, MULRK, NUMBER, RK, SST, CompoundFile, iter_records
+from zhengli.readers import XlsSheetReader, open_sheet, read_header
+
+FIXTURES = ["xlwt.xls", "xls_writer.xls"]
+COLUMNS = list(range(1, len(HEADERS) + 1))
+
+
+def expected_rows():
+    """样例数据按解析结果的类型表示: 数值为 float，日期为 datetime，空单元格为 None"""
+    rows = []
+    for row in fixture_rows():
+        values = []
+        for value in row:
+            if value == "":
+                value = None
+            elif isinstance(value, date):
+                value = datetime(value.year, value.month, value.day)
+            elif isinstance(value, int):
+                value = float(value)
+            values.append(value)
+        rows.append(values)
+    return rows
+
+
+class XlsFixtureTest(unittest.TestCase):
+
+    def open(self, name):
+        sheet = XlsSheetReader(os.path.join(FIXTURE_DIR, name))
+        self.addCleanup(sheet.close)
+        return sheet
+
+    def test_fixtures_cover_records(self):
+        """样例确实包含跨 CONTINUE 的共享字符串、RK/MULRK 和 NUMBER 记录"""
+        for name in FIXTURES:
+            compound = CompoundFile(os.path.join(FIXTURE_DIR, name))
+            self.addCleanup(compound.close)
+            counts = {}
+            previous = None
+            for record_type, _, _, _ in iter_records(compound.open_stream("Workbook", "Book")):
+                if record_type == CONTINUE and previous == SST:
+                    counts["sst_continue"] = counts.get("sst_continue", 0) + 1
+                    continue
+                previous = record_type
+                counts[record_type] = counts.get(record_type, 0) + 1
+            with self.subTest(name=name):
+                self.assertGreaterEqual(counts.get("sst_continue", 0), 2)
+                for record_type in (RK, MULRK, NUMBER):
+                    self.assertGreater(counts.get(record_type, 0), 0)
+
+    def test_header(self):
+        for name in FIXTURES:
+            with self.subTest(name=name):
+                self.assertEqual(self.open(name).header_row(len(HEADERS)), HEADERS)
+                self.assertEqual(read_header(os.path.join(FIXTURE_DIR, name), len(HEADERS)), HEADERS)
+
+    def test_open_sheet_uses_native_reader(self):
+        for name in FIXTURES:
+            sheet = open_sheet(os.path.join(FIXTURE_DIR, name))
+            self.addCleanup(sheet.close)
+            self.assertIsInstance(sheet, XlsSheetReader)
+
+    def test_last_row(self):
+        for name in FIXTURES:
+            with self.subTest(name=name):
+                self.assertEqual(self.open(name).last_row(), ROW_COUNT + 1)
+
+    def test_all_cells(self):
+        expected = expected_rows()
+        for name in FIXTURES:
+            with self.subTest(name=name):
+                self.assertEqual(list(self.open(name).iter_rows(COLUMNS)), expected)
+
+    def test_known_values(self):
+        """跨 CONTINUE 边界的字符串 (压缩和 UTF-16 各一个)、RK/NUMBER 数值和日期"""
+        for name in FIXTURES:
+            with self.subTest(name=name):
+                rows = list(self.open(name).iter_rows(COLUMNS))
+                self.assertEqual(rows[126][2], "No.127 Renmin Road " + "x" * 28)
+                self.assertEqual(rows[254][1], "客户0255医药有限公司")
+                self.assertEqual(rows[0], [1.0, "客户0001医药有限公司", "No.1 Renmin Road x", 3.0, 0.25,
+                                           datetime(2024, 1, 2), 1.1, "批号1"])
+                self.assertEqual(rows[2][6], 3.3000000000000003)
+                self.assertIsNone(rows[2][7])
+                self.assertEqual(rows[ROW_COUNT - 1][3:6], [900.0, 75.0, datetime(2024, 10, 27)])
+
+    def test_projection(self):
+        """只取部分列、乱序取列时各列的值对应正确"""
+        for name in FIXTURES:
+            with self.subTest(name=name):
+                rows = list(self.open(name).iter_rows([6, 2], start_row=300))
+                self.assertEqual(rows, [[datetime(2024, 10, 26), "客户0299医药有限公司"],
+                                        [datetime(2024, 10, 27), "客户0300医药有限公司"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""增量清单 (zhengli.manifest) 按汇总日期划分的回归检查
+
+同一路径的文件只计入首次整理那天的汇总: 当天重跑复用整理结果，之后的日期跳过；
+其他路径下内容相同的文件 (重新下载的副本) 计入本次汇总。
+
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from zhengli.flow_batch import FlowBatch
+from zhengli.manifest import Manifest, file_digest
+
+DAY1 = "2024-03-01"
+DAY2 = "2024-03-02"
+ROWS = [(date(2024, 2, 29), "阿莫西林胶囊", "0.25g*24粒", "B001", "武汉市第一医院", 10.0),
+        (date(2024, 2, 29), "蒙脱石散", "3g*10袋", "B002", "襄阳市中心医院", 2.5)]
+
+
+def load_pipeline():
+    """载入整理脚本 (文件名含连字符，不能直接 import)"""
+    spec = importlib.util.spec_from_file_location("zhengli_pipeline",
+                                                  os.path.join(BASE_DIR, "zhengli-laptop-fixed2.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class ManifestCase(unittest.TestCase):
+    """临时工作目录和清单"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.state_dir = os.path.join(self.directory, "state")
+        self.work_dir = os.path.join(self.directory, "work")
+        os.makedirs(self.work_dir)
+        self.file = self.write("pattern1.xlsx", b"first download")
+        self.manifest = self.open_manifest("v1")
+
+    def write(self, name, content):
+        path = os.path.join(self.work_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def open_manifest(self, version):
+        manifest = Manifest(self.state_dir, version)
+        self.addCleanup(manifest.close)
+        return manifest
+
+    def record(self, path, summary_date):
+        return self.manifest.record(path, file_digest(path), "pattern1", 3, FlowBatch.from_rows(ROWS), summary_date)
+
+
+class ManifestTest(ManifestCase):
+
+    def test_same_day_reuses_result(self):
+        self.record(self.file, DAY1)
+        entry, digest = self.manifest.lookup(self.file, DAY1)
+        self.assertEqual(entry.summary_date, DAY1)
+        self.assertEqual(digest, file_digest(self.file))
+        self.assertTrue(self.manifest.reusable(entry))
+        self.assertEqual(list(self.manifest.load_batch(entry).rows()), list(FlowBatch.from_rows(ROWS).rows()))
+
+    def test_next_day_keeps_first_summary_date(self):
+        self.record(self.file, DAY1)
+        entry, _ = self.manifest.lookup(self.file, DAY2)
+        self.assertEqual(entry.summary_date, DAY1)
+        # 只改了修改时间的同一文件仍属于第一天
+        os.utime(self.file, ns=(1, 1))
+        entry, _ = self.manifest.lookup(self.file, DAY2)
+        self.assertEqual(entry.summary_date, DAY1)
+
+    def test_copy_counts_for_current_day(self):
+        self.record(self.file, DAY1)
+        copy = self.write("pattern1 (1).xlsx", b"first download")
+        entry, _ = self.manifest.lookup(copy, DAY2)
+        self.assertEqual(entry.summary_date, DAY2)
+        self.assertEqual(entry.path, os.path.abspath(copy))
+        self.assertTrue(self.manifest.reusable(entry))
+        # 原文件仍属于第一天
+        self.assertEqual(self.manifest.lookup(self.file, DAY2)[0].summary_date, DAY1)
+
+    def test_changed_content_is_new(self):
+        self.record(self.file, DAY1)
+        self.write("pattern1.xlsx", b"second download, different content")
+        entry, digest = self.manifest.lookup(self.file, DAY2)
+        self.assertIsNone(entry)
+        self.assertEqual(digest, file_digest(self.file))
+
+    def test_patterns_version_change(self):
+        self.record(self.file, DAY1)
+        self.manifest.close()
+        manifest = self.open_manifest("v2")
+        entry, _ = manifest.lookup(self.file, DAY1)
+        # 仍能判断是否已计入，但整理结果不能复用
+        self.assertEqual(entry.summary_date, DAY1)
+        self.assertFalse(manifest.reusable(entry))
+        copy = self.write("pattern1 (1).xlsx", b"first download")
+        self.assertIsNone(manifest.lookup(copy, DAY1)[0])
+
+    def test_forget_missing(self):
+        self.record(self.file, DAY1)
+        self.assertEqual(self.manifest.forget_missing([]), 1)
+        self.assertIsNone(self.manifest.lookup(self.file, DAY1)[0])
+        self.assertEqual(os.listdir(os.path.join(self.state_dir, "batches")), [])
+
+
+class CheckManifestTest(ManifestCase):
+    """整理脚本的 check_manifest: 当天重跑复用，第二天跳过已计入的文件，新副本照常统计"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pipeline = load_pipeline()
+
+    def check(self, day):
+        processor = self.pipeline.ExcelProcessor(incremental=True, state_dir=self.state_dir)
+        processor.work_dir = self.work_dir
+        processor.summary_date = date.fromisoformat(day)
+        processor.manifest = self.manifest
+        with redirect_stdout(io.StringIO()):
+            files, cached = processor.check_manifest(sorted(processor.list_excel_files()))
+        return [os.path.basename(f) for f in files], [os.path.basename(f) for f in cached]
+
+    def test_check_manifest_scoping(self):
+        self.assertEqual(self.check(DAY1), (["pattern1.xlsx"], []))
+        self.record(self.file, DAY1)
+        self.assertEqual(self.check(DAY1), (["pattern1.xlsx"], ["pattern1.xlsx"]))
+        self.assertEqual(self.check(DAY2), ([], []))
+        self.write("pattern1 (1).xlsx", b"first download")
+        self.write("pattern2.xls", b"new file")
+        self.assertEqual(self.check(DAY2), (["pattern1 (1).xlsx", "pattern2.xls"], ["pattern1 (1).xlsx"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
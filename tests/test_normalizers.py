@@ -0,0 +1,72 @@
+"""日期列标准化 (zhengli.normalizers) 和 FlowBatch 日期列的回归检查
+
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhengli.flow_batch import FlowBatch
+from zhengli.normalizers import NormalizerCache, normalize_date_column, normalize_date_value
+
+
+def batch_days(days):
+    """按列追加后读回的日期列"""
+    batch = FlowBatch()
+    count = len(days)
+    batch.extend_columns(days, ["品种"] * count, ["规格"] * count, ["批号"] * count, ["单位"] * count, [1] * count)
+    return [row[0] for row in batch.rows()]
+
+
+class NormalizeDateTest(unittest.TestCase):
+
+    def test_formats(self):
+        columns = [
+            [datetime(2024, 1, 2, 8, 30), date(2024, 1, 3), None],
+            [45293.0, 45294.5, None],
+            [20240102.0, 20240103],
+            ["2024-01-02", " 2024-01-03 ", ""],
+            ["2024/1/2", "2024-1-3"],
+            ["20240102", "20240103"],
+        ]
+        for values in columns:
+            with self.subTest(values=values):
+                days = normalize_date_column(values)
+                self.assertEqual(days[:2], [date(2024, 1, 2).toordinal(), date(2024, 1, 3).toordinal()])
+                self.assertEqual(days[2:], [0] * (len(values) - 2))
+        days = normalize_date_column(["2024-01-02 10:00:00", "2024/1/3 8:00"], split_time=True)
+        self.assertEqual(days, [date(2024, 1, 2).toordinal(), date(2024, 1, 3).toordinal()])
+
+    def test_fast_paths_match_single_values(self):
+        """整列快速路径、带缓存和不带缓存的逐个转换结果一致"""
+        columns = [
+            [20240105, 20240230, 20240105],
+            [45293, "2024-01-02", 45293.0, None],
+            ["2024-01-02", "2024-02-30", "abc", ""],
+            [date(2024, 1, 2), "2024-01-03", True],
+        ]
+        for values in columns:
+            with self.subTest(values=values):
+                expected = [normalize_date_value(v) for v in values]
+                self.assertEqual(normalize_date_column(values), expected)
+                self.assertEqual(normalize_date_column(values, cache=NormalizerCache()), expected)
+
+    def test_invalid_integers_are_not_day_ordinals(self):
+        """无法识别的整数日期保留原值，不能被 FlowBatch 当作日序号"""
+        for value in (20240230, 99999999, -5, 0, 3000000):
+            with self.subTest(value=value):
+                days = normalize_date_column([value])
+                self.assertNotIsInstance(days[0], int)
+                self.assertEqual(days[0], value)
+                self.assertEqual(batch_days(days), [value])
+
+    def test_mixed_valid_and_invalid(self):
+        days = normalize_date_column([20240105, 20240230, "2024-13-01", None])
+        self.assertEqual(batch_days(days), [date(2024, 1, 5), 20240230.0, "2024-13-01", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""表头倒排索引 (zhengli.pattern_index) 的回归检查
+
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhengli.pattern_index import PatternIndex
+from zhengli.pattern_registry import HEADER_COLUMNS, load_registry
+
+
+def header_row(headers):
+    row = [None] * HEADER_COLUMNS
+    for col, value in headers.items():
+        row[col - 1] = value
+    return row
+
+
+class PatternIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = load_registry().index
+
+    def section(self, title):
+        """报告中以 title 开头的小节的各行"""
+        lines = self.index.ambiguity_report()
+        start = next(i for i, line in enumerate(lines) if line.startswith(title)) + 1
+        end = next((i for i in range(start, len(lines)) if not lines[i].startswith("  ")), len(lines))
+        return lines[start:end]
+
+    def test_report_flags_one_column_difference(self):
+        """pattern3/pattern4 只有第 10 列 (数量/批号) 不同"""
+        lines = self.section("只差一个共同约束列的格式对")
+        pair = [line for line in lines if line.startswith("  pattern3 / pattern4:")]
+        self.assertEqual(len(pair), 1)
+        self.assertIn("第 10 列", pair[0])
+        self.assertIn("数量 / 批号", pair[0])
+
+    def test_report_flags_overlapping_patterns(self):
+        lines = self.section("可能同时匹配的格式对")
+        self.assertTrue(any(line.startswith("  pattern5 / pattern8:") for line in lines))
+        self.assertFalse(any("pattern3 / pattern4" in line for line in lines))
+
+    def test_builtin_headers_match_their_pattern(self):
+        for name, headers in self.index.headers.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.index.match(header_row(headers)), name)
+
+    def test_first_defined_pattern_wins(self):
+        """同时满足多种格式时按定义顺序取第一个，与逐个比较的结果一致"""
+        index = PatternIndex({
+            "a": {"headers": {1: "日期", 2: "品名"}},
+            "b": {"headers": {1: "日期"}},
+            "c": {"headers": {1: "日期", 2: "品名", 3: "数量"}},
+        })
+        self.assertEqual(index.match(["日期", "品名", "数量"]), "a")
+        self.assertEqual(index.match(["日期", "规格"]), "b")
+        self.assertEqual(index.match(["时间", "品名", "数量"]), "unknown")
+        self.assertEqual(index.match([]), "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""伪装成 .xls 的网页/文本表格 (zhengli.text_tables) 的回归检查
+
+样例位于 tests/fixtures/text:
+- span.xls          UTF-8 网页表格，含 colspan/rowspan、x:str 和 mso-number-format 文本单元格
+- gbk_meta.xls      GBK 编码，由 <meta charset=gb2312> 声明
+- utf16_bom.xls     带 BOM 的 UTF-16 制表符文本 (Excel 的 "Unicode 文本")
+- gbk_tab.xls       无 BOM 的 GBK 制表符文本
+- comma_bom.csv     带 BOM 的 UTF-8 逗号分隔文本，引号内含逗号，中间有空行
+- spreadsheetml.xls Excel 2003 XML 表格，本地不解析
+
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhengli.readers import DelimitedSheetReader, HtmlSheetReader, open_sheet, sniff_file
+from zhengli.text_tables import (OLE2_MAGIC, ZIP_MAGIC, HtmlTableParser, convert_text, detect_encoding,
+                                 sniff_delimiter, sniff_format)
+
+TEXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "text")
+
+# 三个 GBK/UTF-16/CSV 样例的内容相同 (CSV 第二行客户名称含逗号、第三行数量带千分位)
+PLAIN_HEADER = ["销售日期", "客户名称", "数量"]
+PLAIN_ROWS = [["2024-01-02", "武汉市第一医院", 10.0], ["2024-01-03", "襄阳市中心医院", 5.0]]
+
+
+def fixture(name):
+    return os.path.join(TEXT_DIR, name)
+
+
+class TextTableTest(unittest.TestCase):
+
+    def open(self, name):
+        sheet = open_sheet(fixture(name))
+        self.addCleanup(sheet.close)
+        return sheet
+
+    def test_sniff_format(self):
+        expected = {"span.xls": "html", "gbk_meta.xls": "html", "utf16_bom.xls": "text", "gbk_tab.xls": "text",
+                    "comma_bom.csv": "text", "spreadsheetml.xls": "unknown"}
+        for name, kind in expected.items():
+            with self.subTest(name=name):
+                self.assertEqual(sniff_file(fixture(name))[0], kind)
+        self.assertEqual(sniff_format(OLE2_MAGIC + b"\x00" * 8), "xls")
+        self.assertEqual(sniff_format(ZIP_MAGIC + b"\x00" * 8), "xlsx")
+        self.assertEqual(sniff_format(b"\x00\x01garbage"), "unknown")
+
+    def test_detect_encoding(self):
+        expected = {"span.xls": "utf-8", "gbk_meta.xls": "gb18030", "utf16_bom.xls": "utf-16",
+                    "gbk_tab.xls": "gb18030", "comma_bom.csv": "utf-8-sig"}
+        for name, encoding in expected.items():
+            kind, head = sniff_file(fixture(name))
+            with self.subTest(name=name):
+                self.assertEqual(detect_encoding(head, html=kind == "html"), encoding)
+
+    def test_sniff_delimiter(self):
+        self.assertEqual(sniff_delimiter("a\tb,c\td"), "\t")
+        self.assertEqual(sniff_delimiter("a,b,c"), ",")
+        self.assertEqual(sniff_delimiter("a;b;c,d"), ";")
+        self.assertEqual(sniff_delimiter("a|b"), "|")
+        self.assertEqual(sniff_delimiter("abc"), "\t")
+        self.assertEqual(self.open("gbk_tab.xls").delimiter, "\t")
+        self.assertEqual(self.open("utf16_bom.xls").delimiter, "\t")
+        self.assertEqual(self.open("comma_bom.csv").delimiter, ",")
+
+    def test_spans_and_text_cells(self):
+        sheet = self.open("span.xls")
+        self.assertIsInstance(sheet, HtmlSheetReader)
+        self.assertEqual(sheet.header_row(4), ["商品", None, "批号", "数量"])
+        self.assertEqual(list(sheet.iter_rows([1, 2, 3, 4])), [
+            # 批号列被第一行的 rowspan 占用
+            ["名称", "规格", None, "件"],
+            # x:str 保留前导零，千分位数字转为数值，<br> 变为空格，字符实体还原
+            ["阿莫西林&克拉维酸", "0.25g *24粒", "007", 1200.0],
+            # colspan 覆盖的位置为 None，mso-number-format:"\@" 为文本
+            ["布洛芬", "合并", None, "0012"],
+            # 第一列被上一行 布洛芬 的 rowspan 占用
+            [None, "10mg", "2024001", -3.5],
+        ])
+        self.assertEqual(sheet.last_row(), 5)
+
+    def test_plain_tables(self):
+        for name in ("gbk_meta.xls", "utf16_bom.xls", "gbk_tab.xls"):
+            with self.subTest(name=name):
+                sheet = self.open(name)
+                self.assertEqual(sheet.header_row(3), PLAIN_HEADER)
+                self.assertEqual(list(sheet.iter_rows([1, 2, 3])), PLAIN_ROWS)
+                self.assertEqual(sheet.last_row(), 3)
+
+    def test_csv_quotes_and_blank_rows(self):
+        sheet = self.open("comma_bom.csv")
+        self.assertIsInstance(sheet, DelimitedSheetReader)
+        self.assertEqual(sheet.header_row(3), PLAIN_HEADER)
+        self.assertEqual(list(sheet.iter_rows([3, 2])), [[10.0, "武汉市第一医院, 门诊部"], [1234.0, "襄阳市中心医院"]])
+        # 空行保留行号，与 Excel 打开时一致
+        self.assertEqual(sheet.last_row(), 4)
+
+    def test_spreadsheetml_is_not_parsed(self):
+        with self.assertRaises(ValueError):
+            open_sheet(fixture("spreadsheetml.xls"))
+
+    def test_parser_chunk_boundaries(self):
+        """标签、注释、脚本和字符实体被任意位置切开时结果不变"""
+        with open(fixture("span.xls"), encoding="utf-8") as f:
+            document = f.read()
+
+        def parse(step):
+            parser = HtmlTableParser()
+            rows = []
+            for start in range(0, len(document), step):
+                parser.feed(document[start:start + step])
+                rows += parser.rows
+                parser.rows = []
+            parser.close()
+            return rows + parser.rows
+
+        expected = parse(len(document))
+        self.assertEqual(len(expected), 5)
+        for step in range(1, 40):
+            with self.subTest(step=step):
+                self.assertEqual(parse(step), expected)
+
+    def test_convert_text(self):
+        self.assertEqual(convert_text(" 12 "), 12.0)
+        self.assertEqual(convert_text("1,234.5"), 1234.5)
+        self.assertEqual(convert_text("0012"), "0012")
+        self.assertEqual(convert_text("12,34"), "12,34")
+        self.assertEqual(convert_text("2024-01-01"), "2024-01-01")
+        self.assertIsNone(convert_text("  "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""原生 .xlsx 读取 (XlsxSheetReader / SharedStrings) 的回归检查
+
+样例工作簿由下面的 XML 直接打包生成，覆盖共享字符串 (含富文本和拼音注释)、
+内联字符串、公式字符串、布尔和错误值、日期样式数值、ISO 8601 日期单元格 (t="d")、
+省略 r 属性的单元格和带命名空间前缀的标签。
+
+运行: python -m pytest tests 或 python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhengli.readers import XlsxSheetReader, open_sheet, read_header
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+</Types>"""
+
+WORKBOOK = f"""<?xml version="1.0" encoding="UTF-8"?>
+<workbook xmlns="{MAIN}" xmlns:r="{REL}">
+<sheets><sheet name="流向" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/data.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="/xl/strings.xml"/>
+<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# 样式 1: 内置日期格式 14；样式 2: 自定义日期时间格式；样式 3: 带引号文字的非日期格式
+STYLES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<styleSheet xmlns="{MAIN}">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy/mm/dd hh:mm"/>
+<numFmt numFmtId="165" formatCode="0.00&quot;盒&quot;"/></numFmts>
+<cellXfs count="4"><xf numFmtId="0"/><xf numFmtId="14"/><xf numFmtId="164"/><xf numFmtId="165"/></cellXfs>
+</styleSheet>"""
+
+# 末尾的填充字符串使 sharedStrings.xml 远大于一次读取的块，用于检查按需解析
+FILLER_STRINGS = 20000
+SHARED_STRINGS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sst xmlns="{MAIN}" count="{7 + FILLER_STRINGS}" uniqueCount="{7 + FILLER_STRINGS}">
+<si><t>销售日期</t></si>
+<si><t>客户名称</t></si>
+<si><t>数量</t></si>
+<si><t>备注</t></si>
+<si><r><rPr><b/></rPr><t>武汉</t></r><r><t xml:space="preserve"> 第一医院</t></r></si>
+<si><t>襄阳</t><rPh sb="0" eb="2"><t>シャンヤン</t></rPh></si>
+<si><t>最后一个字符串</t></si>
+{"".join(f"<si><t>填充{i}</t></si>" for i in range(FILLER_STRINGS))}
+</sst>"""
+
+SHEET = f"""<?xml version="1.0" encoding="UTF-8"?>
+<x:worksheet xmlns:x="{MAIN}">
+<x:dimension ref="A1:D6"/>
+<x:sheetData>
+<x:row r="1"><x:c r="A1" t="s"><x:v>0</x:v></x:c><x:c r="B1" t="s"><x:v>1</x:v></x:c><x:c r="C1" t="s"><x:v>2</x:v></x:c><x:c r="D1" t="s"><x:v>3</x:v></x:c></x:row>
+<x:row r="2"><x:c r="A2" s="1"><x:v>45293</x:v></x:c><x:c r="B2" t="s"><x:v>4</x:v></x:c><x:c r="C2"><x:v>10</x:v></x:c><x:c r="D2" t="b"><x:v>1</x:v></x:c></x:row>
+<x:row r="3"><x:c r="A3" t="d"><x:v>2024-01-03T08:30:00</x:v></x:c><x:c r="B3" t="s"><x:v>5</x:v></x:c><x:c r="C3" s="3"><x:v>2.5</x:v></x:c><x:c r="D3" t="e"><x:v>#N/A</x:v></x:c></x:row>
+<x:row r="5"><x:c s="2"><x:v>45295.75</x:v></x:c><x:c t="inlineStr"><x:is><x:t>荆州 市人民医院</x:t></x:is></x:c><x:c t="str"><x:f>C2*2</x:f><x:v>20</x:v></x:c></x:row>
+<x:row r="6"><x:c r="A6" t="d"><x:v>2024-01-06</x:v></x:c><x:c r="D6" t="s"><x:v>6</x:v></x:c></x:row>
+</x:sheetData>
+</x:worksheet>"""
+
+
+def write_workbook(file_path, sheet=SHEET):
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("xl/workbook.xml", WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", STYLES)
+        zf.writestr("xl/strings.xml", SHARED_STRINGS)
+        zf.writestr("xl/worksheets/data.xml", sheet)
+
+
+class XlsxReaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, "sample.xlsx")
+        write_workbook(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def open(self, path=None):
+        sheet = XlsxSheetReader(path or self.path)
+        self.addCleanup(sheet.close)
+        return sheet
+
+    def test_header_reads_only_needed_strings(self):
+        sheet = self.open()
+        self.assertEqual(sheet.header_row(5), ["销售日期", "客户名称", "数量", "备注", None])
+        # 表头只用到前 4 个共享字符串，只解析了开头的一部分
+        self.assertLess(len(sheet.shared_strings), 7 + FILLER_STRINGS)
+        self.assertEqual(read_header(self.path, 4), ["销售日期", "客户名称", "数量", "备注"])
+
+    def test_cell_types(self):
+        self.assertEqual(list(self.open().iter_rows([1, 2, 3, 4])), [
+            [datetime(2024, 1, 2), "武汉 第一医院", 10.0, True],
+            [datetime(2024, 1, 3, 8, 30), "襄阳", 2.5, None],
+            [datetime(2024, 1, 4, 18, 0), "荆州 市人民医院", "20", None],
+            [datetime(2024, 1, 6), None, None, "最后一个字符串"],
+        ])
+
+    def test_rich_text_and_phonetic(self):
+        strings = self.open().shared_strings
+        self.assertEqual(strings[4], "武汉 第一医院")
+        self.assertEqual(strings[5], "襄阳")
+        self.assertEqual(strings[6], "最后一个字符串")
+        self.assertEqual(strings[6 + FILLER_STRINGS], f"填充{FILLER_STRINGS - 1}")
+        self.assertEqual(len(strings), 7 + FILLER_STRINGS)
+        with self.assertRaises(IndexError):
+            strings[7 + FILLER_STRINGS]
+
+    def test_projection(self):
+        self.assertEqual(list(self.open().iter_rows([4, 1], start_row=5)), [
+            [None, datetime(2024, 1, 4, 18, 0)],
+            ["最后一个字符串", datetime(2024, 1, 6)],
+        ])
+
+    def test_last_row(self):
+        self.assertEqual(self.open().last_row(), 6)
+        # 没有 <dimension> 时扫描全部行
+        path = os.path.join(self.directory, "no_dimension.xlsx")
+        write_workbook(path, SHEET.replace('<x:dimension ref="A1:D6"/>', ""))
+        self.assertEqual(self.open(path).last_row(), 6)
+
+    def test_open_sheet_sniffs_zip(self):
+        path = os.path.join(self.directory, "saved_as.xls")
+        shutil.copy(self.path, path)
+        sheet = open_sheet(path)
+        self.addCleanup(sheet.close)
+        self.assertIsInstance(sheet, XlsxSheetReader)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,284 @@
+"""最小的旧版 .xls (BIFF8) 写出器
+
+只写一个工作表，单元格为文本 (LABELSST)、数值 (RK/MULRK/NUMBER)、日期和布尔值，
+用于生成与经销商 .xls 导出结构相同的测试样例和基准文件；整理脚本本身不使用，
+因此不放在 zhengli 包中，与 zhengli-benchmark.py 放在一起。
+
+单元格记录先写入临时文件，写完后才知道行数和共享字符串表，
+再把全局记录、工作表记录组装成 Workbook 流并封装为 OLE2 复合文档 (512 字节扇区)。
+"""
+import os
+import struct
+import tempfile
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from zhengli.biff import (BOF, BOOLERR, BOUNDSHEET, CODEPAGE, CONTINUE, DATEMODE, DIFAT_SECTOR, DIMENSIONS,
+                          END_OF_CHAIN, EOF, FAT_SECTOR, FORMAT, FREE_SECTOR, LABELSST, MAX_RECORD_DATA, MULRK,
+                          NUMBER, OLE2_MAGIC, RK, SST, XF)
+from zhengli.xlsx_writer import date_to_serial
+
+SECTOR_SIZE = 512
+# 小于此大小的流会被放入短流容器，Workbook 流补齐到此大小以上
+MINI_STREAM_CUTOFF = 4096
+
+WINDOW1 = 0x003D
+WINDOW2 = 0x023E
+FONT = 0x0031
+STYLE = 0x0293
+
+# 15 个样式 XF 之后的单元格 XF: 常规、日期
+XF_GENERAL = 15
+XF_DATE = 16
+DATE_FORMAT_ID = 164
+
+_CELL = struct.Struct("<HHH")
+
+
+def _record(record_type: int, data: bytes = b"") -> bytes:
+    return struct.pack("<HH", record_type, len(data)) + data
+
+
+def _short_string(text: str) -> bytes:
+    """ShortXLUnicodeString: u8 字符数 + 标志 + 字符"""
+    try:
+        return struct.pack("<BB", len(text), 0) + text.encode("latin-1")
+    except UnicodeEncodeError:
+        return struct.pack("<BB", len(text), 1) + text.encode("utf-16-le")
+
+
+def _encode_chars(text: str):
+    """返回 (标志, 每字符字节数, 编码后的字符)"""
+    try:
+        return 0, 1, text.encode("latin-1")
+    except UnicodeEncodeError:
+        return 1, 2, text.encode("utf-16-le")
+
+
+def rk_encode(value: Any) -> Optional[int]:
+    """可无损表示为 RK 的数值返回 RK 编码，否则返回 None"""
+    if isinstance(value, float) and value.is_integer() and abs(value) < (1 << 29):
+        value = int(value)
+    if isinstance(value, int):
+        if -(1 << 29) <= value < (1 << 29):
+            return ((value << 2) | 2) & 0xFFFFFFFF
+        return None
+    scaled = value * 100
+    if scaled.is_integer() and abs(scaled) < (1 << 29) and int(scaled) / 100 == value:
+        return ((int(scaled) << 2) | 3) & 0xFFFFFFFF
+    # 浮点 RK 只保存高 30 位，其余位须为 0
+    bits = struct.unpack("<Q", struct.pack("<d", value))[0]
+    if bits & 0x3FFFFFFFF == 0:
+        return bits >> 32
+    return None
+
+
+def _sst_records(strings: List[str]) -> bytes:
+    """共享字符串表，超出记录长度时拆入 CONTINUE 记录；字符跨记录时新记录以宽度标志开头"""
+    records: List[bytes] = []
+    current = bytearray(struct.pack("<II", len(strings), len(strings)))
+    for text in strings:
+        flag, width, chars = _encode_chars(text)
+        if MAX_RECORD_DATA - len(current) < 3 + width:
+            records.append(bytes(current))
+            current = bytearray()
+        current += struct.pack("<HB", len(text), flag)
+        position = 0
+        while position < len(chars):
+            room = (MAX_RECORD_DATA - len(current)) // width * width
+            if room == 0:
+                records.append(bytes(current))
+                current = bytearray([flag])
+                continue
+            current += chars[position:position + room]
+            position += room
+    records.append(bytes(current))
+    return b"".join(_record(SST if index == 0 else CONTINUE, data) for index, data in enumerate(records))
+
+
+def _globals(strings: List[str], sheet_name: str) -> bytes:
+    parts = [
+        _record(BOF, struct.pack("<4H2I", 0x0600, 0x0005, 0x0DBB, 0x07CC, 0, 6)),
+        _record(CODEPAGE, struct.pack("<H", 1200)),
+        _record(WINDOW1, struct.pack("<9H", 0x01E0, 0x005A, 0x3FCF, 0x2A4E, 0x0038, 0, 0, 1, 0x0258)),
+        _record(DATEMODE, struct.pack("<H", 0)),
+    ]
+    font = struct.pack("<5HBBBB", 200, 0, 0x7FFF, 400, 0, 0, 0, 0, 0) + _short_string("Arial")
+    parts.extend(_record(FONT, font) for _ in range(4))
+    date_format = "yyyy-mm-dd"
+    parts.append(_record(FORMAT, struct.pack("<HHB", DATE_FORMAT_ID, len(date_format), 0) + date_format.encode()))
+    style_xf = struct.pack("<HHHBBBBIIH", 0, 0, 0xFFF5, 0x20, 0, 0, 0, 0, 0, 0x20C0)
+    parts.extend(_record(XF, style_xf) for _ in range(XF_GENERAL))
+    parts.append(_record(XF, struct.pack("<HHHBBBBIIH", 0, 0, 0x0001, 0x20, 0, 0, 0, 0, 0, 0x20C0)))
+    parts.append(_record(XF, struct.pack("<HHHBBBBIIH", 0, DATE_FORMAT_ID, 0x0001, 0x20, 0, 0, 0x04, 0, 0, 0x20C0)))
+    parts.append(_record(STYLE, struct.pack("<HBB", 0x8000, 0, 0xFF)))
+    boundsheet_at = len(b"".join(parts))
+    parts.append(_record(BOUNDSHEET, struct.pack("<IBB", 0, 0, 0) + _short_string(sheet_name)))
+    parts.append(_sst_records(strings))
+    parts.append(_record(EOF))
+    data = bytearray(b"".join(parts))
+    # 工作表紧跟在全局部分之后，回填 BOUNDSHEET 中的位置
+    struct.pack_into("<I", data, boundsheet_at + 4, len(data))
+    return bytes(data)
+
+
+class _CellWriter:
+    """把行转换为单元格记录写入临时文件，同时收集共享字符串"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.strings: Dict[str, int] = {}
+        self.rows = 0
+        self.columns = 0
+
+    def _string_index(self, text: str) -> int:
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def write_row(self, row_no: int, row: Sequence[Any]) -> None:
+        records = []
+        rk_run: List[int] = []
+        run_start = 0
+
+        def flush_rk():
+            if len(rk_run) == 1:
+                records.append(_record(RK, _CELL.pack(row_no, run_start, rk_run[0] >> 32)
+                                       + struct.pack("<I", rk_run[0] & 0xFFFFFFFF)))
+            elif rk_run:
+                body = b"".join(struct.pack("<HI", value >> 32, value & 0xFFFFFFFF) for value in rk_run)
+                records.append(_record(MULRK, struct.pack("<HH", row_no, run_start) + body
+                                       + struct.pack("<H", run_start + len(rk_run) - 1)))
+            rk_run.clear()
+
+        for col, value in enumerate(row):
+            if value is None or value == "":
+                flush_rk()
+                continue
+            style = XF_GENERAL
+            if isinstance(value, date):
+                style = XF_DATE
+                value = date_to_serial(value)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                rk = rk_encode(value)
+                if rk is not None:
+                    # RK 与 XF 打包在一起暂存，连续的数值合并为一条 MULRK
+                    if not rk_run:
+                        run_start = col
+                    rk_run.append((style << 32) | rk)
+                    continue
+                flush_rk()
+                records.append(_record(NUMBER, _CELL.pack(row_no, col, style) + struct.pack("<d", value)))
+                continue
+            flush_rk()
+            if isinstance(value, bool):
+                records.append(_record(BOOLERR, _CELL.pack(row_no, col, XF_GENERAL) + struct.pack("<BB", value, 0)))
+            else:
+                records.append(_record(LABELSST, _CELL.pack(row_no, col, XF_GENERAL)
+                                       + struct.pack("<I", self._string_index(str(value)))))
+        flush_rk()
+        if records:
+            self.stream.write(b"".join(records))
+        self.rows = max(self.rows, row_no + 1)
+        self.columns = max(self.columns, len(row))
+
+
+def _ole_file(output, workbook_size: int, write_workbook) -> None:
+    """写出只含一个 Workbook 流的 OLE2 复合文档"""
+    padded = max(workbook_size, MINI_STREAM_CUTOFF)
+    stream_sectors = (padded + SECTOR_SIZE - 1) // SECTOR_SIZE
+    per_sector = SECTOR_SIZE // 4
+    fat_sectors = difat_sectors = 0
+    while True:
+        total = stream_sectors + 1 + fat_sectors + difat_sectors
+        needed_fat = (total + per_sector - 1) // per_sector
+        # 头部可记录 109 个 FAT 扇区，其余记录在 DIFAT 扇区中，每个 DIFAT 扇区末项指向下一个
+        needed_difat = (max(0, needed_fat - 109) + per_sector - 2) // (per_sector - 1)
+        if needed_fat == fat_sectors and needed_difat == difat_sectors:
+            break
+        fat_sectors, difat_sectors = needed_fat, needed_difat
+
+    directory_sector = stream_sectors
+    first_fat = directory_sector + 1
+    first_difat = first_fat + fat_sectors
+    fat = list(range(1, stream_sectors)) + [END_OF_CHAIN]
+    fat.append(END_OF_CHAIN)
+    fat.extend([FAT_SECTOR] * fat_sectors)
+    fat.extend([DIFAT_SECTOR] * difat_sectors)
+    fat.extend([FREE_SECTOR] * (fat_sectors * per_sector - len(fat)))
+
+    fat_locations = list(range(first_fat, first_fat + fat_sectors))
+    header = bytearray(SECTOR_SIZE)
+    struct.pack_into("<8s16sHHHHH6sIIIIIIIII", header, 0, OLE2_MAGIC, bytes(16), 0x003E, 0x0003, 0xFFFE,
+                     9, 6, bytes(6), 0, fat_sectors, directory_sector, 0, MINI_STREAM_CUTOFF, END_OF_CHAIN, 0,
+                     first_difat if difat_sectors else END_OF_CHAIN, difat_sectors)
+    head = fat_locations[:109] + [FREE_SECTOR] * (109 - len(fat_locations[:109]))
+    struct.pack_into("<109I", header, 0x4C, *head)
+    output.write(header)
+
+    write_workbook(output)
+    output.write(bytes(stream_sectors * SECTOR_SIZE - workbook_size))
+
+    def entry(name: str, entry_type: int, child: int, start: int, size: int) -> bytes:
+        encoded = name.encode("utf-16-le") + b"\x00\x00"
+        return struct.pack("<64sHBBIII16sIQQIII", encoded, len(encoded), entry_type, 1, FREE_SECTOR, FREE_SECTOR,
+                           child, bytes(16), 0, 0, 0, start, size, 0)
+
+    empty = struct.pack("<64sHBBIII16sIQQIII", bytes(64), 0, 0, 0, FREE_SECTOR, FREE_SECTOR, FREE_SECTOR,
+                        bytes(16), 0, 0, 0, 0, 0, 0)
+    output.write(entry("Root Entry", 5, 1, END_OF_CHAIN, 0) + entry("Workbook", 2, FREE_SECTOR, 0, padded)
+                 + empty + empty)
+
+    output.write(struct.pack(f"<{len(fat)}I", *fat))
+    remaining = fat_locations[109:]
+    for index in range(difat_sectors):
+        chunk = remaining[index * (per_sector - 1):(index + 1) * (per_sector - 1)]
+        chunk += [FREE_SECTOR] * (per_sector - 1 - len(chunk))
+        next_sector = first_difat + index + 1 if index + 1 < difat_sectors else END_OF_CHAIN
+        output.write(struct.pack(f"<{per_sector}I", *chunk, next_sector))
+
+
+def write_xls(file_path: str, headers: Sequence[Any], rows: Iterable[Sequence[Any]],
+              sheet_name: str = "Sheet1") -> int:
+    """把一组行写成单工作表的 .xls，返回写入的数据行数 (不超过 65535 行)"""
+    tmp_path = file_path + ".tmp"
+    count = 0
+    with tempfile.TemporaryFile() as cells:
+        writer = _CellWriter(cells)
+        writer.write_row(0, headers)
+        for row_no, row in enumerate(rows, 1):
+            if row_no > 0xFFFF:
+                raise ValueError(".xls 工作表最多 65536 行")
+            writer.write_row(row_no, row)
+            count += 1
+        cells_size = cells.tell()
+
+        sheet_head = (_record(BOF, struct.pack("<4H2I", 0x0600, 0x0010, 0x0DBB, 0x07CC, 0, 6))
+                      + _record(DIMENSIONS, struct.pack("<IIHHH", 0, writer.rows, 0, writer.columns, 0)))
+        sheet_tail = (_record(WINDOW2, struct.pack("<HHHIHHI", 0x06B6, 0, 0, 0x40, 0, 0, 0))
+                      + _record(EOF))
+        strings = sorted(writer.strings, key=writer.strings.__getitem__)
+        workbook_globals = _globals(strings, sheet_name)
+        workbook_size = len(workbook_globals) + len(sheet_head) + cells_size + len(sheet_tail)
+
+        def write_workbook(output):
+            output.write(workbook_globals)
+            output.write(sheet_head)
+            cells.seek(0)
+            while True:
+                chunk = cells.read(1 << 20)
+                if not chunk:
+                    break
+                output.write(chunk)
+            output.write(sheet_tail)
+
+        try:
+            with open(tmp_path, "wb") as output:
+                _ole_file(output, workbook_size, write_workbook)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return count
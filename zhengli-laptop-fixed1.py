@@ -6,6 +6,8 @@ import threading
 import sys
 from typing import List, Dict, Optional, Tuple, Any
 
+from zhengli.pattern_registry import load_pattern_definitions
+
 class ExcelProcessor:
     def __init__(self):
         self.work_dir = os.path.join(os.path.expanduser("~"), "Downloads")
@@ -17,46 +19,8 @@ class ExcelProcessor:
         self.processed_rows = 0
         self._lock = threading.Lock()
         
-        # 模式定义
-        self.pattern_definitions = {
-            "pattern1": {
-                "headers": {1: "销售日期", 2: "单位名称", 3: "商品名称", 4: "商品规格", 6: "销售数量", 8: "销售批号"},
-                "mapping": {1: 1, 3: 2, 4: 3, 8: 4, 2: 5, 6: 6}
-            },
-            "pattern2": {
-                "headers": {1: "日期", 5: "销往单位", 9: "药品名称", 11: "规格", 12: "数量", 14: "批号"},
-                "mapping": {1: 1, 9: 2, 11: 3, 14: 4, 5: 5, 12: 6}
-            },
-            "pattern3": {
-                "headers": {1: "销售日期", 4: "销售商", 6: "商品名称", 7: "商品规格", 10: "数量", 13: "批号"},
-                "mapping": {1: 1, 6: 2, 7: 3, 13: 4, 4: 5, 10: 6}
-            },
-            "pattern4": {
-                "headers": {1: "销售日期", 4: "销售商", 6: "商品名称", 7: "商品规格", 10: "批号", 11: "数量"},
-                "mapping": {1: 1, 6: 2, 7: 3, 10: 4, 4: 5, 11: 6}
-            },
-            "pattern5": {
-                "headers": {3: "销售时间", 5: "客户名称", 10: "通用名", 14: "规格", 16: "供应商批次", 18: "销售数量"},
-                "mapping": {3: 1, 10: 2, 14: 3, 16: 4, 5: 5, 18: 6},
-                "date_format": True, "date_col": 3
-            },
-            "pattern6": {
-                "headers": {3: "发票日期", 5: "客户", 9: "商品名称", 10: "商品规格", 12: "开票数量", 16: "批号"},
-                "mapping": {3: 1, 9: 2, 10: 3, 16: 4, 5: 5, 12: 6}
-            },
-            "pattern7": {
-                "headers": {3: "出库日期", 12: "客户名称", 6: "商品名称", 7: "品种规格", 9: "数量", 8: "批号"},
-                "mapping": {3: 1, 6: 2, 7: 3, 8: 4, 12: 5, 9: 6}
-            },
-            "pattern8": {
-                "headers": {2: "制单时间", 5: "客户名称", 7: "品名", 8: "品规", 12: "订单数量", 15: "批号"},
-                "mapping": {2: 1, 7: 2, 8: 3, 15: 4, 5: 5, 12: 6}
-            },
-            "pattern9": {
-                "headers": {7: "出库日期", 20: "下游收货方名称", 21: "产品名称", 22: "产品规格", 24: "数量", 25: "原始批号"},
-                "mapping": {7: 1, 21: 2, 22: 3, 25: 4, 20: 5, 24: 6}
-            }
-        }
+        # 模式定义，各脚本共用 zhengli/patterns.json
+        self.pattern_definitions = load_pattern_definitions()
         
     def initialize_excel(self) -> bool:
         """初始化Excel应用"""
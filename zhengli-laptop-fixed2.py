@@ -1,65 +1,103 @@
 import os
 import glob
-from datetime import datetime, timedelta
-import xlwings as xw
-import threading
+import argparse
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import sys
-from typing import List, Dict, Optional, Tuple, Any
+from contextlib import nullcontext
+from itertools import islice
+from time import perf_counter
+from typing import List, Dict, Iterable, Optional, Sequence, Tuple, Any
+
+from zhengli.dedup import MODES as DEDUP_MODES, Deduplicator
+from zhengli.flow_batch import FlowBatch
+from zhengli.flow_store import FlowStore
+from zhengli.manifest import Manifest, ManifestEntry
+from zhengli.metrics import Metrics, file_size
+from zhengli.normalizers import NormalizerCache
+from zhengli.pattern_registry import HEADER_COLUMNS, load_registry
+from zhengli.pivot import DEFAULT_KEYS, PivotAggregator, parse_keys
+from zhengli.profiling import Profiler
+from zhengli.transformers import compile_patterns
+from zhengli.readers import SheetReader, XlwingsSheetReader, open_sheet, read_header
+from zhengli.summary_sink import SummarySink
+from zhengli.xlsx_writer import XlsxWriter, write_xlsx
+
+try:
+    import xlwings as xw
+except ImportError:
+    xw = None
 
 class ExcelProcessor:
-    def __init__(self):
+    def __init__(self, backend: str = "native", workers: int = 1, checkpoint_every: int = 0,
+                 patterns_file: Optional[str] = None, incremental: bool = False, state_dir: Optional[str] = None,
+                 store_dir: Optional[str] = None, use_store: bool = True,
+                 pivot_keys: Sequence[str] = (), dedup: Optional[str] = None,
+                 metrics_file: Optional[str] = None, profile: bool = False,
+                 profile_dir: Optional[str] = None, open_output: bool = True):
         self.work_dir = os.path.join(os.path.expanduser("~"), "Downloads")
         self.output_dir = r"H:\0、工作\0、每日纯销统计\实时下载流向数据"
         
+        # 读取后端: native 直接解析文件字节, xlwings 通过 Excel 打开
+        self.backend = backend
         self.app = None
+        # native 后端无法解析的文件 (Excel 2003 XML、加密的 .xls 等) 是否改由 Excel 读取
+        self.excel_fallback = xw is not None
         self.summary_wb = None
+        self.summary_file: Optional[str] = None
+        self.summary_date: Optional[date] = None
+        self.summary_headers = ["日期", "品种", "规格", "批号", "流向单位", "数量"]
+        # 汇总行缓冲，全部文件处理完后一次性写出
+        self.sink: Optional[SummarySink] = None
+        # 每处理多少个文件写出一次检查点，0 为不写
+        self.checkpoint_every = checkpoint_every
         self.total_rows = 0
         self.processed_rows = 0
-        self._lock = threading.Lock()
+        # 成功整理并计入汇总的文件，清理阶段只删除这些文件
+        self.done_files: List[str] = []
+        # 并行解析文件的进程数，1 为串行
+        self.workers = workers
+        # 按列标准化时每块的行数
+        self.chunk_size = 4096
+        # 日期、规格、名称清理结果缓存
+        self.cache = NormalizerCache()
+        # 增量模式：保留工作目录中的文件，未变化的文件复用清单中的整理结果
+        self.incremental = incremental
+        self.state_dir = state_dir or os.path.join(os.path.expanduser("~"), ".zhengli")
+        self.manifest: Optional[Manifest] = None
+        self.file_digests: Dict[str, str] = {}
+        # 历史流向库，默认位于输出目录下的 流向库
+        self.store_dir = store_dir
+        self.use_store = use_store
+        # 透视汇总的分组列，为空时不生成透视表
+        self.pivot_keys = tuple(pivot_keys)
+        # 重复行检测: drop 删除重复行，flag 保留并另行列出，None 不检测
+        self.dedup = Deduplicator(dedup) if dedup else None
+        # 分阶段计时；metrics_file 不为 None 时写出 JSON Lines ("" 为汇总文件旁的默认路径)
+        self.metrics = Metrics()
+        self.metrics_file = metrics_file
+        # 按文件剖析: profile_dir 为空时在汇总文件旁创建 <汇总文件名>_profile 目录
+        self.profile_enabled = profile or profile_dir is not None
+        self.profiler: Optional[Profiler] = Profiler(profile_dir) if profile_dir else None
+        # 完成后是否打开输出目录 (基准测试等无人值守运行时关闭)
+        self.open_output = open_output
+        
+        # 模式定义，各脚本共用 zhengli/patterns.json
+        self.patterns_file = patterns_file
+        registry = load_registry(patterns_file)
+        self.pattern_definitions = registry.definitions
+        self.patterns_version = registry.version
         
-        # 模式定义
-        self.pattern_definitions = {
-            "pattern1": {
-                "headers": {1: "销售日期", 2: "单位名称", 3: "商品名称", 4: "商品规格", 6: "销售数量", 8: "销售批号"},
-                "mapping": {1: 1, 3: 2, 4: 3, 8: 4, 2: 5, 6: 6}
-            },
-            "pattern2": {
-                "headers": {1: "日期", 5: "销往单位", 9: "药品名称", 11: "规格", 12: "数量", 14: "批号"},
-                "mapping": {1: 1, 9: 2, 11: 3, 14: 4, 5: 5, 12: 6}
-            },
-            "pattern3": {
-                "headers": {1: "销售日期", 4: "销售商", 6: "商品名称", 7: "商品规格", 10: "数量", 13: "批号"},
-                "mapping": {1: 1, 6: 2, 7: 3, 13: 4, 4: 5, 10: 6}
-            },
-            "pattern4": {
-                "headers": {1: "销售日期", 4: "销售商", 6: "商品名称", 7: "商品规格", 10: "批号", 11: "数量"},
-                "mapping": {1: 1, 6: 2, 7: 3, 10: 4, 4: 5, 11: 6}
-            },
-            "pattern5": {
-                "headers": {3: "销售时间", 5: "客户名称", 10: "通用名", 14: "规格", 16: "供应商批次", 18: "销售数量"},
-                "mapping": {3: 1, 10: 2, 14: 3, 16: 4, 5: 5, 18: 6},
-                "date_format": True, "date_col": 3
-            },
-            "pattern6": {
-                "headers": {3: "发票日期", 5: "客户", 9: "商品名称", 10: "商品规格", 12: "开票数量", 16: "批号"},
-                "mapping": {3: 1, 9: 2, 10: 3, 16: 4, 5: 5, 12: 6}
-            },
-            "pattern7": {
-                "headers": {3: "出库日期", 12: "客户名称", 6: "商品名称", 7: "品种规格", 9: "数量", 8: "批号"},
-                "mapping": {3: 1, 6: 2, 7: 3, 8: 4, 12: 5, 9: 6}
-            },
-            "pattern8": {
-                "headers": {2: "制单时间", 5: "客户名称", 7: "品名", 8: "品规", 12: "订单数量", 15: "批号"},
-                "mapping": {2: 1, 7: 2, 8: 3, 15: 4, 5: 5, 12: 6}
-            },
-            "pattern9": {
-                "headers": {7: "出库日期", 20: "下游收货方名称", 21: "产品名称", 22: "产品规格", 24: "数量", 25: "原始批号"},
-                "mapping": {7: 1, 21: 2, 22: 3, 25: 4, 20: 5, 24: 6}
-            }
-        }
+        # 每种格式编译为固定的整理函数链
+        self.transformers = compile_patterns(self.pattern_definitions, self.cache)
+        # 表头倒排索引，识别耗时不随格式数量明显增长
+        self.pattern_index = registry.index
         
     def initialize_excel(self) -> bool:
         """初始化Excel应用"""
+        if xw is None:
+            print("初始化Excel失败: 未安装xlwings")
+            return False
         try:
             # 使用更兼容的方式初始化Excel
             self.app = xw.App(visible=False, add_book=False)
@@ -89,18 +127,22 @@ class ExcelProcessor:
         """创建汇总文件"""
         try:
             yesterday = datetime.now() - timedelta(days=1)
+            self.summary_date = yesterday.date()
             date_str = yesterday.strftime("%Y-%m-%d")
             filename = f"湖北区域每日网上下载出库汇总{date_str}.xlsx"
             filepath = os.path.join(self.output_dir, filename)
+            self.summary_file = filepath
             
-            self.summary_wb = self.app.books.add()
-            ws = self.summary_wb.sheets[0]
-            
-            # 设置表头
-            headers = ["日期", "品种", "规格", "批号", "流向单位", "数量"]
-            ws.range("A1:F1").value = headers
-            
-            self.summary_wb.save(filepath)
+            if self.backend == "xlwings":
+                self.summary_wb = self.app.books.add()
+                ws = self.summary_wb.sheets[0]
+                
+                # 设置表头
+                ws.range("A1:F1").value = self.summary_headers
+                
+                self.summary_wb.save(filepath)
+            else:
+                write_xlsx(filepath, self.summary_headers, [])
             print(f"创建汇总文件: {filepath}")
             return filepath
             
@@ -108,172 +150,178 @@ class ExcelProcessor:
             print(f"创建汇总文件失败: {e}")
             return None
     
-    def get_file_pattern(self, wb) -> str:
-        """识别文件格式模式"""
+    def open_sheet(self, file_path: str) -> SheetReader:
+        """按当前后端打开文件的第一个工作表"""
         try:
-            ws = wb.sheets[0]
-            
-            # 读取表头行，限制范围避免过大
-            header_row = ws.range("A1:Z1").value
-            if not header_row:
-                return "unknown"
-            
-            # 创建headers字典
-            headers = {}
-            for col, value in enumerate(header_row, 1):
-                if value:
-                    headers[col] = str(value).strip()
-            
-            # 匹配模式
-            for pattern_name, pattern_info in self.pattern_definitions.items():
-                pattern_headers = pattern_info["headers"]
-                if all(headers.get(col) == val for col, val in pattern_headers.items()):
-                    return pattern_name
-            
-            return "unknown"
-            
+            return open_sheet(file_path, self.backend, self.app)
+        except ValueError as e:
+            return self.open_with_excel(file_path, e)
+    
+    def open_with_excel(self, file_path: str, error: ValueError) -> SheetReader:
+        """native 后端无法解析的文件改由 Excel 打开，Excel 在第一次需要时才启动；不可用时抛出原来的错误"""
+        if self.backend != "native" or not self.excel_fallback:
+            raise error
+        print(f"无法直接解析 {os.path.basename(file_path)} ({error})，改用 Excel 读取")
+        if self.app is None and not self.initialize_excel():
+            # 只尝试启动一次，之后的文件直接报告原来的错误
+            self.excel_fallback = False
+            raise error
+        return XlwingsSheetReader(self.app, file_path)
+    
+    def match_pattern(self, header_row: List[Any]) -> str:
+        """根据表头行匹配格式模式"""
+        return self.pattern_index.match(header_row)
+    
+    def sniff_file_pattern(self, file_path: str) -> str:
+        """只读取表头识别文件格式，不打开整个工作簿"""
+        try:
+            try:
+                header = read_header(file_path, HEADER_COLUMNS, self.backend, self.app)
+            except ValueError as e:
+                sheet = self.open_with_excel(file_path, e)
+                try:
+                    header = sheet.header_row(HEADER_COLUMNS)
+                finally:
+                    sheet.close()
+            return self.match_pattern(header)
         except Exception as e:
-            print(f"识别文件格式失败: {e}")
+            print(f"读取表头失败 {os.path.basename(file_path)}: {e}")
             return "unknown"
     
-    def count_file_rows(self, wb) -> int:
+    def classify_files(self, excel_files: List[str]) -> Dict[str, str]:
+        """识别目录下所有文件的格式"""
+        patterns = {}
+        for file_path in excel_files:
+            patterns[file_path] = self.timed_sniff(file_path)
+            elapsed = self.metrics.events[-1]["seconds"] * 1000
+            print(f"{os.path.basename(file_path)}: {patterns[file_path]} ({elapsed:.1f} ms)")
+        return patterns
+    
+    def timed_sniff(self, file_path: str) -> str:
+        with self.metrics.stage("sniff", file_path, nbytes=file_size(file_path)) as event:
+            event["pattern"] = self.sniff_file_pattern(file_path)
+        return event["pattern"]
+    
+    def timed_open(self, file_path: str, pattern: str) -> SheetReader:
+        with self.metrics.stage("open", file_path, pattern, nbytes=file_size(file_path)):
+            return self.open_sheet(file_path)
+    
+    def timed_count(self, sheet: SheetReader, file_path: str, pattern: str) -> int:
+        with self.metrics.stage("count", file_path, pattern):
+            return self.count_file_rows(sheet)
+    
+    def profile(self, name: str):
+        """剖析一个范围 (一个输入文件或一次汇总写出)，未启用时为空操作"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.scope(name)
+    
+    def count_file_rows(self, sheet: SheetReader) -> int:
         """统计文件中除第一行外的行数"""
         try:
-            ws = wb.sheets[0]
-            last_row = ws.used_range.last_cell.row
+            last_row = sheet.last_row()
             return max(0, last_row - 1)
         except Exception as e:
             print(f"统计文件行数时出错: {e}")
             return 0
     
-    def normalize_date(self, value: Any, pattern: str, src_col: int) -> str:
-        """标准化日期格式"""
-        if not value:
-            return value
-            
-        # 处理字符串中的空格
-        if isinstance(value, str):
-            if pattern == "pattern8" and src_col == 2:
-                if " " in value:
-                    value = value.split(" ")[0]
-            else:
-                value = value.replace(" ", "")
-        
-        # 日期格式化
-        if isinstance(value, str):
-            try:
-                if "/" in value or "-" in value:
-                    date_parts = value.replace("/", "-").split("-")
-                    if len(date_parts) == 3:
-                        return f"{date_parts[0]}-{date_parts[1].zfill(2)}-{date_parts[2].zfill(2)}"
-                elif len(value.strip()) == 8 and value.strip().isdigit():
-                    return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
-            except:
-                pass
-        elif isinstance(value, (int, float)):
-            try:
-                value_str = str(int(value))
-                if len(value_str) == 8:
-                    return f"{value_str[:4]}-{value_str[4:6]}-{value_str[6:8]}"
-            except:
-                pass
+    def read_batch(self, sheet: SheetReader, pattern: str, source: str = "") -> FlowBatch:
+        """把文件整理为列式的 FlowBatch
+
+        逐块读取行，转置为列后整列标准化：日期列一次性转换为日序号，
+        文本列批量去空格，代替逐单元格调用 normalize_date。
+        读取和标准化分别计时，source 为来源文件路径。
+        """
+        transformer = self.transformers[pattern]
+        transform_columns = transformer.transform_columns
         
-        return value
+        batch = FlowBatch()
+        rows = sheet.iter_rows(transformer.columns)
+        start_time = perf_counter()
+        normalize_time = 0.0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            # 跳过空行
+            chunk = [row for row in chunk if not all(v is None or v == "" for v in row)]
+            if not chunk:
+                continue
+            chunk_start = perf_counter()
+            batch.extend_columns(*transform_columns(chunk))
+            normalize_time += perf_counter() - chunk_start
+            self.processed_rows += len(chunk)
+        total_time = perf_counter() - start_time
+        self.metrics.add("read", total_time - normalize_time, source, pattern, len(batch), file_size(source))
+        self.metrics.add("normalize", normalize_time, source, pattern, len(batch))
+        return batch
     
-    def process_file(self, wb, pattern: str) -> Optional[List[List[Any]]]:
-        """根据识别的模式处理文件"""
-        if pattern == "unknown" or pattern not in self.pattern_definitions:
-            return None
-        
+    def append_data_to_summary(self, result: FlowBatch, source: str = "") -> None:
+        """将数据追加到汇总缓冲区，实际写入在 write_summary 中一次完成
+
+        source 为来源文件路径；启用去重时 result 应为该文件的全部数据。
+        """
+        if not result:
+            return
+        with self.metrics.stage("append", source, rows=len(result)):
+            self._append(result, source)
+    
+    def _append(self, result: FlowBatch, source: str) -> None:
+        if self.dedup is not None:
+            before = self.dedup.duplicate_count
+            result = self.dedup.filter_batch(result, os.path.basename(source))
+            found = self.dedup.duplicate_count - before
+            if found:
+                action = "已删除" if self.dedup.mode == "drop" else "已标记"
+                print(f"发现 {found} 行与之前文件重复的数据，{action}")
+        self.sink.add_batch(result)
+    
+    def write_summary(self, rows: Iterable[Sequence[Any]]) -> None:
+        """把全部汇总行写入汇总文件"""
+        with self.profile("汇总写出"):
+            if self.backend == "xlwings":
+                self.write_summary_xlwings(rows)
+            else:
+                self.write_summary_native(rows)
+    
+    def write_summary_native(self, rows: Iterable[Sequence[Any]]) -> None:
+        """流式写出汇总文件，附带透视表和重复行工作表"""
         try:
-            ws = wb.sheets[0]
-            pattern_info = self.pattern_definitions[pattern]
-            mapping = pattern_info["mapping"]
-            
-            # 获取数据范围
-            last_row = ws.used_range.last_cell.row
-            if last_row <= 1:
-                return []
-            
-            # 分批处理大文件，避免内存问题
-            batch_size = 1000
-            result = []
-            
-            for start_row in range(2, last_row + 1, batch_size):
-                end_row = min(start_row + batch_size - 1, last_row)
-                
-                # 只读取需要的列
-                max_col = max(mapping.keys())
-                data_range = f"A{start_row}:{chr(64+max_col)}{end_row}"
-                
-                try:
-                    batch_data = ws.range(data_range).value
-                    
-                    # 处理单行数据的情况
-                    if not isinstance(batch_data, list):
-                        batch_data = [batch_data] if batch_data is not None else []
-                    elif batch_data and not isinstance(batch_data[0], (list, tuple)):
-                        batch_data = [batch_data]
-                    
-                    # 处理批次数据
-                    for row_data in batch_data:
-                        if not isinstance(row_data, (list, tuple)) or row_data is None:
-                            continue
-                            
-                        # 跳过空行
-                        if all(v is None or v == "" for v in row_data):
-                            continue
-                        
-                        # 创建新行数据
-                        new_row = [None] * 6
-                        for src_col, dst_col in mapping.items():
-                            value = row_data[src_col-1] if src_col-1 < len(row_data) else None
-                            
-                            # 日期列特殊处理
-                            if dst_col == 1:
-                                value = self.normalize_date(value, pattern, src_col)
-                            elif isinstance(value, str):
-                                # 其他列的字符串处理
-                                if pattern == "pattern8" and src_col == 2:
-                                    if " " in value:
-                                        value = value.split(" ")[0]
-                                else:
-                                    value = value.replace(" ", "")
-                            
-                            new_row[dst_col-1] = value
-                        
-                        result.append(new_row)
-                        
-                except Exception as e:
-                    print(f"处理批次数据时出错 (行 {start_row}-{end_row}): {e}")
-                    continue
-            
-            self.processed_rows += len(result)
-            return result
-            
+            # 流式写出，不需要 Excel 进程；日期列的 YYYY-MM-DD 文本按日期写出
+            writer = XlsxWriter(self.summary_file)
+            try:
+                with self.metrics.stage("write") as event:
+                    count = event["rows"] = writer.add_sheet("Sheet1", self.summary_headers, rows,
+                                                             date_columns=(0,))
+                pivot = self.build_pivot()
+                if pivot is not None:
+                    writer.add_sheet("透视", pivot.headers, pivot.rows())
+                if self.dedup is not None and self.dedup.duplicate_count:
+                    writer.add_sheet("重复", ["来源文件"] + self.summary_headers,
+                                     self.dedup.duplicate_rows(), date_columns=(1,))
+            except Exception:
+                writer.abort()
+                raise
+            with self.metrics.stage("save") as event:
+                writer.close()
+                event["bytes"] = file_size(self.summary_file)
+            print(f"已写入 {count} 行数据到汇总文件")
         except Exception as e:
-            print(f"处理文件数据时出错: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            print(f"写入汇总文件失败: {e}")
     
-    def append_data_to_summary(self, result: List[List[Any]]) -> None:
-        """将数据追加到汇总文件"""
-        if not result:
-            return
-        
+    def write_summary_xlwings(self, rows: Iterable[Sequence[Any]]) -> None:
+        """通过 Excel 把全部汇总行写入汇总工作簿并保存一次"""
         try:
             ws = self.summary_wb.sheets[0]
             
-            # 找到下一个空行
-            last_row = ws.used_range.last_cell.row
-            next_row = last_row + 1
-            
             # 分批写入大量数据，避免Excel崩溃
             batch_size = 500
-            for i in range(0, len(result), batch_size):
-                batch = result[i:i+batch_size]
-                current_row = next_row + i
+            current_row = 2
+            rows = iter(rows)
+            while True:
+                batch = [list(row) for row in islice(rows, batch_size)]
+                if not batch:
+                    break
                 
                 try:
                     # 写入批次数据
@@ -287,32 +335,70 @@ class ExcelProcessor:
                             ws.range(f"A{current_row + j}:F{current_row + j}").value = [row]
                         except:
                             continue
+                current_row += len(batch)
             
             # 保存文件
-            self.summary_wb.save()
-            print(f"已追加 {len(result)} 行数据到汇总文件")
+            with self.metrics.stage("save"):
+                self.summary_wb.save()
+            print(f"已写入 {current_row - 2} 行数据到汇总文件")
+            
+            # 透视表单独写成文件，不经过 Excel
+            pivot = self.build_pivot()
+            if pivot is not None:
+                pivot_file = os.path.splitext(self.summary_file)[0] + "_透视.xlsx"
+                write_xlsx(pivot_file, pivot.headers, pivot.rows(), sheet_name="透视")
+                print(f"透视表已写出到: {pivot_file}")
             
         except Exception as e:
-            print(f"追加数据失败: {e}")
+            print(f"写入汇总文件失败: {e}")
+    
+    def build_pivot(self) -> Optional[PivotAggregator]:
+        """按 pivot_keys 对缓冲区中的全部数据做透视汇总"""
+        if not self.pivot_keys:
+            return None
+        with self.metrics.stage("pivot") as event:
+            pivot = PivotAggregator(self.pivot_keys).add_batches(self.sink.iter_batches())
+        elapsed = event["seconds"] * 1000
+        print(f"透视汇总: 按 {'/'.join(self.pivot_keys)} 分为 {len(pivot.groups)} 组 ({elapsed:.1f} ms)")
+        return pivot
+    
+    def get_store(self) -> FlowStore:
+        return FlowStore(self.store_dir or os.path.join(self.output_dir, "流向库"))
+    
+    def save_to_store(self) -> None:
+        """把本次整理的全部数据写入历史流向库的当天分区"""
+        try:
+            store = self.get_store()
+            with self.metrics.stage("store") as event:
+                count = event["rows"] = store.write_partition(self.summary_date, self.sink.iter_batches())
+            print(f"已写入流向库 {self.summary_date}: {count} 行")
+        except Exception as e:
+            print(f"写入流向库失败: {e}")
     
     def cleanup_work_dir(self) -> None:
-        """清空work_dir文件夹内的xlsx和xls文件"""
+        """删除work_dir文件夹内已成功整理的xlsx和xls文件
+
+        出错、未识别格式的文件不在 done_files 中，保留在工作目录里，避免丢失源数据。
+        """
         try:
             print("正在清空工作目录中的Excel文件...")
             
             # 获取所有Excel文件
-            excel_files = []
-            for ext in ['*.xls', '*.xlsx']:
-                excel_files.extend(glob.glob(os.path.join(self.work_dir, ext)))
+            excel_files = self.list_excel_files()
             
             if not excel_files:
                 print("工作目录中没有Excel文件需要清理")
                 return
             
+            done = set(self.done_files)
+            for file_path in excel_files:
+                if file_path not in done:
+                    print(f"未成功整理，保留: {os.path.basename(file_path)}")
+            
             success_count = 0
             failed_files = []
             
-            for file_path in excel_files:
+            for file_path in [f for f in excel_files if f in done]:
                 try:
                     os.remove(file_path)
                     success_count += 1
@@ -331,12 +417,89 @@ class ExcelProcessor:
         except Exception as e:
             print(f"清理工作目录时出错: {e}")
     
-    def process_excel_files(self) -> None:
-        """处理所有Excel文件 - 串行版本避免并发问题"""
-        # 获取所有Excel文件
+    def list_excel_files(self) -> List[str]:
+        """获取工作目录下所有Excel文件 (伪装成 .xls 的网页/文本表格按内容识别)
+
+        只收集 .xls/.xlsx：清理阶段会删除这里返回的全部文件，
+        下载目录中的其他 .csv/.tsv 不一定是流向文件。
+        """
         excel_files = []
         for ext in ['*.xls', '*.xlsx']:
             excel_files.extend(glob.glob(os.path.join(self.work_dir, ext)))
+        return excel_files
+    
+    def check_manifest(self, excel_files: List[str]) -> Tuple[List[str], Dict[str, ManifestEntry]]:
+        """增量模式：查清单，返回 (本次汇总的文件列表, 可直接复用整理结果的文件)
+
+        已计入之前日期汇总的文件视同已被清理，不再统计；内容相同的重复下载
+        与非增量模式一样照常统计，由 --dedup 判断重复行。
+        """
+        self.manifest.forget_missing(excel_files)
+        summary_date = self.summary_date.isoformat()
+        files = []
+        cached = {}
+        counted = 0
+        for file_path in excel_files:
+            entry, digest = self.manifest.lookup(file_path, summary_date)
+            if entry is not None and entry.summary_date < summary_date:
+                print(f"{os.path.basename(file_path)} 已计入 {entry.summary_date} 的汇总，跳过")
+                counted += 1
+                continue
+            self.file_digests[file_path] = digest
+            files.append(file_path)
+            if entry is not None and self.manifest.reusable(entry):
+                cached[file_path] = entry
+        print(f"增量模式: {counted} 个文件已计入之前的汇总，{len(cached)} 个文件复用整理结果，"
+              f"{len(files) - len(cached)} 个文件需要整理")
+        return files, cached
+    
+    def remember_file(self, file_path: str, pattern: str, rows_in_file: int, data: FlowBatch) -> None:
+        """增量模式：登记刚整理的文件及本次汇总日期"""
+        if self.manifest is None:
+            return
+        try:
+            with self.metrics.stage("manifest", file_path, pattern, rows=len(data)):
+                self.manifest.record(file_path, self.file_digests[file_path], pattern, rows_in_file,
+                                     data, self.summary_date.isoformat())
+        except Exception as e:
+            print(f"登记文件 {os.path.basename(file_path)} 失败: {e}")
+    
+    def merge_cached(self, file_path: str, entry: ManifestEntry) -> None:
+        """把清单中保存的整理结果追加到汇总缓冲区"""
+        name = os.path.basename(file_path)
+        print(f"未变化，使用上次的整理结果: {name} 格式: {entry.pattern}")
+        try:
+            batch_path = self.manifest.batch_path(entry.digest)
+            with self.metrics.stage("cache", file_path, entry.pattern, nbytes=file_size(batch_path)) as event:
+                data = self.manifest.load_batch(entry)
+                event["rows"] = len(data)
+            self.processed_rows += len(data)
+        except Exception as e:
+            # 结果文件损坏时重新整理该文件 (read_batch 中已计入 processed_rows)
+            print(f"读取 {name} 的整理结果失败，重新整理: {e}")
+            pattern, rows_in_file, data = self.read_file(file_path)
+            entry = self.manifest.record(file_path, entry.digest, pattern, rows_in_file, data,
+                                         self.summary_date.isoformat())
+        self.append_data_to_summary(data, file_path)
+        self.total_rows += entry.file_rows
+    
+    def read_file(self, file_path: str) -> Tuple[str, int, FlowBatch]:
+        """识别并整理单个文件，返回 (格式, 文件行数, 整理后的数据)"""
+        with self.profile(file_path):
+            pattern = self.timed_sniff(file_path)
+            sheet = self.timed_open(file_path, pattern)
+            try:
+                batch = FlowBatch()
+                if pattern != "unknown":
+                    batch = self.read_batch(sheet, pattern, file_path)
+                return pattern, self.timed_count(sheet, file_path, pattern), batch
+            finally:
+                sheet.close()
+    
+    def process_excel_files(self) -> None:
+        """处理所有Excel文件"""
+        # 获取所有Excel文件，按文件名排序保证汇总顺序稳定
+        excel_files = sorted(self.list_excel_files(), key=os.path.basename)
         
         print(f"找到 {len(excel_files)} 个Excel文件")
         
@@ -344,66 +507,171 @@ class ExcelProcessor:
             print("没有找到Excel文件")
             return
         
-        # 统计总行数
-        print("正在统计文件行数...")
-        for file_path in excel_files:
-            wb = None
-            try:
-                wb = self.app.books.open(file_path)
-                rows = self.count_file_rows(wb)
-                self.total_rows += rows
-                print(f"文件 {os.path.basename(file_path)} 包含 {rows} 行数据")
-            except Exception as e:
-                print(f"统计文件 {os.path.basename(file_path)} 行数时出错: {e}")
-            finally:
-                if wb:
-                    try:
-                        wb.close()
-                    except:
-                        pass
+        cached = {}
+        if self.manifest is not None:
+            with self.metrics.stage("lookup", nbytes=sum(map(file_size, excel_files))):
+                excel_files, cached = self.check_manifest(excel_files)
         
-        print(f"所有文件共包含 {self.total_rows} 行数据")
+        if self.workers > 1:
+            if self.backend == "native":
+                self.process_excel_files_parallel(excel_files, cached)
+                return
+            print("xlwings 后端不支持多进程，改为串行处理")
+        
+        # 只读表头识别格式，未识别的文件不读取数据行
+        print("正在识别文件格式...")
+        patterns = self.classify_files([f for f in excel_files if f not in cached])
         
         # 串行处理文件
         processed_files = 0
         for file_path in excel_files:
-            wb = None
+            sheet = None
             try:
                 print(f"正在处理: {os.path.basename(file_path)} ({processed_files + 1}/{len(excel_files)})")
                 
-                wb = self.app.books.open(file_path)
+                if file_path in cached:
+                    self.merge_cached(file_path, cached[file_path])
+                    processed_files += 1
+                    self.done_files.append(file_path)
+                    self.sink.file_done()
+                    continue
                 
-                # 识别文件格式
-                pattern = self.get_file_pattern(wb)
+                pattern = patterns[file_path]
                 print(f"识别为格式: {pattern}")
                 
-                if pattern != "unknown":
-                    data = self.process_file(wb, pattern)
-                    if data:
-                        self.append_data_to_summary(data)
-                        print(f"成功处理 {len(data)} 行数据")
-                else:
-                    print(f"未识别的文件格式，跳过文件: {os.path.basename(file_path)}")
+                with self.profile(file_path):
+                    sheet = self.timed_open(file_path, pattern)
+                    batch = FlowBatch()
+                    if pattern != "unknown":
+                        # 流式读取，按列累积后追加到汇总缓冲区
+                        batch = self.read_batch(sheet, pattern, file_path)
+                    else:
+                        print(f"未识别的文件格式，跳过文件: {os.path.basename(file_path)}")
+                    
+                    # 行数在处理的同一遍中统计，未识别的文件只读取 <dimension>
+                    rows = self.timed_count(sheet, file_path, pattern)
+                self.remember_file(file_path, pattern, rows, batch)
+                if batch:
+                    self.append_data_to_summary(batch, file_path)
+                    print(f"成功处理 {len(batch)} 行数据")
+                self.total_rows += rows
+                print(f"文件 {os.path.basename(file_path)} 包含 {rows} 行数据")
                 
                 processed_files += 1
+                if pattern != "unknown":
+                    self.done_files.append(file_path)
+                self.sink.file_done()
                 
             except Exception as e:
                 print(f"处理文件 {os.path.basename(file_path)} 时出错: {e}")
                 import traceback
                 traceback.print_exc()
             finally:
-                if wb:
+                if sheet:
                     try:
-                        wb.close()
+                        sheet.close()
                     except:
                         pass
+        
+        print(f"所有文件共包含 {self.total_rows} 行数据")
+    
+    def process_excel_files_parallel(self, excel_files: List[str],
+                                     cached: Optional[Dict[str, ManifestEntry]] = None) -> None:
+        """多进程解析文件，按文件名顺序合并到汇总文件"""
+        print(f"使用 {self.workers} 个进程并行处理")
+        cached = cached or {}
+        to_parse = [f for f in excel_files if f not in cached]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # map 按提交顺序返回结果，合并顺序与串行版本一致
+            profile_dir = self.profiler.directory if self.profiler is not None else None
+            results = executor.map(read_file_task, [self.backend] * len(to_parse), to_parse,
+                                   [self.patterns_file] * len(to_parse), [profile_dir] * len(to_parse))
+            for index, file_path in enumerate(excel_files, 1):
+                name = os.path.basename(file_path)
+                if file_path in cached:
+                    self.merge_cached(file_path, cached[file_path])
+                    self.done_files.append(file_path)
+                    self.sink.file_done()
+                    continue
+                pattern, rows_in_file, data, cache_stats, events, error = next(results)
+                self.cache.merge(cache_stats)
+                self.metrics.merge(events)
+                print(f"正在合并: {name} ({index}/{len(excel_files)}) 格式: {pattern}")
+                counted = 0
+                if error:
+                    print(f"处理文件 {name} 时出错: {error}")
+                    if not self.excel_fallback:
+                        continue
+                    # 工作进程不启动 Excel，本地无法解析的文件在主进程中改由 Excel 重新整理
+                    try:
+                        pattern, rows_in_file, data = self.read_file(file_path)
+                        # read_batch 中已计入 processed_rows
+                        counted = len(data)
+                    except Exception as e:
+                        print(f"处理文件 {name} 时出错: {e}")
+                        continue
+                
+                self.remember_file(file_path, pattern, rows_in_file, data)
+                if pattern == "unknown":
+                    print(f"未识别的文件格式，跳过文件: {name}")
+                elif data:
+                    self.append_data_to_summary(data, file_path)
+                    print(f"成功处理 {len(data)} 行数据")
+                
+                self.processed_rows += len(data) - counted
+                self.total_rows += rows_in_file
+                print(f"文件 {name} 包含 {rows_in_file} 行数据")
+                if pattern != "unknown":
+                    self.done_files.append(file_path)
+                self.sink.file_done()
+        
+        print(f"所有文件共包含 {self.total_rows} 行数据")
+    
+    def query_store(self, export: Optional[str] = None, **conditions) -> None:
+        """查询历史流向库，打印结果或写出到 .xlsx"""
+        store = self.get_store()
+        rows = store.query(**conditions)
+        headers = ["汇总日期"] + self.summary_headers
+        count = 0
+        total = 0.0
+        
+        def counted(rows):
+            nonlocal count, total
+            for row in rows:
+                count += 1
+                if isinstance(row[-1], (int, float)) and row[-1] == row[-1]:
+                    total += row[-1]
+                yield row
+        
+        if export:
+            write_xlsx(export, headers, counted(rows), date_columns=(0, 1))
+            print(f"查询结果已写出到: {export}")
+        else:
+            print("\t".join(headers))
+            for row in counted(rows):
+                print("\t".join("" if v is None else str(v) for v in row))
+        print(f"共 {count} 行，数量合计 {total:g}")
+    
+    def report_metrics(self) -> None:
+        """打印分阶段、分格式的耗时表，并按需写出 JSON Lines"""
+        print("各阶段耗时:")
+        for line in self.metrics.report():
+            print(line)
+        if self.metrics_file is None:
+            return
+        metrics_file = self.metrics_file or os.path.splitext(self.summary_file)[0] + "_metrics.jsonl"
+        try:
+            self.metrics.write_jsonl(metrics_file)
+            print(f"计时明细已写入: {metrics_file}")
+        except Exception as e:
+            print(f"写入计时明细失败: {e}")
     
     def run(self) -> None:
         """运行主程序"""
         print("开始流向整理程序...")
         
-        # 1. 初始化Excel
-        if not self.initialize_excel():
+        # 1. 初始化Excel (native 后端读写都不需要 Excel)
+        if self.backend == "xlwings" and not self.initialize_excel():
             return
         
         try:
@@ -411,30 +679,51 @@ class ExcelProcessor:
             summary_file = self.create_summary_file()
             if not summary_file:
                 return
+            if self.profile_enabled and self.profiler is None:
+                self.profiler = Profiler(os.path.splitext(summary_file)[0] + "_profile")
             
-            # 3. 处理所有Excel文件
+            # 3. 处理所有Excel文件，汇总行先缓冲，最后一次性写出
             start_time = datetime.now()
+            self.sink = SummarySink(self.write_summary, checkpoint_every=self.checkpoint_every)
+            if self.incremental:
+                self.manifest = Manifest(self.state_dir, self.patterns_version)
             self.process_excel_files()
+            if self.use_store:
+                self.save_to_store()
+            self.sink.finish()
             end_time = datetime.now()
             
             # 4. 打印汇总信息
             processing_time = (end_time - start_time).total_seconds()
             print(f"处理耗时: {processing_time:.2f} 秒")
             print(f"总计处理了 {self.processed_rows} 行数据")
+            if self.dedup is not None:
+                action = "已从汇总中删除" if self.dedup.mode == "drop" else "保留在汇总中"
+                print(f"重复数据: {self.dedup.duplicate_count} 行，{action}")
+            for line in self.cache.report():
+                print(line)
             
             if self.total_rows > 0:
                 print(f"处理率: {self.processed_rows/self.total_rows*100:.2f}%")
                 if self.processed_rows < self.total_rows:
                     print(f"警告：有 {self.total_rows - self.processed_rows} 行数据未被处理")
             
-            # 5. 清空work_dir文件夹内的xlsx和xls文件
-            self.cleanup_work_dir()
+            # 5. 清空work_dir文件夹内的输入文件 (增量模式保留文件，清单按汇总日期跳过已计入的文件)
+            if self.incremental:
+                print("增量模式: 保留工作目录中的文件")
+            else:
+                with self.metrics.stage("cleanup"):
+                    self.cleanup_work_dir()
+            self.report_metrics()
+            if self.profiler is not None:
+                print(f"剖析结果已写入: {self.profiler.directory}")
             
             # 6. 打开输出目录
-            try:
-                os.startfile(self.output_dir)
-            except:
-                print(f"无法打开输出目录: {self.output_dir}")
+            if self.open_output:
+                try:
+                    os.startfile(self.output_dir)
+                except:
+                    print(f"无法打开输出目录: {self.output_dir}")
             
             print("流向整理完成！")
             
@@ -444,6 +733,9 @@ class ExcelProcessor:
             traceback.print_exc()
         
         finally:
+            if self.manifest is not None:
+                self.manifest.close()
+                self.manifest = None
             # 确保Excel应用关闭
             if self.app:
                 try:
@@ -453,27 +745,114 @@ class ExcelProcessor:
                 except:
                     pass
 
-if __name__ == "__main__":
+def read_file_task(backend: str, file_path: str, patterns_file: Optional[str] = None,
+                   profile_dir: Optional[str] = None
+                   ) -> Tuple[str, int, FlowBatch, Dict, List[Dict], Optional[str]]:
+    """工作进程入口：整理单个文件，列式数据、缓存统计和计时事件直接序列化回主进程，异常以文本返回"""
+    processor = ExcelProcessor(backend=backend, patterns_file=patterns_file, profile_dir=profile_dir)
+    # 需要 Excel 的文件由主进程重新整理
+    processor.excel_fallback = False
     try:
-        # 检查Excel是否已安装
+        pattern, rows_in_file, data = processor.read_file(file_path)
+        return pattern, rows_in_file, data, processor.cache.stats(), processor.metrics.events, None
+    except Exception as e:
+        return "unknown", 0, FlowBatch(), processor.cache.stats(), processor.metrics.events, str(e)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="湖北区域每日流向整理")
+    parser.add_argument("--backend", choices=["native", "xlwings"], default="native",
+                        help="读取后端: native 直接解析文件 (默认), xlwings 通过 Excel 打开")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行解析文件的进程数 (仅 native 后端)，默认 1 为串行")
+    parser.add_argument("--checkpoint", type=int, default=0,
+                        help="每处理 N 个文件写出一次汇总文件作为检查点，默认只在最后写出一次")
+    parser.add_argument("--classify", action="store_true",
+                        help="只读取表头识别工作目录下各文件的格式，不整理数据")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量模式: 不清空工作目录，已计入之前日期汇总的文件不再统计，"
+                             "当天重跑时未变化的文件复用整理结果")
+    parser.add_argument("--state-dir", default=None,
+                        help="增量模式的清单和整理结果目录，默认 ~/.zhengli")
+    parser.add_argument("--store", default=None,
+                        help="历史流向库目录，默认为输出目录下的 流向库")
+    parser.add_argument("--no-store", action="store_true",
+                        help="不把本次数据写入历史流向库")
+    parser.add_argument("--query", action="store_true",
+                        help="查询历史流向库后退出，可配合 --product/--batch/--customer/--since/--until")
+    parser.add_argument("--product", help="查询条件: 品种")
+    parser.add_argument("--batch", help="查询条件: 批号")
+    parser.add_argument("--customer", help="查询条件: 流向单位")
+    parser.add_argument("--since", type=date.fromisoformat, help="查询起始汇总日期 YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="查询截止汇总日期 YYYY-MM-DD")
+    parser.add_argument("--contains", action="store_true", help="查询条件按包含匹配，默认完全匹配")
+    parser.add_argument("--export", help="查询结果写出到 .xlsx 文件，默认打印到屏幕")
+    parser.add_argument("--pivot", nargs="?", const=",".join(DEFAULT_KEYS), default=None, type=parse_keys,
+                        help="在汇总文件中增加按指定列合计数量的透视表，默认 品种,规格,流向单位")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default=None,
+                        help="检测与之前文件重复的行: drop 删除，flag 保留并在 重复 工作表中列出")
+    parser.add_argument("--metrics", nargs="?", const="", default=None,
+                        help="把各阶段计时以 JSON Lines 追加写入指定文件，默认写在汇总文件旁")
+    parser.add_argument("--profile", nargs="?", const="", default=None,
+                        help="按文件剖析读取整理和汇总写出 (cProfile + tracemalloc)，结果默认写在汇总文件旁")
+    parser.add_argument("--patterns", default=None,
+                        help="格式定义文件，默认使用 zhengli/patterns.json")
+    parser.add_argument("--pattern-report", action="store_true",
+                        help="列出容易混淆的格式对后退出")
+    args = parser.parse_args()
+    
+    if args.pattern_report:
+        index = ExcelProcessor(patterns_file=args.patterns).pattern_index
+        print(f"共 {len(index.headers)} 种格式，参与识别的表头列 {len(index.columns)} 列")
+        for line in index.ambiguity_report():
+            print(line)
+        sys.exit(0)
+    
+    if args.query:
+        processor = ExcelProcessor(patterns_file=args.patterns, store_dir=args.store)
+        processor.query_store(product=args.product, batch_no=args.batch, customer=args.customer,
+                              since=args.since, until=args.until, contains=args.contains,
+                              export=args.export)
+        sys.exit(0)
+    
+    if args.classify:
+        processor = ExcelProcessor(backend=args.backend, patterns_file=args.patterns)
+        # xlwings 后端下本地无法解析的文件需要通过 Excel 读取表头
+        if args.backend == "xlwings" and not processor.initialize_excel():
+            sys.exit(1)
         try:
-            import win32com.client
+            processor.classify_files(processor.list_excel_files())
+        finally:
+            if processor.app:
+                processor.app.quit()
+        sys.exit(0)
+    
+    try:
+        # 检查Excel是否已安装 (仅 xlwings 后端需要)
+        if args.backend == "xlwings":
             try:
-                excel_check = win32com.client.GetActiveObject("Excel.Application")
-                del excel_check  # 释放对象
-                print("检测到Excel已运行")
-            except:
-                # 尝试创建新实例检查是否可用
-                excel_check = win32com.client.Dispatch("Excel.Application")
-                excel_check.Quit()
-                del excel_check
-                print("Excel已安装但未运行")
-        except Exception as e:
-            print(f"警告: 无法检测Excel: {e}")
-            print("请确保Excel已正确安装")
-            input("按回车键继续...")
+                import win32com.client
+                try:
+                    excel_check = win32com.client.GetActiveObject("Excel.Application")
+                    del excel_check  # 释放对象
+                    print("检测到Excel已运行")
+                except:
+                    # 尝试创建新实例检查是否可用
+                    excel_check = win32com.client.Dispatch("Excel.Application")
+                    excel_check.Quit()
+                    del excel_check
+                    print("Excel已安装但未运行")
+            except Exception as e:
+                print(f"警告: 无法检测Excel: {e}")
+                print("请确保Excel已正确安装")
+                input("按回车键继续...")
         
-        processor = ExcelProcessor()
+        processor = ExcelProcessor(backend=args.backend, workers=args.workers,
+                                   checkpoint_every=args.checkpoint, patterns_file=args.patterns,
+                                   incremental=args.incremental, state_dir=args.state_dir,
+                                   store_dir=args.store, use_store=not args.no_store,
+                                   pivot_keys=args.pivot or (), dedup=args.dedup,
+                                   metrics_file=args.metrics, profile=args.profile is not None,
+                                   profile_dir=args.profile or None)
         processor.run()
     except Exception as e:
         print(f"程序启动失败: {e}")
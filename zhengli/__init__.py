@@ -0,0 +1,4 @@
+"""流向整理公共组件
+
+各 zhengli-*.py 入口脚本共用的读取后端等模块。
+"""
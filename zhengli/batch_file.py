@@ -0,0 +1,283 @@
+"""FlowBatch 的二进制文件格式
+
+增量模式下每个输入文件的整理结果按此格式保存，读取时 mmap 文件，
+各列直接从映射区复制为 array，不经过 pickle 逐对象重建。
+
+布局 (小端):
+    0   魔数 b"ZLFB"
+    4   u32 格式版本
+    8   u64 行数 n
+    16  u32 字典值个数 (不含编码 0)
+    20  u32 无法转换的数量原始值个数 r
+    24  u64 字典数据字节数
+    32  u64 原始数量值数据字节数
+    40  保留，补齐到 64
+    64  数量      f8 × n
+        日期      i4 × n
+        品种/规格/批号/流向单位  i4 × n 各一列
+        字典      u64 偏移 × (个数 + 1)，随后为编码后的值
+        原始数量  u64 行号 × r，u64 偏移 × (r + 1)，随后为编码后的值
+
+值编码为 1 字节类型标记加内容: s 文本 (UTF-8)、i 整数、f 浮点、b 布尔、
+D 日期、T 日期时间 (ISO 文本)，其他类型以 p 标记 pickle 保存。
+
+MappedBatch 只读映射同样的文件，各列以 memoryview 直接引用映射区，不复制数据。
+"""
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from zhengli.flow_batch import TEXT_COLUMNS, FlowBatch, StringDictionary
+
+MAGIC = b"ZLFB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQIIQQ")
+HEADER_SIZE = 64
+
+_INT64 = struct.Struct("<q")
+_FLOAT64 = struct.Struct("<d")
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _column(view: memoryview, typecode: str, offset: int, count: int) -> Tuple[array, int]:
+    column = array(typecode)
+    end = offset + column.itemsize * count
+    column.frombytes(view[offset:end])
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column, end
+
+
+def encode_value(value: Any) -> bytes:
+    if isinstance(value, str):
+        return b"s" + value.encode("utf-8")
+    if isinstance(value, bool):
+        return b"b" + (b"\x01" if value else b"\x00")
+    if isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+        return b"i" + _INT64.pack(value)
+    if isinstance(value, float):
+        return b"f" + _FLOAT64.pack(value)
+    if isinstance(value, datetime):
+        return b"T" + value.isoformat().encode("ascii")
+    if isinstance(value, date):
+        return b"D" + value.isoformat().encode("ascii")
+    return b"p" + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_value(data: bytes) -> Any:
+    tag, body = data[:1], data[1:]
+    if tag == b"s":
+        return body.decode("utf-8")
+    if tag == b"i":
+        return _INT64.unpack(body)[0]
+    if tag == b"f":
+        return _FLOAT64.unpack(body)[0]
+    if tag == b"b":
+        return body == b"\x01"
+    if tag == b"T":
+        return datetime.fromisoformat(body.decode("ascii"))
+    if tag == b"D":
+        return date.fromisoformat(body.decode("ascii"))
+    if tag == b"p":
+        return pickle.loads(body)
+    raise ValueError(f"未知的值类型标记: {tag!r}")
+
+
+def _encode_values(values: Sequence[Any]) -> bytes:
+    """值列表编码为 偏移表 + 数据"""
+    offsets = array("Q", [0])
+    chunks = []
+    for value in values:
+        chunk = encode_value(value)
+        chunks.append(chunk)
+        offsets.append(offsets[-1] + len(chunk))
+    return _little_endian(offsets) + b"".join(chunks)
+
+
+def _decode_values(view: memoryview, offset: int, count: int) -> Tuple[List[Any], int]:
+    offsets, start = _column(view, "Q", offset, count + 1)
+    values = [decode_value(bytes(view[start + offsets[i]:start + offsets[i + 1]])) for i in range(count)]
+    return values, start + offsets[count]
+
+
+def save_batch(file_path: str, batch: FlowBatch) -> None:
+    """把 FlowBatch 写入文件，先写临时文件再替换，不会留下半个文件"""
+    dictionary = _encode_values(batch.dictionary.values[1:])
+    raw_rows = sorted(batch.raw_quantities)
+    raw = (_little_endian(array("Q", raw_rows))
+           + _encode_values([batch.raw_quantities[row] for row in raw_rows]))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(batch), len(batch.dictionary) - 1,
+                         len(raw_rows), len(dictionary), len(raw))
+
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        f.write(_little_endian(batch.quantities))
+        f.write(_little_endian(batch.days))
+        for name in TEXT_COLUMNS:
+            f.write(_little_endian(getattr(batch, name)))
+        f.write(dictionary)
+        f.write(raw)
+    os.replace(tmp_path, file_path)
+
+
+def load_batch(file_path: str) -> FlowBatch:
+    """读取 save_batch 写出的文件"""
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_SIZE:
+            raise ValueError(f"不是有效的整理结果文件: {file_path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return _read(view, file_path)
+            finally:
+                view.release()
+
+
+def _read(view: memoryview, file_path: str) -> FlowBatch:
+    magic, version, rows, dict_count, raw_count, _, _ = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"不是有效的整理结果文件: {file_path}")
+
+    dictionary = StringDictionary()
+    batch = FlowBatch(dictionary)
+    offset = HEADER_SIZE
+    batch.quantities, offset = _column(view, "d", offset, rows)
+    batch.days, offset = _column(view, "i", offset, rows)
+    for name in TEXT_COLUMNS:
+        column, offset = _column(view, "i", offset, rows)
+        setattr(batch, name, column)
+
+    values, offset = _decode_values(view, offset, dict_count)
+    dictionary.__setstate__([None] + values)
+    raw_rows, offset = _column(view, "Q", offset, raw_count)
+    raw_values, offset = _decode_values(view, offset, raw_count)
+    batch.raw_quantities = dict(zip(raw_rows, raw_values))
+    return batch
+
+
+class MappedBatch:
+    """只读映射的 FlowBatch 文件
+
+    days/quantities/products/... 为指向映射区的 memoryview (大端平台上为复制的 array)，
+    字典值按需解码。用完需调用 close，或作为上下文管理器使用。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size < HEADER_SIZE:
+                raise ValueError(f"不是有效的整理结果文件: {file_path}")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        self._columns: List[memoryview] = []
+        magic, version, rows, dict_count, raw_count, _, _ = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"不是有效的整理结果文件: {file_path}")
+        self.rows = rows
+        offset = HEADER_SIZE
+        self.quantities, offset = self._map_column("d", offset, rows)
+        self.days, offset = self._map_column("i", offset, rows)
+        for name in TEXT_COLUMNS:
+            column, offset = self._map_column("i", offset, rows)
+            setattr(self, name, column)
+        self._dict_offsets, self._dict_start = _column(self._view, "Q", offset, dict_count + 1)
+        self.dict_count = dict_count
+        offset = self._dict_start + self._dict_offsets[dict_count]
+        raw_rows, offset = _column(self._view, "Q", offset, raw_count)
+        self._raw_rows = raw_rows
+        self._raw_offset = offset
+        self._raw_quantities: Optional[Dict[int, Any]] = None
+        self._values: Dict[int, Any] = {}
+
+    def _map_column(self, typecode: str, offset: int, count: int):
+        size = array(typecode).itemsize
+        if sys.byteorder != "little":
+            return _column(self._view, typecode, offset, count)
+        view = self._view[offset:offset + size * count].cast(typecode)
+        self._columns.append(view)
+        return view, offset + size * count
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __enter__(self) -> "MappedBatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def raw_value(self, code: int) -> bytes:
+        """字典编码对应值的编码字节"""
+        start = self._dict_start
+        return bytes(self._view[start + self._dict_offsets[code - 1]:start + self._dict_offsets[code]])
+
+    def value(self, code: int) -> Any:
+        if code == 0:
+            return None
+        value = self._values.get(code, self)
+        if value is self:
+            value = self._values[code] = decode_value(self.raw_value(code))
+        return value
+
+    def find_codes(self, predicate: Callable[[Any], bool]) -> List[int]:
+        """满足条件的字典值的编码"""
+        return [code for code in range(1, self.dict_count + 1) if predicate(self.value(code))]
+
+    def quantity_value(self, index: int) -> Any:
+        quantity = self.quantities[index]
+        if quantity != quantity:
+            if self._raw_quantities is None:
+                values, _ = _decode_values(self._view, self._raw_offset, len(self._raw_rows))
+                self._raw_quantities = dict(zip(self._raw_rows, values))
+            return self._raw_quantities.get(index)
+        return quantity
+
+    def row(self, index: int) -> Tuple[Any, ...]:
+        day = self.days[index]
+        day_value = date.fromordinal(day) if day > 0 else self.value(-day)
+        return (day_value, self.value(self.products[index]), self.value(self.specs[index]),
+                self.value(self.batches[index]), self.value(self.customers[index]), self.quantity_value(index))
+
+    def select(self, column: str, codes: Sequence[int]) -> Iterator[int]:
+        """某一文本列的编码属于 codes 的行号"""
+        wanted = set(codes)
+        if not wanted:
+            return iter(())
+        values = getattr(self, column)
+        if len(wanted) == 1:
+            code = next(iter(wanted))
+            return (index for index, value in enumerate(values) if value == code)
+        return (index for index, value in enumerate(values) if value in wanted)
+
+    def close(self) -> None:
+        for view in self._columns:
+            view.release()
+        self._columns = []
+        for name in ("quantities", "days") + TEXT_COLUMNS:
+            setattr(self, name, None)
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
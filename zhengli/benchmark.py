@@ -0,0 +1,252 @@
+"""性能基准
+
+按 patterns.json 中每种格式的表头布局生成指定行数的模拟流向文件 (.xlsx 或 .xls)，
+日期列分别使用日期单元格、带时间的日期单元格、ISO 文本、带时间的 ISO 文本、斜杠文本、
+8 位数字和 8 位数字文本 (见 DATE_STYLES)。不生成没有日期格式的 Excel 序列日期数字，
+该快速路径不在基准覆盖范围内。同样的种子生成同样的文件，不同版本之间的结果可以直接比较。
+
+结果以 JSON 保存，每个用例记录行数、耗时、吞吐量、峰值内存和各阶段耗时；
+compare_results 与上一次的结果逐项比较，超过阈值的变慢或内存增长列为回退。
+"""
+import json
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from zhengli.xlsx_writer import write_xlsx
+
+DEFAULT_SEED = 20240101
+FILE_FORMATS = ("xlsx", "xls")
+# .xls 工作表最多 65536 行 (含表头)
+XLS_MAX_ROWS = 65535
+FIRST_DAY = date(2024, 1, 1)
+
+# 各格式日期列的写法，未列出的格式使用 ISO 文本
+DATE_STYLES = {
+    "pattern1": "date",
+    "pattern2": "iso",
+    "pattern3": "slash",
+    "pattern4": "compact_number",
+    "pattern5": "datetime",
+    "pattern6": "compact_text",
+    "pattern7": "date",
+    "pattern8": "datetime_text",
+    "pattern9": "iso",
+}
+
+_PRODUCTS = ["阿莫西林胶囊", "头孢克肟分散片", "布洛芬缓释胶囊", "复方甘草片", "蒙脱石散", "奥美拉唑肠溶胶囊",
+             "氯雷他定片", "连花清瘟胶囊", "板蓝根颗粒", "维生素C片", "阿奇霉素片", "硝苯地平控释片"]
+_FORMS = ["0.25g*24粒", "0.1g*12片", "10ml*10支", "3g*10袋", "20mg*14粒", "5mg*6片", "0.5g*20片"]
+_CITIES = ["武汉", "宜昌", "襄阳", "荆州", "十堰", "黄石", "孝感", "黄冈", "咸宁", "随州", "恩施", "鄂州"]
+_KINDS = ["市第一人民医院", "市中心医院", "大药房连锁有限公司", "医药有限公司", "社区卫生服务中心", "诊所"]
+
+
+def _format_day(day: date, style: str, rng: random.Random) -> Any:
+    if style == "date":
+        return day
+    if style == "datetime":
+        return datetime(day.year, day.month, day.day, rng.randrange(8, 18), rng.randrange(60))
+    if style == "datetime_text":
+        return f"{day.isoformat()} {rng.randrange(8, 18):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+    if style == "slash":
+        return f"{day.year}/{day.month}/{day.day}"
+    if style == "compact_number":
+        return day.year * 10000 + day.month * 100 + day.day
+    if style == "compact_text":
+        return day.strftime("%Y%m%d")
+    return day.isoformat()
+
+
+class FlowGenerator:
+    """模拟流向行：品种、客户等取值数量固定，重复度接近真实导出"""
+
+    def __init__(self, seed: int = DEFAULT_SEED, products: int = 300, customers: int = 2000, days: int = 31):
+        rng = random.Random(seed)
+        self.rng = rng
+        count = len(_PRODUCTS)
+        self.products = [(f"{_PRODUCTS[index % count]}{index // count or ''}", rng.choice(_FORMS))
+                         for index in range(products)]
+        self.customers = [f"{rng.choice(_CITIES)}{rng.choice(_KINDS)}{index}" for index in range(customers)]
+        self.days = [FIRST_DAY + timedelta(days=offset) for offset in range(days)]
+
+    def rows(self, count: int, date_style: str):
+        """逐行生成 (日期, 品种, 规格, 批号, 流向单位, 数量)"""
+        rng = self.rng
+        for _ in range(count):
+            product, spec = rng.choice(self.products)
+            # 批号一半为纯数字 (读出为数值)，一半为字母开头的文本；名称偶尔带首尾空格
+            if rng.random() < 0.5:
+                batch_no = rng.randrange(23010001, 23129999)
+            else:
+                batch_no = f"B{rng.randrange(230101, 231231)}{rng.randrange(10)}"
+            if rng.random() < 0.1:
+                product = f" {product} "
+            quantity = rng.randrange(1, 200) if rng.random() < 0.95 else rng.randrange(1, 2000) / 10
+            yield (_format_day(rng.choice(self.days), date_style, rng), product, spec, batch_no,
+                   rng.choice(self.customers), quantity)
+
+
+def pattern_layout(pattern_info: Dict[str, Any]) -> Tuple[List[Optional[str]], List[Tuple[int, int]]]:
+    """格式定义转换为 (表头行, [(汇总列序号 0-5, 源列序号 0 起)])"""
+    headers = {int(col): name for col, name in pattern_info["headers"].items()}
+    mapping = [(int(dst) - 1, int(src) - 1) for src, dst in pattern_info["mapping"].items()]
+    width = max(list(headers) + [src + 1 for _, src in mapping])
+    header_row: List[Optional[str]] = [None] * width
+    for col, name in headers.items():
+        header_row[col - 1] = name
+    # 表头中其余列填入占位名称，与真实导出一样存在不需要的列
+    for index, name in enumerate(header_row):
+        if name is None:
+            header_row[index] = f"备注{index + 1}"
+    return header_row, sorted(mapping)
+
+
+def generate_pattern_file(file_path: str, pattern: str, pattern_info: Dict[str, Any], rows: int,
+                          seed: int = DEFAULT_SEED) -> int:
+    """按一种格式生成 .xlsx/.xls 文件 (按扩展名)，返回写出的数据行数"""
+    header_row, mapping = pattern_layout(pattern_info)
+    width = len(header_row)
+    generator = FlowGenerator(seed)
+    style = DATE_STYLES.get(pattern, "iso")
+
+    def source_rows():
+        for values in generator.rows(rows, style):
+            row: List[Any] = [None] * width
+            for dst, src in mapping:
+                row[src] = values[dst]
+            yield row
+
+    if file_path.lower().endswith(".xls"):
+        # .xls 写出器只用于基准和测试样例，放在仓库根目录 (与 zhengli-benchmark.py 同级)
+        from xls_writer import write_xls
+        return write_xls(file_path, header_row, source_rows())
+    return write_xlsx(file_path, header_row, source_rows())
+
+
+def generate_dataset(directory: str, definitions: Dict[str, Dict[str, Any]], rows: int,
+                     patterns: Optional[Sequence[str]] = None, seed: int = DEFAULT_SEED,
+                     progress: Optional[Callable[[str], None]] = None, file_format: str = "xlsx") -> List[str]:
+    """为每种格式生成一个文件，已存在的文件直接复用，返回文件路径列表"""
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"不支持的文件类型: {file_format}，可选: {'/'.join(FILE_FORMATS)}")
+    if file_format == "xls" and rows > XLS_MAX_ROWS:
+        raise ValueError(f".xls 文件最多 {XLS_MAX_ROWS} 行数据")
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for index, pattern in enumerate(patterns or sorted(definitions)):
+        if pattern not in definitions:
+            raise ValueError(f"未定义的格式: {pattern}")
+        file_path = os.path.join(directory, f"{pattern}.{file_format}")
+        if not os.path.exists(file_path):
+            if progress:
+                progress(f"生成 {pattern}.{file_format} {rows:,} 行")
+            # 每种格式使用不同的种子，避免各文件内容完全相同而被当作重复文件
+            generate_pattern_file(file_path, pattern, definitions[pattern], rows, seed + index)
+        files.append(file_path)
+    return files
+
+
+def peak_rss() -> Dict[str, int]:
+    """本进程和已结束子进程的峰值常驻内存 (字节)，无法获取时为空"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows()
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale}
+
+
+def _peak_rss_windows() -> Dict[str, int]:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return {}
+        return {"self": counters.PeakWorkingSetSize}
+    except Exception:
+        return {}
+
+
+def case_key(case: Dict[str, Any]) -> Tuple[str, int, int, Tuple[str, ...]]:
+    return case.get("format", "xlsx"), case["rows_per_file"], case["workers"], tuple(case["patterns"])
+
+
+def load_results(file_path: str) -> Dict[str, Any]:
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(file_path: str, results: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def latest_results(directory: str, exclude: Optional[str] = None) -> Optional[str]:
+    """目录中最近一次的结果文件 (文件名按时间命名)"""
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    paths = [os.path.join(directory, name) for name in names]
+    if exclude:
+        paths = [path for path in paths if os.path.abspath(path) != os.path.abspath(exclude)]
+    return paths[-1] if paths else None
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1,
+                    min_seconds: float = 0.05) -> Tuple[List[str], List[str]]:
+    """与基准结果逐个用例比较，返回 (报告行, 回退项)
+
+    吞吐量下降、峰值内存增长超过 threshold 记为回退；阶段耗时增长同样比较，
+    但增加量不足 min_seconds 的阶段视为计时噪声。
+    """
+    lines: List[str] = []
+    regressions: List[str] = []
+    previous = {case_key(case): case for case in baseline.get("cases", [])}
+    for case in current.get("cases", []):
+        name = (f"{case.get('format', 'xlsx')} {case['rows_per_file']:,} 行 × {len(case['patterns'])} 个文件, "
+                f"workers={case['workers']}")
+        old = previous.get(case_key(case))
+        if old is None:
+            lines.append(f"{name}: 基准中没有此用例")
+            continue
+
+        checks = [("吞吐量 行/秒", old["rows_per_sec"], case["rows_per_sec"], True)]
+        if old.get("peak_rss") and case.get("peak_rss"):
+            checks.append(("峰值内存 MB", old["peak_rss"] / 1e6, case["peak_rss"] / 1e6, False))
+        lines.append(f"{name}:")
+        for label, before, after, higher_is_better in checks:
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  ← 回退"
+                regressions.append(f"{name} {label} {before:,.1f} -> {after:,.1f}")
+            lines.append(f"  {label:<12} {before:>14,.1f} -> {after:>14,.1f} {change:>+8.1%}{flag}")
+
+        old_stages = old.get("stages", {})
+        for stage, seconds in case.get("stages", {}).items():
+            before = old_stages.get(stage)
+            if not before:
+                continue
+            change = (seconds - before) / before
+            if change > threshold and seconds - before >= min_seconds:
+                regressions.append(f"{name} 阶段 {stage} {before:.3f}s -> {seconds:.3f}s")
+                lines.append(f"  阶段 {stage:<8} {before:>12.3f}s -> {seconds:>12.3f}s {change:>+8.1%}  ← 回退")
+    return lines, regressions
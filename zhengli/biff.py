@@ -0,0 +1,457 @@
+"""旧版 .xls (BIFF8/BIFF5) 文件的底层解析
+
+.xls 是 OLE2 复合文档，工作簿数据在其中名为 Workbook (BIFF8) 或 Book (BIFF5) 的流里。
+复合文档以 mmap 映射，流由扇区链组成，相邻扇区合并为连续区段后按需切片读取，
+不会把整个流复制到内存。
+
+流的内容是一串记录 (u16 类型, u16 长度, 数据)。工作簿全局部分包含日期模式、
+数字格式、单元格样式 (XF)、工作表位置和共享字符串表 (SST)，随后是各工作表的记录。
+SST 在读取全局部分时只复制原始字节，字符串在第一次被引用时才建立位置索引并解码。
+"""
+import mmap
+import struct
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# 扇区表中的特殊值
+FREE_SECTOR = 0xFFFFFFFF
+END_OF_CHAIN = 0xFFFFFFFE
+FAT_SECTOR = 0xFFFFFFFD
+DIFAT_SECTOR = 0xFFFFFFFC
+
+# 记录类型
+BOF = 0x0809
+EOF = 0x000A
+CONTINUE = 0x003C
+FILEPASS = 0x002F
+CODEPAGE = 0x0042
+DATEMODE = 0x0022
+FORMAT = 0x041E
+XF = 0x00E0
+BOUNDSHEET = 0x0085
+SST = 0x00FC
+DIMENSIONS = 0x0200
+LABELSST = 0x00FD
+NUMBER = 0x0203
+RK = 0x027E
+MULRK = 0x00BD
+LABEL = 0x0204
+RSTRING = 0x00D6
+BOOLERR = 0x0205
+FORMULA = 0x0006
+STRING = 0x0207
+BLANK = 0x0201
+MULBLANK = 0x00BE
+
+BIFF8 = 0x0600
+BIFF5 = 0x0500
+
+# 工作表记录 (BOUNDSHEET) 中的类型: 0 为普通工作表
+SHEET_WORKSHEET = 0
+
+# 记录数据的最大长度，超出部分写入 CONTINUE 记录
+MAX_RECORD_DATA = 8224
+
+_HEADER = struct.Struct("<HH")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_F64 = struct.Struct("<d")
+
+# 按块读取流，记录跨块时再补读
+READ_CHUNK_SIZE = 256 * 1024
+
+CODEPAGES = {367: "ascii", 1200: "utf_16_le", 10000: "mac_roman", 32768: "mac_roman", 32769: "cp1252"}
+
+
+def codepage_encoding(codepage: Optional[int]) -> str:
+    """CODEPAGE 记录的值转换为 Python 编码名，未指定时按简体中文 Windows 的 GBK"""
+    if codepage is None:
+        return "gbk"
+    return CODEPAGES.get(codepage, f"cp{codepage}")
+
+
+def rk_value(rk: int) -> float:
+    """解码 RK 压缩数值: 低两位分别表示 ÷100 和整数"""
+    if rk & 2:
+        value = float(_I32.unpack(_U32.pack(rk))[0] >> 2)
+    else:
+        value = _F64.unpack(b"\x00\x00\x00\x00" + _U32.pack(rk & 0xFFFFFFFC))[0]
+    return value / 100 if rk & 1 else value
+
+
+class OleStream:
+    """复合文档中的一个流，由若干连续区段组成"""
+
+    def __init__(self, data, runs: List[Tuple[int, int]], size: int):
+        self.data = data
+        self.size = size
+        # 每个区段为 (在文件中的偏移, 长度)；starts 为各区段在流中的起始位置
+        self.runs = runs
+        self.starts = []
+        position = 0
+        for _, length in runs:
+            self.starts.append(position)
+            position += length
+
+    def read(self, offset: int, size: int) -> bytes:
+        """读取流中 [offset, offset + size) 的字节，超出流末尾的部分截断"""
+        size = min(size, self.size - offset)
+        if size <= 0:
+            return b""
+        index = bisect_right(self.starts, offset) - 1
+        pieces = []
+        while size > 0 and index < len(self.runs):
+            file_offset, length = self.runs[index]
+            skip = offset - self.starts[index]
+            take = min(size, length - skip)
+            pieces.append(self.data[file_offset + skip:file_offset + skip + take])
+            offset += take
+            size -= take
+            index += 1
+        return pieces[0] if len(pieces) == 1 else b"".join(pieces)
+
+
+class CompoundFile:
+    """只读的 OLE2 复合文档"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"不是有效的 .xls 文件: {file_path}")
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self) -> None:
+        data = self.data
+        if len(data) < 512 or data[:8] != OLE2_MAGIC:
+            raise ValueError(f"不是有效的 .xls 文件: {self.file_path}")
+        self.sector_size = 1 << _U16.unpack_from(data, 0x1E)[0]
+        self.mini_sector_size = 1 << _U16.unpack_from(data, 0x20)[0]
+        fat_count, first_dir = struct.unpack_from("<II", data, 0x2C)
+        self.mini_cutoff, first_mini_fat, mini_fat_count, first_difat, difat_count = \
+            struct.unpack_from("<IIIII", data, 0x38)
+
+        # 扇区分配表所在的扇区: 头部 109 个，其余在 DIFAT 扇区链中
+        fat_sectors = list(struct.unpack_from("<109I", data, 0x4C))
+        per_sector = self.sector_size // 4
+        sector = first_difat
+        for _ in range(difat_count):
+            if sector >= DIFAT_SECTOR:
+                break
+            entries = struct.unpack_from(f"<{per_sector}I", data, self._offset(sector))
+            fat_sectors.extend(entries[:-1])
+            sector = entries[-1]
+        fat = []
+        for sector in fat_sectors[:fat_count]:
+            if sector >= DIFAT_SECTOR:
+                continue
+            fat.extend(struct.unpack_from(f"<{per_sector}I", data, self._offset(sector)))
+        self.fat = fat
+
+        self.entries = self._read_directory(first_dir)
+        self.mini_fat: List[int] = []
+        if first_mini_fat < DIFAT_SECTOR and mini_fat_count:
+            raw = self._chain_bytes(first_mini_fat)
+            self.mini_fat = list(struct.unpack(f"<{len(raw) // 4}I", raw[:len(raw) // 4 * 4]))
+        self._mini_stream: Optional[bytes] = None
+
+    def _offset(self, sector: int) -> int:
+        return (sector + 1) * self.sector_size
+
+    def _chain(self, start: int, table: List[int]) -> List[int]:
+        chain = []
+        sector = start
+        while sector < DIFAT_SECTOR and sector < len(table) and len(chain) <= len(table):
+            chain.append(sector)
+            sector = table[sector]
+        return chain
+
+    def _chain_bytes(self, start: int) -> bytes:
+        size = self.sector_size
+        return b"".join(self.data[self._offset(s):self._offset(s) + size] for s in self._chain(start, self.fat))
+
+    def _read_directory(self, first_dir: int) -> Dict[str, Tuple[int, int, int]]:
+        """目录项: 名称 -> (类型, 起始扇区, 大小)"""
+        raw = self._chain_bytes(first_dir)
+        entries = {}
+        for offset in range(0, len(raw) - 127, 128):
+            name_size = _U16.unpack_from(raw, offset + 64)[0]
+            entry_type = raw[offset + 66]
+            if entry_type == 0 or name_size < 2:
+                continue
+            name = raw[offset:offset + name_size - 2].decode("utf-16-le", "replace")
+            start = _U32.unpack_from(raw, offset + 116)[0]
+            size = _U32.unpack_from(raw, offset + 120)[0]
+            if self.sector_size > 512:
+                size |= _U32.unpack_from(raw, offset + 124)[0] << 32
+            # 根目录项固定为第一项，其起始扇区为短流容器
+            entries.setdefault("Root Entry" if entry_type == 5 else name, (entry_type, start, size))
+        return entries
+
+    def open_stream(self, *names: str) -> OleStream:
+        """打开第一个存在的流"""
+        for name in names:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == 2:
+                break
+        else:
+            raise ValueError(f"不是有效的 .xls 文件 (找不到 {'/'.join(names)} 流): {self.file_path}")
+        _, start, size = entry
+        if size < self.mini_cutoff:
+            return self._open_mini_stream(start, size)
+
+        runs: List[Tuple[int, int]] = []
+        for sector in self._chain(start, self.fat):
+            offset = self._offset(sector)
+            if runs and runs[-1][0] + runs[-1][1] == offset:
+                runs[-1] = (runs[-1][0], runs[-1][1] + self.sector_size)
+            else:
+                runs.append((offset, self.sector_size))
+        # 最后一个扇区可能超出文件末尾 (截断的文件)
+        return OleStream(self.data, runs, min(size, sum(length for _, length in runs)))
+
+    def _open_mini_stream(self, start: int, size: int) -> OleStream:
+        """小于 mini_cutoff 的流存放在短流容器中，按 64 字节的短扇区复制出来"""
+        if self._mini_stream is None:
+            root = self.entries.get("Root Entry")
+            self._mini_stream = self._chain_bytes(root[1]) if root else b""
+        mini = self.mini_sector_size
+        data = b"".join(self._mini_stream[s * mini:(s + 1) * mini] for s in self._chain(start, self.mini_fat))
+        return OleStream(data, [(0, len(data))], min(size, len(data)))
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self._file.close()
+
+
+def iter_records(stream: OleStream, offset: int = 0) -> Iterator[Tuple[int, bytes, int, int]]:
+    """从流的 offset 处逐条返回 (记录类型, 缓冲区, 数据起始位置, 数据长度)
+
+    数据不单独复制，调用方在下一条记录之前用 unpack_from 从缓冲区中读取。
+    """
+    buffer = stream.read(offset, READ_CHUNK_SIZE)
+    # position 为缓冲区末尾在流中的位置
+    position = offset + len(buffer)
+    index = 0
+    unpack_header = _HEADER.unpack_from
+    while True:
+        if index + 4 > len(buffer):
+            more = stream.read(position, READ_CHUNK_SIZE)
+            if not more:
+                return
+            buffer = buffer[index:] + more
+            position += len(more)
+            index = 0
+            continue
+        record_type, length = unpack_header(buffer, index)
+        end = index + 4 + length
+        if end > len(buffer):
+            more = stream.read(position, max(READ_CHUNK_SIZE, end - len(buffer)))
+            if not more:
+                return
+            buffer = buffer[index:] + more
+            position += len(more)
+            index = 0
+            continue
+        yield record_type, buffer, index + 4, length
+        index = end
+
+
+def unicode_string(data: bytes, offset: int, length_size: int = 2) -> Tuple[str, int]:
+    """解析 BIFF8 的 XLUnicodeString，返回 (文本, 结束位置)；不处理跨 CONTINUE 的情况"""
+    if length_size == 2:
+        count = _U16.unpack_from(data, offset)[0]
+    else:
+        count = data[offset]
+    flags = data[offset + length_size]
+    offset += length_size + 1
+    runs = extension = 0
+    if flags & 0x08:
+        runs = _U16.unpack_from(data, offset)[0]
+        offset += 2
+    if flags & 0x04:
+        extension = _U32.unpack_from(data, offset)[0]
+        offset += 4
+    if flags & 0x01:
+        end = offset + 2 * count
+        text = data[offset:end].decode("utf-16-le", "replace")
+    else:
+        end = offset + count
+        text = data[offset:end].decode("latin-1")
+    return text, end + 4 * runs + extension
+
+
+class SharedStringTable:
+    """延迟解码的共享字符串表
+
+    segments 为 SST 记录及其后各 CONTINUE 记录的数据。第一次取值时才拼接，
+    向后扫描到所需序号为止，只记录各字符串的起始位置；字符串本身在被引用时才解码。
+    字符串跨越 CONTINUE 边界时，新记录开头有一个字节重新给出字符宽度。
+    """
+
+    def __init__(self, segments: List[bytes]):
+        self.segments = segments
+        self.data = b""
+        self.boundaries: List[int] = []
+        self.count = 0
+        self.starts: List[int] = []
+        self._next = 0
+        self._cache: Dict[int, str] = {}
+        self._loaded = False
+
+    def _load(self) -> None:
+        position = 0
+        for segment in self.segments:
+            position += len(segment)
+            self.boundaries.append(position)
+        self.data = b"".join(self.segments)
+        self.segments = []
+        self.count = _U32.unpack_from(self.data, 4)[0] if len(self.data) >= 8 else 0
+        self._next = 8
+        self._loaded = True
+
+    def __len__(self) -> int:
+        if not self._loaded:
+            self._load()
+        return self.count
+
+    def _walk(self, position: int, decode: bool) -> Tuple[int, Optional[str]]:
+        """解析 position 处的一个字符串，返回 (下一个字符串的位置, 文本)"""
+        data = self.data
+        boundaries = self.boundaries
+        count = _U16.unpack_from(data, position)[0]
+        flags = data[position + 2]
+        position += 3
+        runs = extension = 0
+        if flags & 0x08:
+            runs = _U16.unpack_from(data, position)[0]
+            position += 2
+        if flags & 0x04:
+            extension = _U32.unpack_from(data, position)[0]
+            position += 4
+        wide = flags & 0x01
+        pieces = []
+        boundary_index = bisect_right(boundaries, position)
+        while count > 0:
+            limit = boundaries[boundary_index] if boundary_index < len(boundaries) else len(data)
+            width = 2 if wide else 1
+            take = min(count, (limit - position) // width)
+            if decode:
+                chunk = data[position:position + take * width]
+                pieces.append(chunk.decode("utf-16-le", "replace") if wide else chunk.decode("latin-1"))
+            position += take * width
+            count -= take
+            if count > 0:
+                if position >= len(data):
+                    break
+                # 字符跨到下一个 CONTINUE 记录，开头的字节给出后续字符的宽度
+                position = limit
+                wide = data[position] & 0x01
+                position += 1
+                boundary_index += 1
+        return position + 4 * runs + extension, "".join(pieces) if decode else None
+
+    def _index_to(self, index: int) -> None:
+        starts = self.starts
+        position = self._next
+        end = len(self.data)
+        while len(starts) <= index and len(starts) < self.count and position < end:
+            starts.append(position)
+            position, _ = self._walk(position, False)
+        self._next = position
+
+    def __getitem__(self, index: int) -> str:
+        text = self._cache.get(index)
+        if text is not None:
+            return text
+        if not self._loaded:
+            self._load()
+        if index >= len(self.starts):
+            self._index_to(index)
+            if index >= len(self.starts):
+                raise IndexError(f"共享字符串序号超出范围: {index}")
+        text = self._cache[index] = self._walk(self.starts[index], True)[1]
+        return text
+
+
+class WorkbookGlobals:
+    """工作簿全局部分: BIFF 版本、日期模式、数字格式、XF 样式、工作表位置和 SST"""
+
+    def __init__(self):
+        self.version = BIFF8
+        self.date1904 = False
+        self.codepage: Optional[int] = None
+        self.formats: Dict[int, str] = {}
+        # 第 i 个 XF 使用的数字格式编号
+        self.xf_formats: List[int] = []
+        # (工作表 BOF 在流中的位置, 工作表类型)
+        self.sheets: List[Tuple[int, int]] = []
+        self.sst = SharedStringTable([])
+
+    @property
+    def encoding(self) -> str:
+        return codepage_encoding(self.codepage)
+
+    def first_worksheet(self) -> int:
+        for position, sheet_type in self.sheets:
+            if sheet_type == SHEET_WORKSHEET:
+                return position
+        raise ValueError("工作簿中没有工作表")
+
+
+def read_globals(stream: OleStream, file_path: str = "") -> WorkbookGlobals:
+    """读取工作簿全局部分直到其 EOF 记录"""
+    book = WorkbookGlobals()
+    sst_segments: Optional[List[bytes]] = None
+    first = True
+    for record_type, data, start, length in iter_records(stream):
+        if first:
+            if record_type not in (BOF, 0x0209, 0x0409) or length < 4:
+                raise ValueError(f"不是有效的 .xls 文件: {file_path}")
+            version = _U16.unpack_from(data, start)[0]
+            book.version = BIFF8 if version == BIFF8 else BIFF5
+            if version not in (BIFF8, BIFF5):
+                raise ValueError(f"不支持的 .xls 版本 (0x{version:04X}): {file_path}")
+            first = False
+            continue
+        if record_type == CONTINUE:
+            if sst_segments is not None:
+                sst_segments.append(bytes(data[start:start + length]))
+            continue
+        sst_segments = None
+        if record_type == EOF:
+            break
+        if record_type == FILEPASS:
+            raise ValueError(f"不支持加密的 .xls 文件: {file_path}")
+        if record_type == XF:
+            book.xf_formats.append(_U16.unpack_from(data, start + 2)[0])
+        elif record_type == FORMAT:
+            index = _U16.unpack_from(data, start)[0]
+            if book.version == BIFF8:
+                book.formats[index] = unicode_string(data, start + 2)[0]
+            else:
+                size = data[start + 2]
+                book.formats[index] = data[start + 3:start + 3 + size].decode(book.encoding, "replace")
+        elif record_type == BOUNDSHEET:
+            book.sheets.append((_U32.unpack_from(data, start)[0], data[start + 5]))
+        elif record_type == SST:
+            sst_segments = [bytes(data[start:start + length])]
+            book.sst = SharedStringTable(sst_segments)
+        elif record_type == DATEMODE:
+            book.date1904 = _U16.unpack_from(data, start)[0] == 1
+        elif record_type == CODEPAGE:
+            book.codepage = _U16.unpack_from(data, start)[0]
+    return book
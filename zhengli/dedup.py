@@ -0,0 +1,131 @@
+"""重复流向行检测
+
+经销商重复发送同一份导出或日期范围重叠的导出时，同一行会出现在多个文件中。
+每行以 (日期, 品种, 规格, 批号, 流向单位, 数量, 该行在本文件中是第几次出现) 计算
+64 位哈希，存入 array('Q') 开放寻址表，每行只占 8 字节左右，不保存行本身。
+
+"第几次出现" 区分同一文件中合法的相同行 (同一天同一客户两笔相同的出库)：
+两个文件各有两笔相同的行时都记为重复，一个文件中的两笔相同行都保留。
+
+哈希基于 Python 的 hash()，只在同一进程内有效，索引不落盘。
+"""
+from array import array
+from typing import List, Tuple
+
+from zhengli.flow_batch import FlowBatch
+
+MODES = ("drop", "flag")
+_MASK = (1 << 64) - 1
+
+
+class RowHashIndex:
+    """64 位哈希值的集合，线性探测，0 表示空槽"""
+
+    def __init__(self, capacity: int = 1 << 16):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.table = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: int) -> bool:
+        """加入哈希值，已存在时返回 False"""
+        value = (value & _MASK) or 1
+        table = self.table
+        mask = self.mask
+        slot = value & mask
+        while True:
+            current = table[slot]
+            if current == 0:
+                table[slot] = value
+                self.count += 1
+                if self.count * 10 > len(table) * 7:
+                    self._grow()
+                return True
+            if current == value:
+                return False
+            slot = (slot + 1) & mask
+
+    def _grow(self) -> None:
+        old = self.table
+        self.table = array("Q", bytes(16 * len(old)))
+        self.mask = len(self.table) - 1
+        table, mask = self.table, self.mask
+        for value in old:
+            if value:
+                slot = value & mask
+                while table[slot]:
+                    slot = (slot + 1) & mask
+                table[slot] = value
+
+    def nbytes(self) -> int:
+        return self.table.itemsize * len(self.table)
+
+
+class Deduplicator:
+    """逐文件检测重复行
+
+    mode 为 drop 时从结果中删除重复行，flag 时保留；两种模式下重复行都另外记录在
+    duplicates 中 (sources 为对应的 (来源文件, 行数) 列表)，可写出供核对。
+    """
+
+    def __init__(self, mode: str = "drop"):
+        if mode not in MODES:
+            raise ValueError(f"不支持的去重模式: {mode}，可选: {'/'.join(MODES)}")
+        self.mode = mode
+        self.index = RowHashIndex()
+        self.duplicates = FlowBatch()
+        self.sources: List[Tuple[str, int]] = []
+
+    @property
+    def duplicate_count(self) -> int:
+        return len(self.duplicates)
+
+    def _row_hashes(self, batch: FlowBatch) -> List[int]:
+        # 字典值只计算一次哈希，行哈希由各列的值哈希组合
+        value_hashes = [hash(value) for value in batch.dictionary.values]
+        raw_quantities = batch.raw_quantities
+        hashes = []
+        for index, (day, product, spec, batch_no, customer, quantity) in enumerate(zip(
+                batch.days, batch.products, batch.specs, batch.batches, batch.customers, batch.quantities)):
+            if day < 0:
+                day = value_hashes[-day]
+            if quantity != quantity:
+                quantity = hash(raw_quantities.get(index))
+            hashes.append(hash((day, value_hashes[product], value_hashes[spec], value_hashes[batch_no],
+                                value_hashes[customer], quantity)))
+        return hashes
+
+    def filter_batch(self, batch: FlowBatch, source: str = "") -> FlowBatch:
+        """检测一个源文件的全部数据，返回应追加到汇总中的部分
+
+        每个源文件只调用一次，同一文件内相同行的出现次数在本次调用中统计。
+        """
+        occurrences = {}
+        add = self.index.add
+        duplicate_indexes = []
+        for index, row_hash in enumerate(self._row_hashes(batch)):
+            occurrence = occurrences.get(row_hash, 0) + 1
+            occurrences[row_hash] = occurrence
+            if not add(hash((row_hash, occurrence))):
+                duplicate_indexes.append(index)
+
+        if not duplicate_indexes:
+            return batch
+        self.duplicates.extend_batch(batch.take(duplicate_indexes))
+        self.sources.append((source, len(duplicate_indexes)))
+        if self.mode == "flag":
+            return batch
+        duplicates = set(duplicate_indexes)
+        return batch.take([index for index in range(len(batch)) if index not in duplicates])
+
+    def duplicate_rows(self):
+        """逐行返回 (来源文件, 日期, 品种, 规格, 批号, 流向单位, 数量)"""
+        rows = self.duplicates.rows()
+        for source, count in self.sources:
+            for _ in range(count):
+                yield (source,) + next(rows)
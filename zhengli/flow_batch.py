@@ -0,0 +1,202 @@
+"""整理后流向数据的列式存储
+
+汇总表固定为 日期/品种/规格/批号/流向单位/数量 六列。逐行保存时每行是六个
+Python 对象，这里改为按列保存：
+
+日期:   array('i') 日序号 (date.toordinal)，0 为空值，
+        无法识别为日期的原始值存入字典，以负的字典编码保存
+数量:   array('d')，空值为 NaN，无法转换为数字的原始值单独记录
+文本列: array('i') 字典编码，0 为空值
+"""
+import math
+import re
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+# 字典编码的文本列，顺序与汇总表一致
+TEXT_COLUMNS = ("products", "specs", "batches", "customers")
+
+
+class StringDictionary:
+    """值到整数编码的字典，编码 0 保留给空值"""
+
+    def __init__(self):
+        self.values: List[Any] = [None]
+        self.codes: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: Any) -> int:
+        if value is None or value == "":
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> Any:
+        return self.values[code]
+
+    def __getstate__(self):
+        # codes 可以由 values 重建，序列化时不重复保存
+        return self.values
+
+    def __setstate__(self, values):
+        self.values = values
+        self.codes = {value: code for code, value in enumerate(values) if code}
+
+
+def date_to_day(value: Any) -> Optional[int]:
+    """日期值转换为日序号，不是日期时返回 None"""
+    if isinstance(value, datetime):
+        return value.toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, str):
+        match = _ISO_DATE.match(value)
+        if match:
+            try:
+                return date(int(match.group(1)), int(match.group(2)), int(match.group(3))).toordinal()
+            except ValueError:
+                return None
+    return None
+
+
+class FlowBatch:
+    """一批整理后的六列流向数据"""
+
+    def __init__(self, dictionary: Optional[StringDictionary] = None):
+        self.dictionary = dictionary or StringDictionary()
+        self.days = array("i")
+        self.quantities = array("d")
+        self.products = array("i")
+        self.specs = array("i")
+        self.batches = array("i")
+        self.customers = array("i")
+        # 行号 -> 无法转换为数字的数量原始值，通常为空
+        self.raw_quantities: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> "FlowBatch":
+        batch = cls()
+        batch.extend(rows)
+        return batch
+
+    def append(self, row: Sequence[Any]) -> None:
+        """追加一行 (日期, 品种, 规格, 批号, 流向单位, 数量)"""
+        encode = self.dictionary.encode
+        day_value, product, spec, batch_no, customer, quantity = row
+        if day_value is None or day_value == "":
+            self.days.append(0)
+        else:
+            day = date_to_day(day_value)
+            self.days.append(day if day is not None else -encode(day_value))
+        self.products.append(encode(product))
+        self.specs.append(encode(spec))
+        self.batches.append(encode(batch_no))
+        self.customers.append(encode(customer))
+        self.quantities.append(self._encode_quantity(quantity, len(self.quantities)))
+
+    def _encode_quantity(self, quantity: Any, index: int) -> float:
+        if quantity is None or quantity == "":
+            return math.nan
+        if isinstance(quantity, (int, float)) and not isinstance(quantity, bool):
+            return float(quantity)
+        try:
+            return float(quantity)
+        except (TypeError, ValueError):
+            self.raw_quantities[index] = quantity
+            return math.nan
+
+    def extend(self, rows: Iterable[Sequence[Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def extend_columns(self, days: Sequence[Any], products: Sequence[Any], specs: Sequence[Any],
+                       batches: Sequence[Any], customers: Sequence[Any], quantities: Sequence[Any]) -> None:
+        """按列追加；days 为标准化后的日序号 (int)，无法识别的日期为原值 (不是 int)"""
+        encode = self.dictionary.encode
+        self.days.extend([d if type(d) is int else -encode(d) for d in days])
+        self.products.extend([encode(v) for v in products])
+        self.specs.extend([encode(v) for v in specs])
+        self.batches.extend([encode(v) for v in batches])
+        self.customers.extend([encode(v) for v in customers])
+        base = len(self.quantities)
+        self.quantities.extend([self._encode_quantity(v, base + i) for i, v in enumerate(quantities)])
+
+    def extend_batch(self, other: "FlowBatch") -> None:
+        """合并另一批数据，字典编码换算为本批的编码"""
+        offset = len(self)
+        if other.dictionary is self.dictionary:
+            remap = None
+        else:
+            encode = self.dictionary.encode
+            remap = array("i", [0] + [encode(value) for value in other.dictionary.values[1:]])
+        for name in TEXT_COLUMNS:
+            column = getattr(self, name)
+            codes = getattr(other, name)
+            column.extend(codes if remap is None else array("i", [remap[c] for c in codes]))
+        if remap is None:
+            self.days.extend(other.days)
+        else:
+            self.days.extend(array("i", [d if d >= 0 else -remap[-d] for d in other.days]))
+        self.quantities.extend(other.quantities)
+        for index, value in other.raw_quantities.items():
+            self.raw_quantities[offset + index] = value
+
+    def take(self, indexes: Sequence[int]) -> "FlowBatch":
+        """按行号取出部分行，新批与本批共用字典"""
+        result = FlowBatch(self.dictionary)
+        for name in ("days", "quantities") + TEXT_COLUMNS:
+            column = getattr(self, name)
+            getattr(result, name).extend([column[i] for i in indexes])
+        if self.raw_quantities:
+            for new_index, index in enumerate(indexes):
+                if index in self.raw_quantities:
+                    result.raw_quantities[new_index] = self.raw_quantities[index]
+        return result
+
+    def day_value(self, day: int) -> Any:
+        if day > 0:
+            return date.fromordinal(day)
+        if day < 0:
+            return self.dictionary.decode(-day)
+        return None
+
+    def quantity_value(self, index: int) -> Any:
+        quantity = self.quantities[index]
+        if quantity != quantity:
+            return self.raw_quantities.get(index)
+        return quantity
+
+    def row(self, index: int) -> Tuple[Any, ...]:
+        decode = self.dictionary.decode
+        return (self.day_value(self.days[index]), decode(self.products[index]), decode(self.specs[index]),
+                decode(self.batches[index]), decode(self.customers[index]), self.quantity_value(index))
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """按行还原六列数据，日期为 date 对象"""
+        values = self.dictionary.values
+        day_cache: Dict[int, Any] = {}
+        raw_quantities = self.raw_quantities
+        for index, (day, product, spec, batch_no, customer, quantity) in enumerate(zip(
+                self.days, self.products, self.specs, self.batches, self.customers, self.quantities)):
+            day_value = day_cache.get(day)
+            if day_value is None:
+                day_value = day_cache[day] = self.day_value(day)
+            if quantity != quantity:
+                quantity = raw_quantities.get(index)
+            yield (day_value, values[product], values[spec], values[batch_no], values[customer], quantity)
+
+    def nbytes(self) -> int:
+        """列数组占用的字节数 (不含字典)"""
+        return sum(column.itemsize * len(column) for column in
+                   (self.days, self.quantities, self.products, self.specs, self.batches, self.customers))
@@ -0,0 +1,109 @@
+"""历史流向库
+
+每次运行把当天整理后的全部数据写入一个日期分区 (root/YYYY/YYYY-MM-DD.zfb，
+batch_file 格式)。分区只追加不修改，同一天重新运行时整体替换该天的分区。
+
+跨日查询按日期范围映射分区文件，先在字典中找出品种、批号、流向单位匹配的编码，
+再直接扫描映射区中的编码列，不重新打开任何汇总 xlsx。
+"""
+import os
+import re
+from datetime import date
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from zhengli.batch_file import MappedBatch, save_batch
+from zhengli.flow_batch import FlowBatch
+from zhengli.normalizers import clean_text
+
+_PARTITION_NAME = re.compile(r"^(\d{4})-(\d{2})-(\d{2})\.zfb$")
+
+
+def _text(value: Any) -> str:
+    """字典值转换为比较用的文本，整数值的浮点批号 (12345.0) 按整数比较"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FlowStore:
+    """按日期分区的历史流向库"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def partition_path(self, day: date) -> str:
+        return os.path.join(self.root, f"{day.year:04d}", f"{day.isoformat()}.zfb")
+
+    def write_partition(self, day: date, batches: Iterable[FlowBatch]) -> int:
+        """写入一天的数据，返回行数"""
+        combined = FlowBatch()
+        for batch in batches:
+            combined.extend_batch(batch)
+        path = self.partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_batch(path, combined)
+        return len(combined)
+
+    def partitions(self, since: Optional[date] = None, until: Optional[date] = None) -> List[Tuple[date, str]]:
+        """日期范围内 (含两端) 的分区，按日期排序"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for year in os.listdir(self.root):
+            if since is not None and year.isdigit() and int(year) < since.year:
+                continue
+            if until is not None and year.isdigit() and int(year) > until.year:
+                continue
+            directory = os.path.join(self.root, year)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                match = _PARTITION_NAME.match(filename)
+                if not match:
+                    continue
+                day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+                if (since is None or day >= since) and (until is None or day <= until):
+                    result.append((day, os.path.join(directory, filename)))
+        result.sort()
+        return result
+
+    def query(self, product: Optional[str] = None, batch_no: Optional[str] = None,
+              customer: Optional[str] = None, since: Optional[date] = None, until: Optional[date] = None,
+              contains: bool = False) -> Iterator[Tuple[Any, ...]]:
+        """按条件查询，逐行返回 (分区日期, 日期, 品种, 规格, 批号, 流向单位, 数量)
+
+        条件按去掉空格后的文本比较；contains 为 True 时做包含匹配，否则完全匹配。
+        """
+        filters = []
+        for column, value in (("products", product), ("batches", batch_no), ("customers", customer)):
+            if value is not None and value != "":
+                filters.append((column, clean_text(str(value))))
+
+        for day, path in self.partitions(since, until):
+            with MappedBatch(path) as mapped:
+                selected = []
+                for column, needle in filters:
+                    if contains:
+                        codes = mapped.find_codes(lambda value: needle in _text(value))
+                    else:
+                        codes = mapped.find_codes(lambda value: _text(value) == needle)
+                    if not codes:
+                        break
+                    selected.append((column, set(codes)))
+                else:
+                    yield from self._scan(day, mapped, selected)
+
+    @staticmethod
+    def _scan(day: date, mapped: MappedBatch, selected) -> Iterator[Tuple[Any, ...]]:
+        if not selected:
+            indexes = iter(range(len(mapped)))
+        else:
+            # 只扫描第一个条件的编码列，其余条件在命中的行上检查
+            column, codes = selected[0]
+            indexes = mapped.select(column, codes)
+        rest = [(getattr(mapped, column), codes) for column, codes in selected[1:]]
+        for index in indexes:
+            if all(values[index] in codes for values, codes in rest):
+                yield (day,) + mapped.row(index)
@@ -0,0 +1,164 @@
+"""增量处理清单
+
+SQLite 记录每个已整理输入文件的内容摘要、格式、行数和首次计入的汇总日期，
+整理结果 (FlowBatch) 以 batch_file 的二进制格式保存在 batches 目录下，
+文件名由内容摘要和格式定义版本组成。
+
+再次运行时先按路径、大小、修改时间查清单，未变化的文件不读取内容 (不计算摘要)。
+同一路径的文件只属于首次计入的那一天的汇总：当天重跑时复用整理结果，
+之后的日期视同已被清理，不再计入。其他路径下内容相同的文件 (例如重新下载的
+"xxx (1).xlsx") 复用整理结果，但计入本次汇总，是否重复由去重阶段判断。
+格式定义变化后 (patterns_version 不同) 旧结果全部失效。
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from zhengli.batch_file import load_batch, save_batch
+from zhengli.flow_batch import FlowBatch
+
+HASH_CHUNK_SIZE = 1 << 20
+# 整理结果文件的扩展名
+BATCH_SUFFIX = ".zfb"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    file_rows INTEGER NOT NULL,
+    data_rows INTEGER NOT NULL,
+    summary_date TEXT NOT NULL,
+    patterns_version TEXT NOT NULL,
+    processed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+"""
+
+_COLUMNS = ("path, size, mtime_ns, digest, pattern, file_rows, data_rows, "
+            "summary_date, patterns_version, processed_at")
+
+
+class ManifestEntry(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str
+    pattern: str
+    file_rows: int
+    data_rows: int
+    summary_date: str
+    patterns_version: str
+    processed_at: str
+
+
+def file_digest(file_path: str) -> str:
+    """文件内容的 SHA-1 摘要"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """已整理文件清单
+
+    state_dir 下保存 manifest.sqlite 和 batches/ 目录。
+    patterns_version 为当前格式定义的版本，只有版本一致的记录才会被复用。
+    """
+
+    def __init__(self, state_dir: str, patterns_version: str):
+        self.state_dir = state_dir
+        self.batch_dir = os.path.join(state_dir, "batches")
+        os.makedirs(self.batch_dir, exist_ok=True)
+        self.patterns_version = patterns_version
+        self.db = sqlite3.connect(os.path.join(state_dir, "manifest.sqlite"))
+        self.db.executescript(SCHEMA)
+
+    def _entry(self, where: str, *params) -> Optional[ManifestEntry]:
+        row = self.db.execute(f"SELECT {_COLUMNS} FROM files WHERE {where} LIMIT 1", params).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def batch_path(self, digest: str) -> str:
+        """整理结果文件路径，同一内容在不同格式定义版本下的结果互不覆盖"""
+        return os.path.join(self.batch_dir, f"{digest}-{self.patterns_version[:12]}{BATCH_SUFFIX}")
+
+    def lookup(self, file_path: str, summary_date: str) -> Tuple[Optional[ManifestEntry], str]:
+        """查找文件的记录，返回 (记录或 None, 文件内容摘要)
+
+        同一路径、内容未变的文件返回原记录，其 summary_date 为首次计入的汇总日期，
+        早于本次汇总日期说明已经统计过；整理结果文件缺失时仍返回记录用于判断是否已计入。
+        其他路径下内容相同的记录只在整理结果可用时返回，汇总日期改为本次。
+        返回记录的格式定义版本未必与当前一致，复用整理结果前需检查 reusable。
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        entry = self._entry("path = ?", path)
+        if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            return entry, entry.digest
+
+        digest = file_digest(path)
+        if entry is not None and entry.digest == digest:
+            # 只是修改时间变了 (例如被复制回原处)，仍是同一个文件
+            entry = entry._replace(mtime_ns=stat.st_mtime_ns)
+            self._save(entry)
+            return entry, digest
+        entry = self._entry("digest = ? AND patterns_version = ?", digest, self.patterns_version)
+        if entry is None or not os.path.exists(self.batch_path(digest)):
+            return None, digest
+        # 内容相同的其他文件，复用整理结果并登记新路径，计入本次汇总
+        entry = entry._replace(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, summary_date=summary_date)
+        self._save(entry)
+        return entry, digest
+
+    def reusable(self, entry: ManifestEntry) -> bool:
+        """记录的整理结果能否直接使用"""
+        return entry.patterns_version == self.patterns_version and os.path.exists(self.batch_path(entry.digest))
+
+    def record(self, file_path: str, digest: str, pattern: str, file_rows: int,
+               batch: FlowBatch, summary_date: str) -> ManifestEntry:
+        """保存一个文件的整理结果并登记，每个文件单独提交，中途崩溃不影响已登记的文件"""
+        save_batch(self.batch_path(digest), batch)
+
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        entry = ManifestEntry(path, stat.st_size, stat.st_mtime_ns, digest, pattern, file_rows, len(batch),
+                              summary_date, self.patterns_version, datetime.now().isoformat(timespec="seconds"))
+        self._save(entry)
+        return entry
+
+    def _save(self, entry: ManifestEntry) -> None:
+        with self.db:
+            self.db.execute(f"INSERT OR REPLACE INTO files ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            entry)
+
+    def load_batch(self, entry: ManifestEntry) -> FlowBatch:
+        return load_batch(self.batch_path(entry.digest))
+
+    def forget_missing(self, file_paths: Iterable[str]) -> int:
+        """删除已不在工作目录中的文件记录及不再被引用的整理结果，返回删除的记录数"""
+        keep = {os.path.abspath(path) for path in file_paths}
+        missing = [path for (path,) in self.db.execute("SELECT path FROM files") if path not in keep]
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in missing])
+        referenced = {os.path.basename(self.batch_path(digest))
+                      for (digest,) in self.db.execute("SELECT DISTINCT digest FROM files "
+                                                       "WHERE patterns_version = ?", (self.patterns_version,))}
+        for filename in os.listdir(self.batch_dir):
+            if filename.endswith(BATCH_SUFFIX) and filename not in referenced:
+                try:
+                    os.remove(os.path.join(self.batch_dir, filename))
+                except OSError:
+                    pass
+        return len(missing)
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,121 @@
+"""运行计时
+
+各处理阶段 (识别格式、打开文件、读取、标准化、追加、写出……) 以事件记录，
+每个事件包含阶段名、文件、格式、耗时、行数和字节数。运行结束时按阶段、按格式、
+按文件汇总成表格打印，也可以逐行写成 JSON Lines 供比较不同版本或不同日期。
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Dict, Iterator, List
+
+
+class Metrics:
+    """计时事件的收集器"""
+
+    def __init__(self):
+        self.run_id = datetime.now().isoformat(timespec="seconds")
+        self.events: List[Dict[str, Any]] = []
+
+    def add(self, stage: str, seconds: float, file: str = "", pattern: str = "",
+            rows: int = 0, nbytes: int = 0) -> None:
+        self.events.append({"stage": stage, "file": file, "pattern": pattern,
+                            "seconds": seconds, "rows": rows, "bytes": nbytes})
+
+    @contextmanager
+    def stage(self, stage: str, file: str = "", pattern: str = "", rows: int = 0,
+              nbytes: int = 0) -> Iterator[Dict[str, Any]]:
+        """计时一个阶段；可在 with 块中修改返回的事件补充行数等信息"""
+        event = {"stage": stage, "file": file, "pattern": pattern, "seconds": 0.0, "rows": rows, "bytes": nbytes}
+        start = perf_counter()
+        try:
+            yield event
+        finally:
+            event["seconds"] = perf_counter() - start
+            self.events.append(event)
+
+    def merge(self, events: List[Dict[str, Any]]) -> None:
+        """合并工作进程记录的事件"""
+        self.events.extend(events)
+
+    def write_jsonl(self, file_path: str) -> None:
+        """追加写出本次运行的全部事件，每行一个 JSON 对象"""
+        with open(file_path, "a", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(dict(event, run=self.run_id), ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _group(events: List[Dict[str, Any]], key: str) -> Dict[str, Dict[str, Any]]:
+        groups: Dict[str, Dict[str, Any]] = {}
+        for event in events:
+            name = event[key]
+            group = groups.setdefault(name, {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+            group["count"] += 1
+            group["seconds"] += event["seconds"]
+            group["rows"] += event["rows"]
+            group["bytes"] += event["bytes"]
+        return groups
+
+    def _file_summary(self) -> Dict[str, Dict[str, Any]]:
+        """按文件汇总：耗时为该文件各阶段之和，行数取读取阶段，字节数取文件大小"""
+        files: Dict[str, Dict[str, Any]] = {}
+        for event in self.events:
+            if not event["file"]:
+                continue
+            item = files.setdefault(event["file"], {"pattern": "", "seconds": 0.0, "rows": 0, "bytes": 0})
+            item["seconds"] += event["seconds"]
+            if event["pattern"]:
+                item["pattern"] = event["pattern"]
+            if event["stage"] in ("read", "cache"):
+                item["rows"] += event["rows"]
+            item["bytes"] = max(item["bytes"], event["bytes"])
+        return files
+
+    def stage_totals(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总的次数、耗时、行数和字节数"""
+        return self._group(self.events, "stage")
+
+    @staticmethod
+    def _rate(amount: float, seconds: float) -> str:
+        return f"{amount / seconds:,.0f}" if amount and seconds > 0 else "-"
+
+    def report(self, slowest: int = 10) -> List[str]:
+        """阶段、格式、最慢文件三张表"""
+        lines = ["阶段           次数      耗时(s)        行数      行/秒      MB"]
+        for stage, group in self._group(self.events, "stage").items():
+            lines.append(f"{stage:<12} {group['count']:>6} {group['seconds']:>12.3f} {group['rows']:>11,} "
+                         f"{self._rate(group['rows'], group['seconds']):>10} {group['bytes'] / 1e6:>7.1f}")
+
+        files = self._file_summary()
+        patterns: Dict[str, Dict[str, Any]] = {}
+        for item in files.values():
+            group = patterns.setdefault(item["pattern"] or "unknown",
+                                        {"files": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+            group["files"] += 1
+            group["seconds"] += item["seconds"]
+            group["rows"] += item["rows"]
+            group["bytes"] += item["bytes"]
+        if patterns:
+            lines.append("")
+            lines.append("格式         文件数      耗时(s)        行数      行/秒      MB")
+            for pattern, group in sorted(patterns.items(), key=lambda item: -item[1]["seconds"]):
+                lines.append(f"{pattern:<12} {group['files']:>6} {group['seconds']:>12.3f} {group['rows']:>11,} "
+                             f"{self._rate(group['rows'], group['seconds']):>10} {group['bytes'] / 1e6:>7.1f}")
+
+            lines.append("")
+            lines.append(f"最慢的 {min(slowest, len(files))} 个文件:")
+            ranked = sorted(files.items(), key=lambda item: -item[1]["seconds"])[:slowest]
+            for name, item in ranked:
+                lines.append(f"  {item['seconds']:>8.3f}s {item['rows']:>9,} 行 "
+                             f"{self._rate(item['rows'], item['seconds']):>9} 行/秒 "
+                             f"{item['pattern'] or 'unknown':<10} {os.path.basename(name)}")
+        return lines
+
+
+def file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
@@ -0,0 +1,235 @@
+"""按列批量标准化日期
+
+整列日期值一次性转换为日序号 (date.toordinal)：先根据第一个非空值判断格式，
+整列走该格式的快速路径 (文本和数字只转换列中不同的值)；遇到格式不一致的值时
+整列回退到逐个判断，逐个判断的结果由 NormalizerCache 缓存。
+
+支持的格式：datetime/date、Excel 序列日期、YYYYMMDD 整数、
+YYYY-MM-DD / YYYY/M/D 文本、YYYYMMDD 文本，以及带时间的文本 (split_time)。
+
+同一文件中日期只有少数几个取值，客户名、品名、规格大量重复，
+NormalizerCache 以原始单元格值为键缓存清理结果，并统计命中率。
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Excel 1900 日期系统的 0 日 (1899-12-30)
+EXCEL_EPOCH_ORDINAL = date(1899, 12, 30).toordinal()
+# Excel 能表示的最大序列日期 (9999-12-31)
+MAX_EXCEL_SERIAL = 2958465
+
+DayList = List[Any]
+
+
+def clean_text(value: Any) -> Any:
+    """去掉文本中的全部空格，非文本原样返回"""
+    return value.replace(" ", "") if isinstance(value, str) else value
+
+
+def clean_date_text(value: str, split_time: bool = False) -> str:
+    """去掉日期文本中的空格；split_time 时只保留空格前的日期部分"""
+    if split_time:
+        return value.split(" ")[0] if " " in value else value
+    return value.replace(" ", "")
+
+
+def _is_compact_number(value: float) -> bool:
+    return 10000101 <= value <= 99991231 and value == int(value)
+
+
+def normalize_date_value(value: Any, split_time: bool = False) -> Any:
+    """单个日期值转换为日序号；空值返回 0，无法识别时返回清理后的原值 (整数转为 float)"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, (datetime, date)):
+        return value.toordinal()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        try:
+            if _is_compact_number(value):
+                number = int(value)
+                return date(number // 10000, number // 100 % 100, number % 100).toordinal()
+            if 1 <= value <= MAX_EXCEL_SERIAL:
+                return EXCEL_EPOCH_ORDINAL + int(value)
+        except ValueError:
+            pass
+        # 日序号以 int 表示，无法识别的整数转为 float 保留原值，不能被当作日序号
+        return float(value) if isinstance(value, int) else value
+    if isinstance(value, str):
+        value = clean_date_text(value, split_time)
+        try:
+            if "/" in value or "-" in value:
+                parts = value.replace("/", "-").split("-")
+                if len(parts) == 3:
+                    return date(int(parts[0]), int(parts[1]), int(parts[2])).toordinal()
+            elif len(value) == 8 and value.isdigit():
+                return date(int(value[:4]), int(value[4:6]), int(value[6:8])).toordinal()
+        except ValueError:
+            pass
+    return value
+
+
+def _days_from_dates(values: Sequence[Any], split_time: bool) -> DayList:
+    return [v.toordinal() if v is not None else 0 for v in values]
+
+
+def _days_from_serials(values: Sequence[Any], split_time: bool) -> DayList:
+    days = []
+    for v in values:
+        if v is None:
+            days.append(0)
+        elif 1 <= v <= MAX_EXCEL_SERIAL and not _is_compact_number(v):
+            days.append(EXCEL_EPOCH_ORDINAL + int(v))
+        else:
+            raise ValueError(v)
+    return days
+
+
+def _days_from_compact_numbers(values: Sequence[Any], split_time: bool) -> DayList:
+    days = []
+    for v in values:
+        if v is None:
+            days.append(0)
+        else:
+            n = int(v)
+            if n != v:
+                raise ValueError(v)
+            days.append(date(n // 10000, n // 100 % 100, n % 100).toordinal())
+    return days
+
+
+def _days_from_iso(values: Sequence[Any], split_time: bool) -> DayList:
+    # 固定宽度的 YYYY-MM-DD，直接按位置切片
+    days = []
+    for v in values:
+        if v is None:
+            days.append(0)
+            continue
+        v = clean_date_text(v, split_time)
+        if len(v) != 10 or v[4] != "-" or v[7] != "-":
+            raise ValueError(v)
+        days.append(date(int(v[:4]), int(v[5:7]), int(v[8:10])).toordinal())
+    return days
+
+
+def _days_from_separated(values: Sequence[Any], split_time: bool) -> DayList:
+    days = []
+    for v in values:
+        if v is None:
+            days.append(0)
+            continue
+        year, month, day = clean_date_text(v, split_time).replace("/", "-").split("-")
+        days.append(date(int(year), int(month), int(day)).toordinal())
+    return days
+
+
+def _days_from_compact_text(values: Sequence[Any], split_time: bool) -> DayList:
+    days = []
+    for v in values:
+        if v is None:
+            days.append(0)
+            continue
+        v = clean_date_text(v, split_time)
+        if len(v) != 8 or not v.isdigit():
+            raise ValueError(v)
+        days.append(date(int(v[:4]), int(v[4:6]), int(v[6:8])).toordinal())
+    return days
+
+
+def _fast_path(sample: Any, split_time: bool) -> Optional[Callable[[Sequence[Any], bool], DayList]]:
+    """根据样本值选择整列的快速转换函数"""
+    if isinstance(sample, (datetime, date)):
+        return _days_from_dates
+    if isinstance(sample, bool):
+        return None
+    if isinstance(sample, (int, float)):
+        return _days_from_compact_numbers if _is_compact_number(sample) else _days_from_serials
+    if isinstance(sample, str):
+        text = clean_date_text(sample, split_time)
+        if len(text) == 10 and text[4] == "-" and text[7] == "-":
+            return _days_from_iso
+        if "/" in text or "-" in text:
+            return _days_from_separated
+        if len(text) == 8 and text.isdigit():
+            return _days_from_compact_text
+    return None
+
+
+def normalize_date_column(values: Sequence[Any], split_time: bool = False,
+                          cache: Optional["NormalizerCache"] = None) -> DayList:
+    """整列日期值转换为日序号列表
+
+    空值为 0，无法识别的值保留清理后的原值 (与逐个标准化的结果一致)。
+    先尝试整列的快速路径；回退到逐个判断时，传入 cache 则每个不同的原始值只转换一次。
+    """
+    sample = next((v for v in values if v is not None and v != ""), None)
+    if sample is None:
+        return [0] * len(values)
+    fast = _fast_path(sample, split_time)
+    if fast is _days_from_dates:
+        # 日期单元格常带时分秒，取值几乎各不相同，直接整列转换
+        try:
+            return fast(values, split_time)
+        except (TypeError, ValueError, AttributeError):
+            pass
+    elif fast is not None:
+        # 同一列中日期只有少数几个取值，只转换不同的值
+        distinct = list(dict.fromkeys(values))
+        try:
+            days = dict(zip(distinct, fast(distinct, split_time)))
+        except (TypeError, ValueError, AttributeError):
+            pass
+        else:
+            return [days[v] for v in values]
+    normalize = cache.date if cache is not None else normalize_date_value
+    return [normalize(v, split_time) for v in values]
+
+
+class NormalizerCache:
+    """日期、规格、名称清理结果的有界 LRU 缓存
+
+    键为原始单元格值 (区分类型，1 与 1.0 不共用结果)，每类最多保留 maxsize 个。
+    """
+
+    KINDS = ("date", "spec", "name")
+
+    def __init__(self, maxsize: int = 65536):
+        self.date = lru_cache(maxsize=maxsize, typed=True)(normalize_date_value)
+        self.spec = lru_cache(maxsize=maxsize, typed=True)(clean_text)
+        self.name = lru_cache(maxsize=maxsize, typed=True)(clean_text)
+        # 其他进程中累计的 (命中, 未命中)
+        self.merged: Dict[str, List[int]] = {kind: [0, 0] for kind in self.KINDS}
+
+    def clean_specs(self, values: Sequence[Any]) -> List[Any]:
+        spec = self.spec
+        return [spec(v) for v in values]
+
+    def clean_names(self, values: Sequence[Any]) -> List[Any]:
+        name = self.name
+        return [name(v) for v in values]
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        """各类缓存的 (命中, 未命中) 次数"""
+        result = {}
+        for kind in self.KINDS:
+            info = getattr(self, kind).cache_info()
+            merged = self.merged[kind]
+            result[kind] = (info.hits + merged[0], info.misses + merged[1])
+        return result
+
+    def merge(self, stats: Dict[str, Tuple[int, int]]) -> None:
+        """合并工作进程返回的命中统计"""
+        for kind, (hits, misses) in stats.items():
+            self.merged[kind][0] += hits
+            self.merged[kind][1] += misses
+
+    def report(self) -> List[str]:
+        lines = []
+        labels = {"date": "日期", "spec": "规格", "name": "名称"}
+        for kind, (hits, misses) in self.stats().items():
+            total = hits + misses
+            rate = hits / total * 100 if total else 0.0
+            lines.append(f"{labels[kind]}缓存: 命中 {hits} / {total} ({rate:.1f}%)")
+        return lines
@@ -0,0 +1,102 @@
+"""文件格式识别索引
+
+启动时为每个被约束的列建立倒排索引：表头取值 -> 要求该取值的格式集合。
+格式集合用整数位图表示，第 i 位对应定义顺序中的第 i 种格式。识别时逐列
+取交集，剩下的最低位即按定义顺序第一个完全匹配的格式；结果与按定义顺序
+逐个比较全部格式完全一致。建立索引的时间和内存与格式数量成线性关系。
+
+同一经销商每天的表头相同，整行表头签名命中缓存时直接返回结果。
+"""
+from itertools import combinations
+from typing import Any, Dict, List, Sequence, Tuple
+
+Headers = Dict[int, str]
+
+
+class PatternIndex:
+    """表头倒排索引"""
+
+    def __init__(self, definitions: Dict[str, Dict[str, Any]]):
+        self.headers: Dict[str, Headers] = {name: info["headers"] for name, info in definitions.items()}
+        self.names: List[str] = list(self.headers)
+        # 列号 -> (约束该列的格式位图, {表头取值: 要求该取值的格式位图})
+        self.columns: Dict[int, Tuple[int, Dict[str, int]]] = {}
+        for bit, name in enumerate(self.names):
+            for col, value in self.headers[name].items():
+                constrained, by_value = self.columns.get(col, (0, {}))
+                by_value[value] = by_value.get(value, 0) | (1 << bit)
+                self.columns[col] = (constrained | (1 << bit), by_value)
+        self.all_patterns = (1 << len(self.names)) - 1
+        self.signatures: Dict[Tuple[Any, ...], str] = {}
+
+    @staticmethod
+    def header_dict(header_row: Sequence[Any]) -> Headers:
+        headers = {}
+        for col, value in enumerate(header_row, 1):
+            if value:
+                headers[col] = str(value).strip()
+        return headers
+
+    def match(self, header_row: Sequence[Any]) -> str:
+        """识别表头行对应的格式，未识别返回 unknown"""
+        if not header_row:
+            return "unknown"
+        signature = tuple(header_row)
+        try:
+            cached = self.signatures.get(signature)
+        except TypeError:
+            signature, cached = None, None
+        if cached is not None:
+            return cached
+
+        headers = self.header_dict(header_row)
+        candidates = self.all_patterns
+        for col, (constrained, by_value) in self.columns.items():
+            # 不约束该列的格式保留，约束该列的只保留取值一致的
+            candidates &= ~constrained | by_value.get(headers.get(col), 0)
+            if not candidates:
+                break
+        result = "unknown"
+        if candidates:
+            result = self.names[(candidates & -candidates).bit_length() - 1]
+
+        if signature is not None:
+            self.signatures[signature] = result
+        return result
+
+    def ambiguity_report(self) -> List[str]:
+        """列出容易混淆的格式对，分两部分
+
+        可能同时匹配: 至少有一个共同约束列、且所有共同约束列的表头都相同，
+        同时满足两者的表头按定义顺序识别为前者。
+        只差一列: 至少两个共同约束列、其中恰好有一列表头不同 (例如 pattern3/pattern4
+        第 10 列分别为 数量/批号)，这一列错位或改名就会识别成另一种格式。
+        """
+        overlapping = []
+        one_column = []
+        for a, b in combinations(self.names, 2):
+            ha, hb = self.headers[a], self.headers[b]
+            shared = sorted(set(ha) & set(hb))
+            if not shared:
+                continue
+            differing = [col for col in shared if ha[col] != hb[col]]
+            if len(differing) == 1 and len(shared) > 1:
+                col = differing[0]
+                one_column.append(f"  {a} / {b}: 共同的 {len(shared)} 列中只有第 {col} 列不同 "
+                                  f"({ha[col]} / {hb[col]})")
+                continue
+            if differing:
+                continue
+            only_a = len(ha) - len(shared)
+            only_b = len(hb) - len(shared)
+            if not only_a and not only_b:
+                overlapping.append(f"  {a} / {b}: 表头定义完全相同，{b} 永远不会被识别")
+            elif not only_a:
+                overlapping.append(f"  {a} / {b}: {b} 的表头包含 {a} 的全部 {len(shared)} 列，"
+                                   f"{b} 的文件会被识别为 {a}")
+            else:
+                overlapping.append(f"  {a} / {b}: 共同的 {len(shared)} 列表头相同，同时满足两者的表头识别为 {a} "
+                                   f"({a} 另有 {only_a} 列, {b} 另有 {only_b} 列)")
+        lines = [f"可能同时匹配的格式对 ({len(overlapping)} 对):"] + overlapping
+        lines += [f"只差一个共同约束列的格式对 ({len(one_column)} 对):"] + one_column
+        return lines
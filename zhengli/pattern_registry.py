@@ -0,0 +1,92 @@
+"""文件格式定义的统一注册表
+
+各脚本共用 patterns.json 中的格式定义。每次加载时解析、校验并建立表头索引，
+数百种格式也只需几毫秒，不做磁盘缓存 (缓存既可能在代码更新后读到旧结构，
+也不应写到用户指定的配置文件旁)。
+
+patterns.json 中每种格式:
+    headers:    {列号: 表头文字}，用于识别格式，列号不超过 HEADER_COLUMNS
+    mapping:    {源列号: 汇总表列号}，汇总表列号恰好为 1..6
+    split_time: 可选，日期列为带时分秒的文本时只取日期部分
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from zhengli.pattern_index import PatternIndex
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns.json")
+# 识别格式时读取的表头列数 (A..Z)
+HEADER_COLUMNS = 26
+
+
+def _column_dict(name: str, key: str, value: Any) -> Dict[int, Any]:
+    if not isinstance(value, dict) or not value:
+        raise ValueError(f"{name}.{key} 必须是非空对象")
+    result = {}
+    for col, item in value.items():
+        try:
+            col_no = int(col)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}.{key} 的列号无效: {col!r}") from None
+        if col_no < 1:
+            raise ValueError(f"{name}.{key} 的列号必须从1开始: {col!r}")
+        result[col_no] = item
+    return result
+
+
+def validate_definitions(raw: Any) -> Dict[str, Dict[str, Any]]:
+    """校验配置并把列号转换为整数，返回与原 pattern_definitions 相同结构的字典"""
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError("格式定义必须是非空对象")
+    definitions = {}
+    for name, info in raw.items():
+        if not isinstance(info, dict):
+            raise ValueError(f"{name} 必须是对象")
+        headers = _column_dict(name, "headers", info.get("headers"))
+        for col, text in headers.items():
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError(f"{name}.headers 第 {col} 列的表头必须是非空文本")
+            if col > HEADER_COLUMNS:
+                raise ValueError(f"{name}.headers 第 {col} 列超出识别范围 (最多 {HEADER_COLUMNS} 列)")
+        mapping = _column_dict(name, "mapping", info.get("mapping"))
+        if sorted(mapping.values()) != [1, 2, 3, 4, 5, 6]:
+            raise ValueError(f"{name}.mapping 必须恰好对应汇总表的6列: {mapping}")
+        if not isinstance(info.get("split_time", False), bool):
+            raise ValueError(f"{name}.split_time 必须是 true 或 false")
+        definition = dict(info)
+        definition["headers"] = {col: text.strip() for col, text in headers.items()}
+        definition["mapping"] = mapping
+        definitions[name] = definition
+    return definitions
+
+
+class PatternRegistry:
+    """已校验的格式定义及其表头索引
+
+    version 为配置文件内容的摘要，定义变化时随之变化，可作为整理结果缓存的版本号。
+    """
+
+    def __init__(self, definitions: Dict[str, Dict[str, Any]], version: str):
+        self.definitions = definitions
+        self.version = version
+        self.index = PatternIndex(definitions)
+
+
+def load_registry(config_path: Optional[str] = None) -> PatternRegistry:
+    """加载格式注册表"""
+    config_path = config_path or DEFAULT_CONFIG
+    with open(config_path, "rb") as f:
+        data = f.read()
+    version = hashlib.sha1(data).hexdigest()
+    try:
+        raw = json.loads(data.decode("utf-8-sig"))
+    except ValueError as e:
+        raise ValueError(f"格式定义文件无法解析 {config_path}: {e}") from None
+    return PatternRegistry(validate_definitions(raw), version)
+
+
+def load_pattern_definitions(config_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """读取格式定义，返回 {格式名: {"headers": ..., "mapping": ...}}"""
+    return load_registry(config_path).definitions
@@ -0,0 +1,107 @@
+"""汇总数据透视
+
+按可配置的列 (日期/品种/规格/批号/流向单位) 分组合计数量。
+分组直接在 FlowBatch 的字典编码列上进行：每批先以本批编码的元组为键聚合，
+再把各组的键换算为全局编码合并，不还原任何文本。
+"""
+import argparse
+from datetime import date
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from zhengli.flow_batch import FlowBatch, StringDictionary
+
+# 可用于分组的汇总表列及其在 FlowBatch 中的列名
+KEY_COLUMNS = {"日期": "days", "品种": "products", "规格": "specs", "批号": "batches", "流向单位": "customers"}
+DEFAULT_KEYS = ("品种", "规格", "流向单位")
+
+
+def parse_keys(text: str) -> Tuple[str, ...]:
+    """解析逗号分隔的分组列，例如 "品种,规格,流向单位" """
+    keys = tuple(key.strip() for key in text.replace("，", ",").split(",") if key.strip())
+    if not keys:
+        raise argparse.ArgumentTypeError("至少需要一个分组列")
+    for key in keys:
+        if key not in KEY_COLUMNS:
+            raise argparse.ArgumentTypeError(f"不支持的分组列: {key}，可选: {'/'.join(KEY_COLUMNS)}")
+    return keys
+
+
+def _sort_key(value: Any) -> Tuple[int, str]:
+    if value is None:
+        return (1, "")
+    if isinstance(value, date):
+        return (0, value.isoformat())
+    return (0, str(value))
+
+
+class PivotAggregator:
+    """按字典编码做哈希聚合的透视表"""
+
+    def __init__(self, keys: Sequence[str] = DEFAULT_KEYS):
+        self.keys = tuple(keys)
+        self.columns = [KEY_COLUMNS[key] for key in self.keys]
+        self.headers = list(self.keys) + ["数量", "行数"]
+        self.dictionary = StringDictionary()
+        # 全局编码元组 -> [数量合计, 行数]
+        self.groups: Dict[Tuple[int, ...], List[float]] = {}
+
+    def add_batch(self, batch: FlowBatch) -> None:
+        if not len(batch):
+            return
+        local: Dict[Tuple[int, ...], List[float]] = {}
+        for key, quantity in zip(zip(*[getattr(batch, column) for column in self.columns]), batch.quantities):
+            entry = local.get(key)
+            if entry is None:
+                local[key] = [quantity if quantity == quantity else 0.0, 1]
+            else:
+                if quantity == quantity:
+                    entry[0] += quantity
+                entry[1] += 1
+
+        # 本批编码换算为全局编码，只对出现过的组做一次
+        encode = self.dictionary.encode
+        values = batch.dictionary.values
+        remap: Dict[int, int] = {0: 0}
+        groups = self.groups
+        for key, (total, count) in local.items():
+            global_key = []
+            for column, code in zip(self.columns, key):
+                if column == "days" and code >= 0:
+                    global_key.append(code)
+                    continue
+                code = -code if column == "days" else code
+                mapped = remap.get(code)
+                if mapped is None:
+                    mapped = remap[code] = encode(values[code])
+                global_key.append(-mapped if column == "days" else mapped)
+            global_key = tuple(global_key)
+            entry = groups.get(global_key)
+            if entry is None:
+                groups[global_key] = [total, count]
+            else:
+                entry[0] += total
+                entry[1] += count
+
+    def add_batches(self, batches: Iterable[FlowBatch]) -> "PivotAggregator":
+        for batch in batches:
+            self.add_batch(batch)
+        return self
+
+    def _decode(self, column: str, code: int) -> Any:
+        if column == "days":
+            if code > 0:
+                return date.fromordinal(code)
+            return self.dictionary.decode(-code) if code < 0 else None
+        return self.dictionary.decode(code)
+
+    def rows(self) -> List[List[Any]]:
+        """透视结果，按分组列排序，每行为 分组列... 数量合计 行数"""
+        result = []
+        for key, (total, count) in self.groups.items():
+            row = [self._decode(column, code) for column, code in zip(self.columns, key)]
+            row.append(total)
+            row.append(count)
+            result.append(row)
+        width = len(self.columns)
+        result.sort(key=lambda row: [_sort_key(value) for value in row[:width]])
+        return result
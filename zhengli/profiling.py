@@ -0,0 +1,104 @@
+"""按文件的性能剖析
+
+--profile 模式下，每个输入文件的读取整理和汇总写出各自在一个范围内运行
+cProfile 和 tracemalloc。范围结束时在输出目录写出两份文件:
+    <名称>.prof  pstats 原始数据，可用 snakeviz 等工具查看
+    <名称>.txt   按累计耗时、自身耗时排序的函数表，以及分配内存最多的代码行
+
+未启用时调用方使用 nullcontext，不创建任何剖析对象，也不开启 tracemalloc。
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator, Set
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class Profiler:
+    """把各范围的剖析结果写入 directory"""
+
+    def __init__(self, directory: str, top: int = 30, frames: int = 1):
+        self.directory = directory
+        # 函数表和分配位置各列出的条数
+        self.top = top
+        # tracemalloc 记录的调用栈深度
+        self.frames = frames
+        self._names: Set[str] = set()
+        self._active = False
+
+    def _unique_name(self, name: str) -> str:
+        base = _UNSAFE_CHARS.sub("_", os.path.basename(name)) or "scope"
+        candidate, index = base, 1
+        while candidate in self._names or os.path.exists(os.path.join(self.directory, candidate + ".prof")):
+            index += 1
+            candidate = f"{base}-{index}"
+        self._names.add(candidate)
+        return candidate
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """剖析一个范围；已有范围在运行时不再嵌套，直接计入外层"""
+        if self._active:
+            yield
+            return
+        self._active = True
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.frames)
+            before = None
+        else:
+            before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        start = perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            self._active = False
+            try:
+                self._write(name, profile, snapshot, before, seconds, peak)
+            except OSError as e:
+                print(f"写出剖析结果失败: {e}")
+
+    def _write(self, name: str, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot,
+               before, seconds: float, peak: int) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self._unique_name(name))
+        profile.dump_stats(base + ".prof")
+
+        # 去掉 tracemalloc 自身和冻结模块的记录
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+        snapshot = snapshot.filter_traces(filters)
+        if before is not None:
+            allocations = snapshot.compare_to(before.filter_traces(filters), "lineno")
+        else:
+            allocations = snapshot.statistics("lineno")
+
+        out = io.StringIO()
+        out.write(f"范围: {name}\n")
+        out.write(f"耗时: {seconds:.3f} 秒\n")
+        out.write(f"内存峰值 (tracemalloc): {peak / 1e6:.1f} MB\n\n")
+        for title, key in (("按累计耗时排序", "cumulative"), ("按自身耗时排序", "tottime")):
+            out.write(f"{title}:\n")
+            pstats.Stats(profile, stream=out).strip_dirs().sort_stats(key).print_stats(self.top)
+        out.write(f"范围结束时仍占用内存最多的 {self.top} 个代码行:\n")
+        for stat in allocations[:self.top]:
+            frame = stat.traceback[0]
+            size = getattr(stat, "size_diff", stat.size)
+            count = getattr(stat, "count_diff", stat.count)
+            out.write(f"  {size / 1024:>10.1f} KiB {count:>9} 个  {frame.filename}:{frame.lineno}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
@@ -0,0 +1,793 @@
+"""流向文件读取后端
+
+native:  直接解析文件字节 (.xlsx 使用 zipfile + XML, .xls 解析 OLE2/BIFF 记录)，不需要 Excel 进程
+xlwings: 通过 Excel COM 打开工作簿 (原有方式)
+
+文件类型按开头字节识别而不是扩展名。伪装成 .xls 的 HTML 表格和分隔文本
+不论使用哪个后端都直接流式解析，不经过 Excel。
+"""
+import csv
+import os
+import re
+import struct
+import zipfile
+from array import array
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from zhengli import biff
+from zhengli.biff import CompoundFile, read_globals
+from zhengli.text_tables import (SNIFF_SIZE, convert_html_cell, convert_text, detect_encoding, first_line,
+                                 iter_html_rows, open_text, sniff_delimiter, sniff_format)
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# 流式解析时每次送入 expat 的字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# Excel 内置的日期/时间数字格式编号
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | {27, 30, 36, 45, 46, 47, 50, 57}
+
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_FORMAT_LITERAL = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+
+# .xls 单元格记录的公共前缀 (行, 列, XF) 及 MULRK 中的 (XF, RK)
+_CELL = struct.Struct("<HHH")
+_XF_RK = struct.Struct("<HI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_VALUE_RECORDS = frozenset((biff.LABELSST, biff.NUMBER, biff.RK, biff.MULRK, biff.LABEL, biff.RSTRING,
+                            biff.BOOLERR, biff.FORMULA))
+# 公式结果为字符串时的占位，实际文本在随后的 STRING 记录中
+_STRING_RESULT = object()
+
+
+def column_index(letters: str) -> int:
+    """列字母转换为从1开始的列号，例如 A -> 1, Z -> 26, AA -> 27"""
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def column_letter(index: int) -> str:
+    """从1开始的列号转换为列字母，例如 1 -> A, 27 -> AA"""
+    letters = ""
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def is_date_format(format_code: str) -> bool:
+    """判断自定义数字格式是否为日期格式"""
+    code = _FORMAT_LITERAL.sub("", format_code).lower()
+    return any(ch in code for ch in "ymd")
+
+
+def excel_serial_to_datetime(serial: float, date1904: bool = False) -> datetime:
+    """Excel 序列日期转换为 datetime"""
+    base = datetime(1904, 1, 1) if date1904 else datetime(1899, 12, 30)
+    return base + timedelta(days=serial)
+
+
+def iso_to_datetime(text: str) -> datetime:
+    """ISO 8601 日期单元格 (t="d") 转换为 datetime
+
+    只有时间的值按 Excel 的习惯落在 1899-12-30，与序列日期 0 一致。
+    """
+    text = text.strip()
+    if text.endswith("Z"):
+        text = text[:-1]
+    if text.startswith("T"):
+        text = text[1:]
+    if "-" not in text[:5]:
+        return datetime.combine(datetime(1899, 12, 30), time.fromisoformat(text))
+    return datetime.fromisoformat(text)
+
+
+class SheetReader:
+    """工作表读取接口，行列号均从1开始"""
+
+    def header_row(self, max_col: int = 26) -> List[Any]:
+        """读取第一行的 A..max_col 单元格"""
+        raise NotImplementedError
+
+    def last_row(self) -> int:
+        """返回已使用区域的最后一行行号
+
+        在 iter_rows 完整读取之后调用不会再次扫描文件。
+        """
+        raise NotImplementedError
+
+    def iter_rows(self, columns: Sequence[int], start_row: int = 2) -> Iterator[List[Any]]:
+        """逐行返回指定列的单元格值，顺序与 columns 一致
+
+        columns 以外的单元格在解析层直接跳过，不会转换成 Python 对象。
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class XlsxSheetReader(SheetReader):
+    """直接解析 .xlsx 文件中第一个工作表的 XML
+
+    工作表 XML 以 expat (SAX) 流式解析，按块读取、逐行产出，
+    峰值内存只与单行数据和共享字符串表有关。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.zf = zipfile.ZipFile(file_path)
+        self.date1904 = False
+        self.shared_strings_path = "xl/sharedStrings.xml"
+        self.sheet_path = self._first_sheet_path()
+        self.shared_strings = SharedStrings(self.zf, self.shared_strings_path)
+        # 日期样式在第一次遇到带样式的数值单元格时才解析 styles.xml
+        self._date_styles: Optional[set] = None
+        self._last_row: Optional[int] = None
+
+    def _first_sheet_path(self) -> str:
+        workbook = ET.fromstring(self.zf.read("xl/workbook.xml"))
+        pr = workbook.find(f"{NS_MAIN}workbookPr")
+        if pr is not None and pr.get("date1904") in ("1", "true"):
+            self.date1904 = True
+        sheet = workbook.find(f"{NS_MAIN}sheets/{NS_MAIN}sheet")
+        rid = sheet.get(f"{NS_REL}id")
+        rels = ET.fromstring(self.zf.read("xl/_rels/workbook.xml.rels"))
+        sheet_path = "xl/worksheets/sheet1.xml"
+        for rel in rels.iter(f"{NS_PKG_REL}Relationship"):
+            target = rel.get("Target")
+            target = target[1:] if target.startswith("/") else "xl/" + target
+            if rel.get("Id") == rid:
+                sheet_path = target
+            elif rel.get("Type", "").endswith("/sharedStrings"):
+                self.shared_strings_path = target
+        return sheet_path
+
+    @property
+    def date_styles(self) -> set:
+        if self._date_styles is None:
+            self._date_styles = self._load_date_styles()
+        return self._date_styles
+
+    def _load_date_styles(self) -> set:
+        if "xl/styles.xml" not in self.zf.namelist():
+            return set()
+        root = ET.fromstring(self.zf.read("xl/styles.xml"))
+        date_formats = set(BUILTIN_DATE_FORMATS)
+        num_fmts = root.find(f"{NS_MAIN}numFmts")
+        if num_fmts is not None:
+            for fmt in num_fmts:
+                if is_date_format(fmt.get("formatCode", "")):
+                    date_formats.add(int(fmt.get("numFmtId")))
+        styles = set()
+        cell_xfs = root.find(f"{NS_MAIN}cellXfs")
+        if cell_xfs is not None:
+            for index, xf in enumerate(cell_xfs):
+                if int(xf.get("numFmtId", 0)) in date_formats:
+                    styles.add(index)
+        return styles
+
+    def _convert(self, cell_type: str, text: str, style: Optional[str]) -> Any:
+        """按单元格类型转换 <v> 文本"""
+        if cell_type == "s":
+            return self.shared_strings[int(text)]
+        if cell_type == "str" or cell_type == "inlineStr":
+            return text
+        if cell_type == "b":
+            return text == "1"
+        if cell_type == "e":
+            return None
+        if cell_type == "d":
+            return iso_to_datetime(text)
+        number = float(text)
+        if style and int(style) in self.date_styles:
+            return excel_serial_to_datetime(number, self.date1904)
+        return number
+
+    def _iter_sheet_rows(self, columns: Sequence[int],
+                         stop_row: Optional[int] = None) -> Iterator[Tuple[int, List[Any]]]:
+        """流式解析工作表，逐行返回 (行号, 投影列的值)，读到 stop_row 后停止"""
+        handler = _SheetHandler(self, columns)
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = handler.start
+        parser.EndElementHandler = handler.end
+        parser.CharacterDataHandler = handler.characters
+        with self.zf.open(self.sheet_path) as stream:
+            while True:
+                chunk = stream.read(READ_CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                rows, handler.rows = handler.rows, []
+                for row in rows:
+                    yield row
+                    if stop_row is not None and row[0] >= stop_row:
+                        return
+                if not chunk or handler.done:
+                    return
+
+    def _dimension_last_row(self) -> Optional[int]:
+        """从 <dimension ref="A1:Y1234"> 读取最后一行，不扫描数据行"""
+        handler = _SheetHandler(self, ())
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = handler.start
+        with self.zf.open(self.sheet_path) as stream:
+            while handler.dimension is None and not handler.in_data:
+                chunk = stream.read(READ_CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                if not chunk:
+                    break
+        match = _CELL_REF.match((handler.dimension or "").split(":")[-1])
+        return int(match.group(2)) if match else None
+
+    def header_row(self, max_col: int = 26) -> List[Any]:
+        for row_no, values in self._iter_sheet_rows(range(1, max_col + 1), stop_row=1):
+            if row_no == 1:
+                return values
+            break
+        return [None] * max_col
+
+    def last_row(self) -> int:
+        if self._last_row is None:
+            last_row = self._dimension_last_row()
+            if last_row is None:
+                last_row = 0
+                for row_no, _ in self._iter_sheet_rows(()):
+                    last_row = row_no
+            self._last_row = last_row
+        return self._last_row
+
+    def iter_rows(self, columns: Sequence[int], start_row: int = 2) -> Iterator[List[Any]]:
+        last_row = 0
+        for row_no, values in self._iter_sheet_rows(columns):
+            last_row = row_no
+            if row_no >= start_row:
+                yield values
+        # 完整读取后记下实际最后一行，统计行数时无需再扫描
+        self._last_row = last_row
+
+    def close(self) -> None:
+        self.shared_strings.close()
+        self.zf.close()
+
+
+class SharedStrings:
+    """按需解析的共享字符串表
+
+    sharedStrings.xml 只在访问到某个索引时才向后流式解析到该位置，
+    已解析的字符串以 UTF-8 连续存放在一个 bytearray 中，用 array 记录结束偏移，
+    取值时才解码。只读表头时通常只需解析开头的几十个字符串。
+    """
+
+    # 已解码字符串的缓存上限，同一文件中客户名、品名大量重复
+    cache_size = 4096
+
+    def __init__(self, zf: zipfile.ZipFile, path: str):
+        self.zf = zf
+        self.path = path
+        self.pool = bytearray()
+        self.offsets = array("Q", [0])
+        self.cache: Dict[int, str] = {}
+        self.stream = None
+        self.parser = None
+        self.exhausted = path not in zf.namelist()
+        self.text: List[str] = []
+        self.in_text = False
+        self.in_phonetic = False
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        value = self.cache.get(index)
+        if value is not None:
+            return value
+        if index >= len(self.offsets) - 1:
+            self._parse_until(index)
+            if index >= len(self.offsets) - 1:
+                raise IndexError(f"共享字符串索引超出范围: {index}")
+        value = self.pool[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[index] = value
+        return value
+
+    def _parse_until(self, index: int) -> None:
+        if self.exhausted:
+            return
+        if self.parser is None:
+            self.stream = self.zf.open(self.path)
+            self.parser = expat.ParserCreate()
+            self.parser.buffer_text = True
+            self.parser.StartElementHandler = self._start
+            self.parser.EndElementHandler = self._end
+            self.parser.CharacterDataHandler = self._characters
+        while index >= len(self.offsets) - 1:
+            chunk = self.stream.read(READ_CHUNK_SIZE)
+            self.parser.Parse(chunk, not chunk)
+            if not chunk:
+                self.close()
+                break
+
+    def _start(self, name: str, attrs: Dict[str, str]) -> None:
+        local = name.rpartition(":")[2]
+        if local == "t":
+            self.in_text = not self.in_phonetic
+        elif local == "si":
+            self.text = []
+        elif local == "rPh":
+            self.in_phonetic = True
+
+    def _characters(self, data: str) -> None:
+        if self.in_text:
+            self.text.append(data)
+
+    def _end(self, name: str) -> None:
+        local = name.rpartition(":")[2]
+        if local == "t":
+            self.in_text = False
+        elif local == "si":
+            # 只拼接正文 <t>，跳过拼音注释 <rPh>
+            self.pool += "".join(self.text).encode("utf-8")
+            self.offsets.append(len(self.pool))
+        elif local == "rPh":
+            self.in_phonetic = False
+
+    def close(self) -> None:
+        self.exhausted = True
+        self.parser = None
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class _SheetHandler:
+    """worksheet XML 的 expat 事件处理器
+
+    只在 <row> 结束时把整行放入 rows，调用方在每次 Parse 后取走。
+    不在 columns 中的单元格不收集文本、不做类型转换。
+    标签可能带有命名空间前缀 (例如 x:row)，在根元素上识别一次。
+    """
+
+    def __init__(self, reader: XlsxSheetReader, columns: Sequence[int]):
+        self.reader = reader
+        # 列号 -> 在输出行中的位置
+        self.positions = {col: pos for pos, col in enumerate(columns)}
+        self.width = len(self.positions)
+        # 列字母 -> 列号，同一文件中列字母重复出现，缓存避免重复换算
+        self.letter_index: Dict[str, int] = {}
+        self.rows: List[Tuple[int, List[Any]]] = []
+        self.done = False
+        self.in_data = False
+        self.dimension: Optional[str] = None
+        self.prefix: Optional[str] = None
+        self.row_no = 0
+        self.values: List[Any] = []
+        self.col_no = 0
+        self.position: Optional[int] = None
+        self.cell_type = "n"
+        self.style = None
+        self.text: List[str] = []
+        self.in_text = False
+        self.in_phonetic = False
+
+    def _set_prefix(self, name: str) -> None:
+        self.prefix = name[:name.index(":") + 1] if ":" in name else ""
+        p = self.prefix
+        self.tag_row, self.tag_c, self.tag_v, self.tag_t = p + "row", p + "c", p + "v", p + "t"
+        self.tag_is, self.tag_rph = p + "is", p + "rPh"
+        self.tag_sheet_data, self.tag_dimension = p + "sheetData", p + "dimension"
+
+    def start(self, name: str, attrs: Dict[str, str]) -> None:
+        if self.prefix is None:
+            self._set_prefix(name)
+        if name == self.tag_c:
+            ref = attrs.get("r")
+            if ref:
+                letters = ref.rstrip("0123456789")
+                col_no = self.letter_index.get(letters)
+                if col_no is None:
+                    col_no = self.letter_index[letters] = column_index(letters)
+                self.col_no = col_no
+            else:
+                self.col_no += 1
+            self.position = self.positions.get(self.col_no)
+            if self.position is not None:
+                self.cell_type = attrs.get("t", "n")
+                self.style = attrs.get("s")
+                self.text = []
+        elif name == self.tag_v or (name == self.tag_t and not self.in_phonetic):
+            self.in_text = self.position is not None
+        elif name == self.tag_row:
+            self.row_no = int(attrs.get("r", self.row_no + 1))
+            self.values = [None] * self.width
+            self.col_no = 0
+        elif name == self.tag_rph:
+            self.in_phonetic = True
+        elif name == self.tag_sheet_data:
+            self.in_data = True
+        elif name == self.tag_dimension:
+            self.dimension = attrs.get("ref")
+
+    def characters(self, data: str) -> None:
+        if self.in_text:
+            self.text.append(data)
+
+    def end(self, name: str) -> None:
+        if name == self.tag_c:
+            if self.position is not None and self.text:
+                self.values[self.position] = self.reader._convert(
+                    self.cell_type, "".join(self.text), self.style)
+                self.position = None
+        elif name == self.tag_v or name == self.tag_t:
+            self.in_text = False
+        elif name == self.tag_row:
+            self.rows.append((self.row_no, self.values))
+        elif name == self.tag_rph:
+            self.in_phonetic = False
+        elif name == self.tag_sheet_data:
+            self.done = True
+
+
+class XlsSheetReader(SheetReader):
+    """直接解析旧版 .xls (BIFF8/BIFF5) 文件的第一个工作表
+
+    逐条读取工作表记录，先取单元格的列号，只有投影列的 LABELSST/NUMBER/RK/MULRK 等
+    记录才转换成 Python 对象；共享字符串只在被引用时解码。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.compound = CompoundFile(file_path)
+        try:
+            self.stream = self.compound.open_stream("Workbook", "Book")
+            self.book = read_globals(self.stream, file_path)
+            self.sheet_offset = self.book.first_worksheet()
+        except Exception:
+            self.compound.close()
+            raise
+        self.sst = self.book.sst
+        self._date_styles: Optional[set] = None
+        self._last_row: Optional[int] = None
+
+    @property
+    def date_styles(self) -> set:
+        """数字格式为日期的 XF 序号"""
+        if self._date_styles is None:
+            formats = self.book.formats
+            styles = set()
+            for index, format_id in enumerate(self.book.xf_formats):
+                if format_id in formats:
+                    if is_date_format(formats[format_id]):
+                        styles.add(index)
+                elif format_id in BUILTIN_DATE_FORMATS:
+                    styles.add(index)
+            self._date_styles = styles
+        return self._date_styles
+
+    def _number(self, value: float, style: int) -> Any:
+        if style in self.date_styles:
+            return excel_serial_to_datetime(value, self.book.date1904)
+        return value
+
+    def _label(self, data: bytes, offset: int) -> str:
+        """LABEL/RSTRING/STRING 记录中的文本"""
+        if self.book.version == biff.BIFF8:
+            return biff.unicode_string(data, offset)[0]
+        size = _U16.unpack_from(data, offset)[0]
+        return data[offset + 2:offset + 2 + size].decode(self.book.encoding, "replace")
+
+    def _iter_sheet_rows(self, columns: Sequence[int],
+                         stop_row: Optional[int] = None) -> Iterator[Tuple[int, List[Any]]]:
+        """逐行返回 (行号, 投影列的值)，只含有投影列单元格的行；读到 stop_row 后停止
+
+        单元格记录按行号递增排列，行号变化时产出上一行。
+        """
+        wanted = {col - 1: position for position, col in enumerate(columns)}
+        width = len(columns)
+        sst = self.sst
+        date_styles = self.date_styles
+        number = self._number
+        unpack_cell = _CELL.unpack_from
+        unpack_u32 = _U32.unpack_from
+        unpack_f64 = _F64.unpack_from
+        rk_value = biff.rk_value
+
+        current = -1
+        values: Optional[List[Any]] = None
+        last_row = -1
+        pending = None
+        for record_type, data, start, length in biff.iter_records(self.stream, self.sheet_offset):
+            if record_type == biff.EOF:
+                break
+            if record_type in _VALUE_RECORDS:
+                row, col, style = unpack_cell(data, start)
+                if row > last_row:
+                    last_row = row
+                if stop_row is not None and row >= stop_row:
+                    break
+                if record_type == biff.MULRK:
+                    # 一行中连续的 RK 数值: (XF, RK) × n，最后两字节为末列号
+                    last_col = _U16.unpack_from(data, start + length - 2)[0]
+                    for offset, column in enumerate(range(col, last_col + 1)):
+                        position = wanted.get(column)
+                        if position is None:
+                            continue
+                        style, rk = _XF_RK.unpack_from(data, start + 4 + 6 * offset)
+                        if row != current:
+                            if values is not None:
+                                yield current + 1, values
+                            current, values = row, [None] * width
+                        value = rk_value(rk)
+                        values[position] = number(value, style) if style in date_styles else value
+                    continue
+                position = wanted.get(col)
+                if position is None:
+                    continue
+                if record_type == biff.LABELSST:
+                    value = sst[unpack_u32(data, start + 6)[0]]
+                elif record_type == biff.NUMBER:
+                    value = unpack_f64(data, start + 6)[0]
+                    if style in date_styles:
+                        value = number(value, style)
+                elif record_type == biff.RK:
+                    value = rk_value(unpack_u32(data, start + 6)[0])
+                    if style in date_styles:
+                        value = number(value, style)
+                elif record_type == biff.FORMULA:
+                    value = self._formula_result(data, start + 6, style)
+                    if value is _STRING_RESULT:
+                        # 字符串结果在紧随其后的 STRING 记录中
+                        pending = (row, position)
+                        value = None
+                elif record_type == biff.BOOLERR:
+                    value = None if data[start + 7] else bool(data[start + 6])
+                else:
+                    value = self._label(data, start + 6)
+                if row != current:
+                    if values is not None:
+                        yield current + 1, values
+                    current, values = row, [None] * width
+                values[position] = value
+            elif record_type == biff.STRING and pending is not None:
+                if pending[0] == current:
+                    values[pending[1]] = self._label(data, start)
+                pending = None
+        if values is not None:
+            yield current + 1, values
+        if stop_row is None:
+            self._last_row = last_row + 1
+
+    def _formula_result(self, data: bytes, offset: int, style: int) -> Any:
+        """FORMULA 记录中缓存的计算结果，末两字节为 0xFFFF 时为非数值结果"""
+        if _U16.unpack_from(data, offset + 6)[0] != 0xFFFF:
+            return self._number(_F64.unpack_from(data, offset)[0], style)
+        kind = data[offset]
+        if kind == 0:
+            return _STRING_RESULT
+        if kind == 1:
+            return bool(data[offset + 2])
+        if kind == 3:
+            return ""
+        return None
+
+    def _dimension_last_row(self) -> Optional[int]:
+        """从 DIMENSIONS 记录读取最后一行，不扫描单元格"""
+        for record_type, data, start, length in biff.iter_records(self.stream, self.sheet_offset):
+            if record_type == biff.DIMENSIONS:
+                if self.book.version == biff.BIFF8:
+                    return _U32.unpack_from(data, start + 4)[0]
+                return _U16.unpack_from(data, start + 2)[0]
+            if record_type in _VALUE_RECORDS or record_type == biff.EOF:
+                return None
+        return None
+
+    def header_row(self, max_col: int = 26) -> List[Any]:
+        for row_no, values in self._iter_sheet_rows(range(1, max_col + 1), stop_row=1):
+            if row_no == 1:
+                return values
+            break
+        return [None] * max_col
+
+    def last_row(self) -> int:
+        if self._last_row is None:
+            last_row = self._dimension_last_row()
+            if last_row is None:
+                for _ in self._iter_sheet_rows(()):
+                    pass
+                last_row = self._last_row
+            self._last_row = last_row
+        return self._last_row
+
+    def iter_rows(self, columns: Sequence[int], start_row: int = 2) -> Iterator[List[Any]]:
+        for row_no, values in self._iter_sheet_rows(columns):
+            if row_no >= start_row:
+                yield values
+
+    def close(self) -> None:
+        self.compound.close()
+
+
+class TextTableSheetReader(SheetReader):
+    """文本表格 (HTML 表格或分隔文本) 的公共读取逻辑
+
+    没有记录行数的元数据，每次读取都从头流式解析；行号为表格中的行序号，
+    空行不产出。只有投影列的原始文本会转换为数字。
+    """
+
+    def __init__(self, file_path: str, encoding: str):
+        self.file_path = file_path
+        self.encoding = encoding
+        self._last_row: Optional[int] = None
+
+    def _parse_rows(self, stream: TextIO) -> Iterator[List[Any]]:
+        """逐行返回原始单元格"""
+        raise NotImplementedError
+
+    def _convert(self, value: Any) -> Any:
+        raise NotImplementedError
+
+    def _iter_sheet_rows(self, columns: Sequence[int],
+                         stop_row: Optional[int] = None) -> Iterator[Tuple[int, List[Any]]]:
+        """流式解析文件，逐行返回 (行号, 投影列的值)，读到 stop_row 后停止"""
+        convert = self._convert
+        indexes = [col - 1 for col in columns]
+        last_row = 0
+        with open_text(self.file_path, self.encoding) as stream:
+            for row_no, cells in enumerate(self._parse_rows(stream), 1):
+                if not cells:
+                    continue
+                last_row = row_no
+                size = len(cells)
+                yield row_no, [convert(cells[index]) if index < size else None for index in indexes]
+                if stop_row is not None and row_no >= stop_row:
+                    return
+        self._last_row = last_row
+
+    def header_row(self, max_col: int = 26) -> List[Any]:
+        for row_no, values in self._iter_sheet_rows(range(1, max_col + 1), stop_row=1):
+            if row_no == 1:
+                return values
+            break
+        return [None] * max_col
+
+    def last_row(self) -> int:
+        if self._last_row is None:
+            for _ in self._iter_sheet_rows(()):
+                pass
+        return self._last_row
+
+    def iter_rows(self, columns: Sequence[int], start_row: int = 2) -> Iterator[List[Any]]:
+        for row_no, values in self._iter_sheet_rows(columns):
+            if row_no >= start_row:
+                yield values
+
+
+class DelimitedSheetReader(TextTableSheetReader):
+    """制表符/逗号等分隔的文本，分隔符由 open_sheet 从第一行猜测"""
+
+    def __init__(self, file_path: str, encoding: str, delimiter: str = "\t"):
+        super().__init__(file_path, encoding)
+        self.delimiter = delimiter
+
+    def _parse_rows(self, stream: TextIO) -> Iterator[List[Any]]:
+        return csv.reader(stream, delimiter=self.delimiter)
+
+    def _convert(self, value: Any) -> Any:
+        return convert_text(value)
+
+
+class HtmlSheetReader(TextTableSheetReader):
+    """网页表格 (平台导出的 "xls" 多为此类)"""
+
+    def _parse_rows(self, stream: TextIO) -> Iterator[List[Any]]:
+        return iter_html_rows(stream)
+
+    def _convert(self, value: Any) -> Any:
+        return convert_html_cell(value)
+
+
+class XlwingsSheetReader(SheetReader):
+    """通过 Excel COM 读取工作表 (需要 Windows + Excel)"""
+
+    batch_size = 1000
+
+    def __init__(self, app, file_path: str):
+        self.file_path = file_path
+        self.wb = app.books.open(file_path)
+        self.ws = self.wb.sheets[0]
+
+    def header_row(self, max_col: int = 26) -> List[Any]:
+        value = self.ws.range(f"A1:{column_letter(max_col)}1").value
+        return value if isinstance(value, list) else [value]
+
+    def last_row(self) -> int:
+        return self.ws.used_range.last_cell.row
+
+    def iter_rows(self, columns: Sequence[int], start_row: int = 2) -> Iterator[List[Any]]:
+        # COM 按连续区域读取更快，读取 A..max_col 后再取出需要的列
+        max_col = max(columns)
+        project = itemgetter(*[col - 1 for col in columns])
+        last_row = self.last_row()
+        # 分批读取大文件，避免内存问题
+        for batch_start in range(start_row, last_row + 1, self.batch_size):
+            batch_end = min(batch_start + self.batch_size - 1, last_row)
+            data_range = f"A{batch_start}:{column_letter(max_col)}{batch_end}"
+            try:
+                batch_data = self.ws.range(data_range).value
+            except Exception as e:
+                print(f"处理批次数据时出错 (行 {batch_start}-{batch_end}): {e}")
+                continue
+
+            # 处理单行数据的情况
+            if not isinstance(batch_data, list):
+                batch_data = [batch_data] if batch_data is not None else []
+            elif batch_data and not isinstance(batch_data[0], (list, tuple)):
+                batch_data = [batch_data]
+
+            for row_data in batch_data:
+                if isinstance(row_data, (list, tuple)):
+                    row_data = list(row_data) + [None] * (max_col - len(row_data))
+                    values = project(row_data)
+                    yield list(values) if len(columns) > 1 else [values]
+
+    def close(self) -> None:
+        try:
+            self.wb.close()
+        except:
+            pass
+
+
+def sniff_file(file_path: str) -> Tuple[str, bytes]:
+    """按开头字节识别文件格式，返回 (格式, 开头字节)，格式见 sniff_format"""
+    with open(file_path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+    return sniff_format(head), head
+
+
+def read_header(file_path: str, max_col: int = 26, backend: str = "native", app=None) -> List[Any]:
+    """只读取第一行表头，用于快速识别文件格式
+
+    .xlsx 解析到第一行结束即停止，不读取样式表，共享字符串只解析到表头用到的位置；
+    .xls 读完全局记录后只扫描到第二行的第一个单元格；
+    HTML 表格和分隔文本只解析到第一行结束。
+    xlwings 后端下，本地无法解析的格式 (如另存为 .xls 的 Excel 2003 XML) 通过 Excel 读取表头。
+    """
+    if backend == "xlwings" and sniff_file(file_path)[0] == "unknown":
+        sheet = XlwingsSheetReader(app, file_path)
+    else:
+        sheet = open_sheet(file_path)
+    try:
+        return sheet.header_row(max_col)
+    finally:
+        sheet.close()
+
+
+def open_sheet(file_path: str, backend: str = "native", app=None) -> SheetReader:
+    """按文件内容打开第一个工作表
+
+    经销商平台下载的 "xls" 常是 HTML 表格或分隔文本，按开头字节识别后直接流式解析；
+    真正的工作簿按后端打开。
+    """
+    kind, head = sniff_file(file_path)
+    if kind == "html":
+        return HtmlSheetReader(file_path, detect_encoding(head, html=True))
+    if kind == "text":
+        encoding = detect_encoding(head)
+        return DelimitedSheetReader(file_path, encoding, sniff_delimiter(first_line(head, encoding)))
+    if backend == "xlwings":
+        return XlwingsSheetReader(app, file_path)
+    if kind == "xlsx":
+        return XlsxSheetReader(file_path)
+    if kind == "xls":
+        return XlsSheetReader(file_path)
+    raise ValueError(f"不支持的文件格式: {os.path.basename(file_path)}")
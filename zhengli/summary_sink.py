@@ -0,0 +1,98 @@
+"""汇总数据缓冲
+
+整理后的数据以列式 FlowBatch 累积在内存中，超过阈值后以 pickle 溢写到临时文件，
+全部文件处理完成后一次性写出汇总工作簿，而不是每个输入文件保存一次。
+"""
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from zhengli.flow_batch import FlowBatch
+
+Row = Sequence[Any]
+
+
+class SummarySink:
+    """汇总行缓冲区
+
+    writer 接收全部汇总行的迭代器并写出完整的汇总文件。
+    checkpoint_every > 0 时，每处理完这么多个输入文件就写出一次已有数据，
+    程序中途崩溃时汇总文件中至少保留上一次检查点之前的数据。
+    """
+
+    def __init__(self, writer: Callable[[Iterable[Row]], None],
+                 spill_rows: int = 100000, checkpoint_every: int = 0,
+                 spill_dir: Optional[str] = None):
+        self.writer = writer
+        self.spill_rows = spill_rows
+        self.checkpoint_every = checkpoint_every
+        self.spill_dir = spill_dir
+        self.buffer: List[FlowBatch] = []
+        self.buffered_rows = 0
+        self.spill_file = None
+        self.spill_path = None
+        self.spilled_rows = 0
+        self.row_count = 0
+        self.file_count = 0
+
+    def add_batch(self, batch: FlowBatch) -> None:
+        """追加一批整理后的数据"""
+        if not len(batch):
+            return
+        self.buffer.append(batch)
+        self.buffered_rows += len(batch)
+        if self.buffered_rows >= self.spill_rows:
+            self._spill()
+        self.row_count = self.spilled_rows + self.buffered_rows
+
+    def _spill(self) -> None:
+        if self.spill_file is None:
+            fd, path = tempfile.mkstemp(prefix="summary_", suffix=".spill", dir=self.spill_dir)
+            self.spill_file = os.fdopen(fd, "wb")
+            self.spill_path = path
+        pickle.dump(self.buffer, self.spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spilled_rows += self.buffered_rows
+        self.buffer = []
+        self.buffered_rows = 0
+
+    def file_done(self) -> None:
+        """一个输入文件处理完成，必要时写出检查点"""
+        self.file_count += 1
+        if self.checkpoint_every > 0 and self.file_count % self.checkpoint_every == 0:
+            print(f"写入检查点: 已处理 {self.file_count} 个文件, {self.row_count} 行")
+            self.writer(self.iter_rows())
+
+    def iter_batches(self) -> Iterator[FlowBatch]:
+        """按追加顺序返回全部数据批，先读溢写文件再读内存缓冲"""
+        if self.spill_file is not None:
+            self.spill_file.flush()
+            with open(self.spill_path, "rb") as f:
+                while True:
+                    try:
+                        chunk = pickle.load(f)
+                    except EOFError:
+                        break
+                    yield from chunk
+        yield from self.buffer
+
+    def iter_rows(self) -> Iterator[Row]:
+        """按追加顺序返回全部行"""
+        for batch in self.iter_batches():
+            yield from batch.rows()
+
+    def finish(self) -> None:
+        """一次性写出汇总文件并清理临时文件"""
+        try:
+            self.writer(self.iter_rows())
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
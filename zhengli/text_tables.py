@@ -0,0 +1,327 @@
+"""伪装成 .xls 的文本表格
+
+不少经销商平台下载的 "xls" 实际是 HTML 表格或制表符分隔的文本，
+Excel 打开时很慢且会弹出格式不符的警告。这里按文件开头的字节识别真实格式，
+并以流式方式解析:
+    HTML   逐块用正则定位标签，每读完一个 <tr> 产出一行，支持 colspan/rowspan
+    文本   csv 模块逐行读取，分隔符从第一行猜测 (制表符、逗号、分号、竖线)
+
+编码依次按 BOM、HTML 中声明的 charset、能否按 UTF-8 解码判断，否则视为 GB18030 (兼容 GBK/GB2312)。
+单元格值按 Excel 打开文本时的习惯转换: 空白为 None，普通数字为 float，其余保持文本
+(带前导零的编号不转换，避免丢失零)。
+"""
+import codecs
+import io
+import re
+from html import unescape
+from typing import Any, Dict, Iterator, List, Optional, Pattern, TextIO, Tuple
+
+# 识别格式时读取的文件开头字节数
+SNIFF_SIZE = 64 * 1024
+# 流式解析时每次读取的字符数
+READ_CHUNK_SIZE = 64 * 1024
+
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+
+# 可能的分隔符，按优先级排列
+DELIMITERS = "\t,;|"
+
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_HTML_MARKERS = (b"<html", b"<!doctype html", b"<table", b"<head", b"<body", b"<meta")
+_CHARSET = re.compile(rb"""charset\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+# 普通数字: 可带正负号、千位分隔符和小数，整数部分不以 0 开头 (0 本身和 0.x 除外)
+_NUMBER = re.compile(r"[+-]?(?:0|[1-9]\d{0,2}(?:,\d{3})+|[1-9]\d*)(?:\.\d+)?")
+_WHITESPACE = re.compile(r"\s+")
+# 注释，或开始/结束标签 (属性值中允许出现 ">")
+_TAG = re.compile(r"""<(?:!--.*?--\s*>|(/?)([A-Za-z][\w:-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>)""", re.DOTALL)
+_ATTRIBUTE = re.compile(r"""([^\s=/>]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+# 内容不是 HTML 的元素，跳到对应的结束标签
+_RAW_TEXT_TAGS = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in ("script", "style")}
+# 网页导出的 Excel 以 mso-number-format:"\@" 或 x:str 标记按文本保存的单元格
+_TEXT_FORMAT = re.compile(r"mso-number-format\s*:\s*['\"]?\\?@", re.IGNORECASE)
+# GB2312/GBK 声明的网页常混有扩展字符，统一按超集解码
+_ENCODING_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "cp936": "gb18030", "x-gbk": "gb18030"}
+
+
+def sniff_format(head: bytes) -> str:
+    """根据文件开头的字节判断格式: xls、xlsx、html、text，无法识别时返回 unknown"""
+    if head.startswith(OLE2_MAGIC):
+        return "xls"
+    if head.startswith(ZIP_MAGIC):
+        return "xlsx"
+    encoding = bom_encoding(head)
+    if encoding == "utf-16":
+        sample = head.decode("utf-16", errors="ignore").lower().encode("utf-8")
+    elif b"\x00" in head:
+        return "unknown"
+    else:
+        sample = head.lower()
+    # Excel 2003 XML 表格 (<Workbook>...<Table><Row>) 不是 HTML，暂不支持
+    if b"<workbook" in sample:
+        return "unknown"
+    if any(marker in sample for marker in _HTML_MARKERS):
+        return "html"
+    # 其他 XML 文档
+    if sample.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<?xml"):
+        return "unknown"
+    return "text"
+
+
+def bom_encoding(head: bytes) -> Optional[str]:
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def detect_encoding(head: bytes, html: bool = False) -> str:
+    """判断文本文件的编码"""
+    encoding = bom_encoding(head)
+    if encoding:
+        return encoding
+    if html:
+        match = _CHARSET.search(head)
+        if match:
+            name = match.group(1).decode("ascii").lower()
+            try:
+                name = codecs.lookup(name).name
+            except LookupError:
+                name = None
+            if name:
+                return _ENCODING_ALIASES.get(name, name)
+    try:
+        # 开头可能截断在多字节字符中间，用增量解码器忽略末尾未完成的字符
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def sniff_delimiter(first_line: str) -> str:
+    """按第一行中出现次数最多的候选字符确定分隔符，制表符优先"""
+    if "\t" in first_line:
+        return "\t"
+    counts = [(first_line.count(ch), -index, ch) for index, ch in enumerate(DELIMITERS)]
+    count, _, delimiter = max(counts)
+    return delimiter if count else "\t"
+
+
+def convert_text(value: str) -> Any:
+    """文本单元格转换为 Excel 打开时的值: 空白为 None，普通数字为 float"""
+    value = value.strip()
+    if not value:
+        return None
+    if _NUMBER.fullmatch(value):
+        return float(value.replace(",", ""))
+    return value
+
+
+class TextCell(str):
+    """网页中标记为文本格式的单元格原文，转换时不识别为数字"""
+    __slots__ = ()
+
+
+def convert_html_cell(value: Optional[str]) -> Any:
+    """网页单元格原文转换为值: 还原字符实体，空白折叠为一个空格，再按文本单元格转换"""
+    if value is None:
+        return None
+    text = unescape(value) if "&" in value else value
+    text = _WHITESPACE.sub(" ", text).strip()
+    if type(value) is TextCell:
+        return text or None
+    return convert_text(text)
+
+
+def open_text(file_path: str, encoding: str) -> TextIO:
+    # newline="" 交给 csv 处理引号内的换行
+    return io.open(file_path, "r", encoding=encoding, newline="")
+
+
+def first_line(head: bytes, encoding: str) -> str:
+    """文件开头字节中的第一行文本，用于猜测分隔符"""
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(head)
+    return text.split("\n", 1)[0]
+
+
+class HtmlTableParser:
+    """把 HTML 中各个 <table> 的行依次展开为二维表
+
+    与 Excel 打开网页表格一致: 多个表格的行首尾相接，colspan/rowspan 覆盖的位置为 None。
+    读完的行放在 rows 中，由调用方取走；单元格为去掉内部标签的原文，
+    由 convert_html_cell 只对需要的列转换。
+
+    导出的网页表格只用到少数几种标签，这里用正则逐个定位标签，
+    只解析 <td>/<th> 的属性，不为其他标签和属性创建对象 (比 html.parser 快数倍)。
+    注释、<script>、<style> 的内容跳过；未读完的标签留到下一块再解析。
+    """
+
+    def __init__(self):
+        self.rows: List[List[Any]] = []
+        # 每层 <table> 一项 (当前行, rowspan 占用 {列序号: 剩余行数})，嵌套表格的行单独产出
+        self._tables: List[Tuple[Optional[List[Any]], Dict[int, int]]] = []
+        self._cell: Optional[List[str]] = None
+        self._cell_text = False
+        self._cell_span = (1, 1)
+        self._buffer = ""
+        # 正在跳过的 <script>/<style> 的结束标签
+        self._raw_end: Optional[Pattern[str]] = None
+
+    def feed(self, data: str) -> None:
+        self._buffer += data
+        self._parse(final=False)
+
+    def close(self) -> None:
+        self._parse(final=True)
+        while self._tables:
+            self._finish_row()
+            self._tables.pop()
+
+    def _parse(self, final: bool) -> None:
+        buffer = self._buffer
+        pos, end = 0, len(buffer)
+        if not final:
+            # 末尾尚未结束的注释留到下一块，避免把注释中的标签当作表格
+            comment = buffer.rfind("<!--")
+            if comment >= 0 and buffer.find("-->", comment) < 0:
+                end = comment
+        search = _TAG.search
+        while True:
+            if self._raw_end is not None:
+                match = self._raw_end.search(buffer, pos)
+                if match is None:
+                    if final:
+                        pos = end
+                    break
+                pos = match.end()
+                self._raw_end = None
+                continue
+            match = search(buffer, pos, end)
+            if match is None:
+                break
+            start = match.start()
+            if start > pos and self._cell is not None:
+                self._cell.append(buffer[pos:start])
+            pos = match.end()
+            closing, tag, attributes = match.groups()
+            if tag is None:
+                continue
+            tag = tag.lower()
+            # 单元格结束标签最多，直接处理
+            if closing:
+                if tag == "td" or tag == "th":
+                    if self._cell is not None:
+                        self._finish_cell()
+                else:
+                    self._end_tag(tag)
+            elif tag in _RAW_TEXT_TAGS:
+                self._raw_end = _RAW_TEXT_TAGS[tag]
+            else:
+                self._start_tag(tag, attributes)
+        if self._raw_end is None:
+            # 剩余部分中第一个 "<" 之前是文本，之后可能是读到一半的标签
+            lt = -1 if final else buffer.find("<", pos)
+            stop = lt if lt >= 0 else len(buffer)
+            if stop > pos and self._cell is not None:
+                self._cell.append(buffer[pos:stop])
+            pos = stop
+        self._buffer = buffer[pos:]
+
+    def _start_tag(self, tag: str, attributes: str) -> None:
+        if tag == "table":
+            self._finish_cell()
+            self._tables.append((None, {}))
+        elif not self._tables:
+            return
+        elif tag == "tr":
+            self._finish_row()
+            self._tables[-1] = ([], self._tables[-1][1])
+        elif tag == "td" or tag == "th":
+            if self._cell is not None:
+                self._finish_cell()
+            if self._tables[-1][0] is None:
+                self._tables[-1] = ([], self._tables[-1][1])
+            self._cell = []
+            self._cell_text = False
+            self._cell_span = (1, 1)
+            if attributes.strip():
+                attrs = {name.lower(): value for name, value in _ATTRIBUTE.findall(attributes)}
+                self._cell_text = "x:str" in attrs or bool(_TEXT_FORMAT.search(unescape(attrs.get("style", ""))))
+                self._cell_span = (_span(attrs.get("colspan")), _span(attrs.get("rowspan")))
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+
+    def _end_tag(self, tag: str) -> None:
+        if not self._tables:
+            return
+        if tag == "tr":
+            self._finish_row()
+        elif tag == "table":
+            self._finish_row()
+            self._tables.pop()
+
+    def _finish_cell(self) -> None:
+        if self._cell is None:
+            return
+        value = "".join(self._cell)
+        if self._cell_text:
+            value = TextCell(value)
+        self._cell = None
+        row, spans = self._tables[-1]
+        if spans:
+            self._skip_spanned(row, spans)
+        colspan, rowspan = self._cell_span
+        if colspan == 1 and rowspan == 1:
+            row.append(value)
+            return
+        for offset in range(colspan):
+            if rowspan > 1:
+                spans[len(row)] = rowspan - 1
+            row.append(value if offset == 0 else None)
+
+    def _finish_row(self) -> None:
+        self._finish_cell()
+        if not self._tables:
+            return
+        row, spans = self._tables[-1]
+        if row is None:
+            return
+        # 行尾之后仍被上方 rowspan 占用的列同样算作经过一行
+        for column in [column for column in spans if column >= len(row)]:
+            spans[column] -= 1
+            if not spans[column]:
+                del spans[column]
+        self.rows.append(row)
+        self._tables[-1] = (None, spans)
+
+    @staticmethod
+    def _skip_spanned(row: List[Any], spans: Dict[int, int]) -> None:
+        """跳过上方单元格 rowspan 占用的位置"""
+        while len(row) in spans:
+            column = len(row)
+            row.append(None)
+            spans[column] -= 1
+            if not spans[column]:
+                del spans[column]
+
+
+def _span(value: Optional[str]) -> int:
+    try:
+        return max(1, int(value.strip("\"'")))
+    except (AttributeError, ValueError):
+        return 1
+
+
+def iter_html_rows(stream: TextIO) -> Iterator[List[Any]]:
+    """逐块解析 HTML，每读完一个 <tr> 产出一行单元格原文"""
+    parser = HtmlTableParser()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+        rows, parser.rows = parser.rows, []
+        yield from rows
+        if not chunk:
+            return
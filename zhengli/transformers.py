@@ -0,0 +1,58 @@
+"""由 pattern_definitions 编译出的整理器
+
+每种格式在启动时编译一次：源列按汇总表列顺序排好 (读取层据此做列投影)，
+六列各自绑定固定的清理函数。逐块整理时不再查 mapping 字典，
+也不再判断 dst_col == 1 或 pattern8 的特殊列。
+"""
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from zhengli.normalizers import NormalizerCache, normalize_date_column
+
+ColumnFunc = Callable[[Sequence[Any]], List[Any]]
+
+
+def _clean_text_column(values: Sequence[Any]) -> List[Any]:
+    return [v.replace(" ", "") if isinstance(v, str) else v for v in values]
+
+
+class PatternTransformer:
+    """一种文件格式的整理器
+
+    columns:        汇总表六列依次对应的源列号，传给 SheetReader.iter_rows 做投影
+    column_funcs:   六列各自的整列清理函数 (日期列输出日序号)
+    split_time:     日期列是否只取空格前的日期部分
+    """
+
+    def __init__(self, name: str, columns: Tuple[int, ...], column_funcs: Tuple[ColumnFunc, ...],
+                 split_time: bool = False):
+        self.name = name
+        self.columns = columns
+        self.split_time = split_time
+        self.column_funcs = column_funcs
+
+    def transform_columns(self, rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+        """整理一块已投影的行，返回六列"""
+        return [func(values) for func, values in zip(self.column_funcs, zip(*rows))]
+
+
+def compile_pattern(name: str, pattern_info: Dict[str, Any], cache: NormalizerCache) -> PatternTransformer:
+    """把一项格式定义编译为整理器"""
+    mapping = pattern_info["mapping"]
+    if sorted(mapping.values()) != [1, 2, 3, 4, 5, 6]:
+        raise ValueError(f"{name} 的 mapping 必须恰好对应汇总表的6列: {mapping}")
+    columns = tuple(src_col for src_col, dst_col in sorted(mapping.items(), key=lambda item: item[1]))
+    # 日期列带有时分秒 (如 pattern8 的制单时间) 时只保留空格前的日期部分
+    split_time = bool(pattern_info.get("split_time", False))
+
+    def dates(values: Sequence[Any]) -> List[Any]:
+        return normalize_date_column(values, split_time, cache)
+
+    column_funcs = (dates, cache.clean_names, cache.clean_specs,
+                    _clean_text_column, cache.clean_names, _clean_text_column)
+    return PatternTransformer(name, columns, column_funcs, split_time)
+
+
+def compile_patterns(definitions: Dict[str, Dict[str, Any]],
+                     cache: NormalizerCache) -> Dict[str, PatternTransformer]:
+    """编译全部格式定义"""
+    return {name: compile_pattern(name, info, cache) for name, info in definitions.items()}
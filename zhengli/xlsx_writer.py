@@ -0,0 +1,172 @@
+"""流式 .xlsx 写出
+
+工作表 XML 逐行写入 zip 流，字符串使用内联字符串 (inlineStr)，
+不需要 Excel 进程，内存占用与行数无关。
+"""
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Any, Iterable, List, Sequence
+from xml.sax.saxutils import escape
+
+from zhengli.readers import column_letter
+
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+# XML 1.0 不允许的控制字符
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_DATE_STYLE = "1"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+{sheets}</Types>"""
+
+SHEET_CONTENT_TYPE = ('<Override PartName="/xl/worksheets/sheet{index}.xml" ContentType='
+                      '"application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\n')
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>{sheets}</sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# 样式 0 为常规，样式 1 为短日期 (内置格式 14)
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+SHEET_HEADER = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+SHEET_FOOTER = "</sheetData></worksheet>"
+
+
+def date_to_serial(value: date) -> float:
+    """date/datetime 转换为 Excel 序列日期"""
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    delta = value - _EXCEL_EPOCH
+    return delta.days + delta.seconds / 86400
+
+
+class XlsxWriter:
+    """只写模式的 .xlsx 写出器
+
+    先写入同目录下的临时文件，close 时再替换目标文件，
+    写出过程中崩溃不会破坏已有的汇总文件 (例如上一次检查点)。
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.tmp_path = file_path + ".tmp"
+        # 汇总数据重复度高，最低压缩级别已足够小，且写出速度明显更快
+        self.zf = zipfile.ZipFile(self.tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.sheet_names: List[str] = []
+
+    def add_sheet(self, name: str, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+                  date_columns: Sequence[int] = ()) -> int:
+        """写入一个工作表，返回写入的数据行数
+
+        date_columns 中 (从0开始) 的 YYYY-MM-DD 字符串按日期单元格写出，
+        与 Excel 粘贴文本时自动识别日期的结果一致。
+        """
+        self.sheet_names.append(name)
+        index = len(self.sheet_names)
+        letters = [column_letter(col) for col in range(1, len(headers) + 1)]
+        date_columns = set(date_columns)
+        count = 0
+        with self.zf.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True) as stream:
+            buffer = [SHEET_HEADER, self._row_xml(1, letters, headers, ())]
+            for row_no, row in enumerate(rows, 2):
+                buffer.append(self._row_xml(row_no, letters, row, date_columns))
+                count += 1
+                # 攒够一批再编码写出，减少 zip 流的写入次数
+                if len(buffer) >= 1000:
+                    stream.write("".join(buffer).encode("utf-8"))
+                    buffer = []
+            buffer.append(SHEET_FOOTER)
+            stream.write("".join(buffer).encode("utf-8"))
+        return count
+
+    @staticmethod
+    def _row_xml(row_no: int, letters: List[str], row: Sequence[Any], date_columns) -> str:
+        cells = []
+        for col, value in enumerate(row):
+            if value is None or value == "" or value != value:
+                # 空值和 NaN 不写出单元格
+                continue
+            ref = f"{letters[col]}{row_no}"
+            if isinstance(value, str) and col in date_columns:
+                match = _ISO_DATE.match(value)
+                if match:
+                    try:
+                        value = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+                    except ValueError:
+                        pass
+            if isinstance(value, bool):
+                cells.append(f'<c r="{ref}" t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)):
+                cells.append(f'<c r="{ref}"><v>{value!r}</v></c>')
+            elif isinstance(value, date):
+                cells.append(f'<c r="{ref}" s="{_DATE_STYLE}"><v>{date_to_serial(value)!r}</v></c>')
+            else:
+                text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+                cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        return f'<row r="{row_no}">{"".join(cells)}</row>'
+
+    def close(self) -> None:
+        """写入工作簿结构并替换目标文件"""
+        sheets = "".join(f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>'
+                         for i, name in enumerate(self.sheet_names, 1))
+        rels = "".join(f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                       f'relationships/worksheet" Target="worksheets/sheet{i}.xml"/>\n'
+                       for i in range(1, len(self.sheet_names) + 1))
+        types = "".join(SHEET_CONTENT_TYPE.format(index=i) for i in range(1, len(self.sheet_names) + 1))
+        self.zf.writestr("[Content_Types].xml", CONTENT_TYPES.format(sheets=types))
+        self.zf.writestr("_rels/.rels", ROOT_RELS)
+        self.zf.writestr("xl/workbook.xml", WORKBOOK.format(sheets=sheets))
+        self.zf.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS.format(sheets=rels))
+        self.zf.writestr("xl/styles.xml", STYLES)
+        self.zf.close()
+        os.replace(self.tmp_path, self.file_path)
+
+    def abort(self) -> None:
+        """放弃写出，删除临时文件"""
+        self.zf.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def write_xlsx(file_path: str, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+               sheet_name: str = "Sheet1", date_columns: Sequence[int] = ()) -> int:
+    """把一组行写成单工作表的 .xlsx，返回写入的数据行数"""
+    writer = XlsxWriter(file_path)
+    try:
+        count = writer.add_sheet(sheet_name, headers, rows, date_columns)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    return count